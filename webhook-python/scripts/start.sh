@@ -42,7 +42,7 @@ done
 echo -e "${GREEN}✓${NC} Environment variables loaded"
 
 # Create directories
-mkdir -p logs outputs/{issues,pull_requests,reviews,workflows}
+mkdir -p logs data outputs/{issues,pull_requests,reviews,workflows}
 echo -e "${GREEN}✓${NC} Directories created"
 
 # Check if Docker is available
@@ -65,6 +65,7 @@ elif command -v docker &> /dev/null; then
         -v "$(pwd)/prompts:/app/prompts:ro" \
         -v "$(pwd)/logs:/app/logs" \
         -v "$(pwd)/outputs:/app/outputs" \
+        -v "$(pwd)/data:/app/data" \
         --restart unless-stopped \
         github-webhook-handler
     echo -e "${GREEN}✓${NC} Webhook handler started with Docker"
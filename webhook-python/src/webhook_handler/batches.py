@@ -0,0 +1,328 @@
+"""Message Batches lane for analyses that are not latency sensitive."""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from anthropic import AnthropicError, AsyncAnthropic
+
+from .config import BatchConfig
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_requests (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    batch_id TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batch_requests_status ON batch_requests (status, created_at);
+CREATE TABLE IF NOT EXISTS batch_waiters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    delivery_id TEXT,
+    request_id TEXT,
+    payload BLOB NOT NULL,
+    UNIQUE (key, delivery_id)
+);
+CREATE INDEX IF NOT EXISTS idx_batch_waiters_key ON batch_waiters (key);
+"""
+
+
+class AnalysisDeferred(Exception):
+    """Raised when an analysis was handed to the batch lane and has no result yet."""
+
+    def __init__(self, key: str):
+        super().__init__(f"analysis deferred to batch lane ({key})")
+        self.key = key
+
+
+@dataclass
+class BatchWaiter:
+    """A delivery to re-run once its batched analysis has finished."""
+    key: str
+    event_type: str
+    delivery_id: Optional[str]
+    request_id: Optional[str]
+    payload: bytes
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one batched request."""
+    status: str
+    text: Optional[str]
+    error: Optional[str]
+
+
+ResumeCallback = Callable[[BatchWaiter], Awaitable[None]]
+
+# Turns the message of a succeeded request into the text stored for it
+MessageText = Callable[[Any], str]
+
+
+def message_text(message: Any) -> str:
+    """The text of a message's text blocks."""
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+class BatchLane:
+    """Collects Claude requests and runs them through the Message Batches API.
+
+    Requests are keyed by the hash of their content and persisted in SQLite
+    together with the deliveries waiting on them, so nothing is lost across a
+    restart. Pending requests are submitted once the oldest has waited
+    ``window_seconds`` or ``max_batch_size`` have accumulated; submitted
+    batches are polled every ``poll_interval`` seconds, and when a batch ends
+    every waiting delivery is handed to the resume callback so the handler
+    can pick up its result and carry out its side effects. ``message_text``
+    decides what is stored for a succeeded request.
+    """
+
+    def __init__(self, config: BatchConfig, client: AsyncAnthropic, message_text: MessageText = message_text):
+        self.config = config
+        self.client = client
+        self.message_text = message_text
+        self.path = Path(config.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._task: Optional[asyncio.Task] = None
+        self._resume: Optional[ResumeCallback] = None
+        self._batches_submitted = 0
+        self._requests_submitted = 0
+        self._succeeded = 0
+        self._errored = 0
+        self._resumed = 0
+
+    def request(self, key: str, params: Dict[str, Any]) -> Optional[BatchResult]:
+        """Return the finished result for a request, queueing it if it is new."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error FROM batch_requests WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO batch_requests (key, params, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(params), now, now)
+                )
+                return None
+
+        status, result, error = row
+        if status in ("pending", "submitted"):
+            return None
+        return BatchResult(status=status, text=result, error=error)
+
+    def add_waiter(
+        self,
+        key: str,
+        event_type: str,
+        payload: bytes,
+        delivery_id: Optional[str] = None,
+        request_id: Optional[str] = None
+    ) -> None:
+        """Record a delivery to resume when the request's batch ends."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO batch_waiters (key, event_type, delivery_id, request_id, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, event_type, delivery_id, request_id, payload)
+            )
+
+    def start(self, resume: ResumeCallback) -> None:
+        """Start submitting and polling in the background."""
+        if self._task is None:
+            self._resume = resume
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                "Batch lane started",
+                window_seconds=self.config.window_seconds,
+                poll_interval=self.config.poll_interval
+            )
+
+    async def stop(self) -> None:
+        """Stop the background task; pending work stays on disk."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error("Batch lane tick failed", error=str(e), exc_info=True)
+            await asyncio.sleep(self.config.poll_interval)
+
+    async def tick(self) -> None:
+        """Submit a batch if one is due, collect ended batches and resume their waiters."""
+        await self.submit_due()
+        for batch_id in self._open_batches():
+            if await self.collect(batch_id):
+                await self.resume_waiters()
+        self._purge()
+
+    async def submit_due(self) -> Optional[str]:
+        """Submit pending requests once the window has elapsed or the batch is full."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, params, created_at FROM batch_requests "
+                "WHERE status = 'pending' ORDER BY created_at LIMIT ?",
+                (self.config.max_batch_size,)
+            ).fetchall()
+        if not rows:
+            return None
+
+        window_elapsed = time.time() - rows[0][2] >= self.config.window_seconds
+        if not window_elapsed and len(rows) < self.config.max_batch_size:
+            return None
+
+        requests = [{"custom_id": key, "params": json.loads(params)} for key, params, _ in rows]
+        try:
+            batch = await self.client.messages.batches.create(requests=requests)
+        except AnthropicError as e:
+            logger.error("Batch submission failed", requests=len(requests), error=str(e))
+            return None
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE batch_requests SET status = 'submitted', batch_id = ?, updated_at = ? WHERE key = ?",
+                [(batch.id, now, key) for key, _, _ in rows]
+            )
+        self._batches_submitted += 1
+        self._requests_submitted += len(rows)
+
+        logger.info("Batch submitted", batch_id=batch.id, requests=len(rows))
+        return batch.id
+
+    def _open_batches(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT batch_id FROM batch_requests WHERE status = 'submitted'"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    async def collect(self, batch_id: str) -> bool:
+        """Store the results of a batch if it has ended; returns whether it had."""
+        try:
+            batch = await self.client.messages.batches.retrieve(batch_id)
+            if batch.processing_status != "ended":
+                return False
+            results = await self.client.messages.batches.results(batch_id)
+            outcomes = []
+            async for entry in results:
+                outcomes.append(self._outcome(entry))
+        except AnthropicError as e:
+            logger.warning("Could not collect batch", batch_id=batch_id, error=str(e))
+            return False
+
+        now = time.time()
+        with self._lock:
+            for key, status, text, error in outcomes:
+                self._conn.execute(
+                    "UPDATE batch_requests SET status = ?, result = ?, error = ?, updated_at = ? "
+                    "WHERE key = ?",
+                    (status, text, error, now, key)
+                )
+            # Requests missing from the results can't complete any more
+            self._conn.execute(
+                "UPDATE batch_requests SET status = 'errored', error = 'missing from results', updated_at = ? "
+                "WHERE batch_id = ? AND status = 'submitted'",
+                (now, batch_id)
+            )
+
+        succeeded = sum(1 for _, status, _, _ in outcomes if status == "succeeded")
+        self._succeeded += succeeded
+        self._errored += len(outcomes) - succeeded
+
+        logger.info("Batch ended", batch_id=batch_id, succeeded=succeeded, errored=len(outcomes) - succeeded)
+        return True
+
+    def _outcome(self, entry: Any) -> tuple:
+        """Flatten one result entry into (key, status, text, error)."""
+        result = entry.result
+        if result.type == "succeeded":
+            return (entry.custom_id, "succeeded", self.message_text(result.message), None)
+        error = getattr(result, "error", None)
+        return (entry.custom_id, "errored", None, str(error) if error else result.type)
+
+    async def resume_waiters(self) -> int:
+        """Hand every delivery whose request has finished to the resume callback."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT w.id, w.key, w.event_type, w.delivery_id, w.request_id, w.payload "
+                "FROM batch_waiters w JOIN batch_requests r ON r.key = w.key "
+                "WHERE r.status NOT IN ('pending', 'submitted') ORDER BY w.id"
+            ).fetchall()
+
+        resumed = 0
+        for waiter_id, key, event_type, delivery_id, request_id, payload in rows:
+            waiter = BatchWaiter(key, event_type, delivery_id, request_id, payload)
+            try:
+                await self._resume(waiter)
+            except Exception as e:
+                logger.error("Failed to resume batched delivery", delivery_id=delivery_id, error=str(e))
+                continue
+            with self._lock:
+                self._conn.execute("DELETE FROM batch_waiters WHERE id = ?", (waiter_id,))
+            resumed += 1
+
+        self._resumed += resumed
+        return resumed
+
+    def _purge(self) -> None:
+        """Drop finished results nobody is waiting on once they pass the TTL."""
+        cutoff = time.time() - self.config.result_ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM batch_requests WHERE status NOT IN ('pending', 'submitted') "
+                "AND updated_at <= ? AND key NOT IN (SELECT key FROM batch_waiters)",
+                (cutoff,)
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lane statistics."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM batch_requests GROUP BY status"
+            ).fetchall())
+            waiting = self._conn.execute("SELECT COUNT(*) FROM batch_waiters").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "submitted": counts.get("submitted", 0),
+            "waiting_deliveries": waiting,
+            "batches_submitted": self._batches_submitted,
+            "requests_submitted": self._requests_submitted,
+            "succeeded": self._succeeded,
+            "errored": self._errored,
+            "resumed": self._resumed
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -1,249 +1,1013 @@
 """API clients for Claude and GitHub."""
 
 import asyncio
+import json
 import time
-from typing import Dict, List, Optional, Any
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Any, Set, Tuple
 from pathlib import Path
 
-import requests
-from anthropic import Anthropic
-from github import Github, GithubException
+import httpx
+from anthropic import APIConnectionError, AsyncAnthropic, InternalServerError, RateLimitError
+from jiter import from_json
 
-from .config import ClaudeConfig, GitHubConfig
+from .batches import AnalysisDeferred, BatchLane
+from .config import BatchConfig, ClaudeConfig, GitHubConfig
+from .diff_view import DiffView, read_diff
+from .github_cache import ETagCache, request_key, resource_kind
+from .mutations import IssueMutations
+from .payloads import PullRequest
+from .pr_artifacts import PRArtifactCache, PRArtifacts
 from .logging_config import get_logger
+from .rate_limit import ClaudeRateLimiter, estimate_tokens
+from .response_cache import ResponseCache, cache_key
+from .triage import ANALYSIS_FIELD
 
 logger = get_logger(__name__)
 
+# Receives each chunk of streamed response text
+TextCallback = Callable[[str], Awaitable[None]]
+
+# GitHub resources changed by the delivery being processed, if tracked
+_github_writes: ContextVar[Optional[Set[str]]] = ContextVar("github_writes", default=None)
+
+
+@contextmanager
+def track_writes() -> Iterator[Set[str]]:
+    """Collect the GitHub resources changed inside the block, including by tasks it starts."""
+    writes: Set[str] = set()
+    token = _github_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _github_writes.reset(token)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a delivery that failed with ``error`` may safely run again.
+    
+    Only transient failures qualify: connection errors, 429s and 5xxs
+    from GitHub or Claude. And only while the delivery has changed
+    nothing on GitHub, since a retry would post its comments or close
+    its issue a second time.
+    """
+    if _github_writes.get():
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, (httpx.TransportError, APIConnectionError, RateLimitError, InternalServerError))
+
+
+def partial_analysis(tool_json: str) -> str:
+    """The analysis field of a tool input streamed so far, or "" before it starts.
+    
+    The SDK's own snapshot of a streaming tool input leaves out strings
+    until they are complete, so the buffer is parsed here keeping the
+    trailing, still open string.
+    """
+    try:
+        data = from_json(tool_json.encode("utf-8"), partial_mode="trailing-strings")
+    except ValueError:
+        return ""
+    analysis = data.get(ANALYSIS_FIELD) if isinstance(data, dict) else None
+    return analysis if isinstance(analysis, str) else ""
+
+
+class AnalysisText(str):
+    """Response text carrying the input of the tool Claude called, if any."""
+    
+    tool_input: Optional[Dict[str, Any]]
+    
+    def __new__(cls, text: str, tool_input: Optional[Dict[str, Any]] = None) -> "AnalysisText":
+        analysis = super().__new__(cls, text)
+        analysis.tool_input = tool_input
+        return analysis
+    
+    @classmethod
+    def from_message(cls, message: Any) -> "AnalysisText":
+        """Join a message's text blocks and take the input of its first tool call.
+        
+        An analysis written into the tool call becomes the text.
+        """
+        text, tool_input, analysis = [], None, ""
+        for block in message.content:
+            if block.type == "text":
+                text.append(block.text)
+            elif block.type == "tool_use" and tool_input is None:
+                tool_input = dict(block.input)
+                analysis = tool_input.pop(ANALYSIS_FIELD, None) or ""
+        return cls("".join(text) or analysis, tool_input)
+    
+    def to_cache(self) -> str:
+        return json.dumps({"text": str(self), "tool_input": self.tool_input})
+    
+    @classmethod
+    def from_cache(cls, cached: str) -> "AnalysisText":
+        data = json.loads(cached)
+        return cls(data["text"], data["tool_input"])
+
 
 class ClaudeClient:
     """Client for interacting with Claude API."""
     
-    def __init__(self, config: ClaudeConfig):
+    def __init__(
+        self,
+        config: ClaudeConfig,
+        rate_limiting: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        batch_config: Optional[BatchConfig] = None
+    ):
         self.config = config
-        self.client = Anthropic(api_key=config.api_key)
+        self.response_cache = response_cache
+        self.rate_limiter = ClaudeRateLimiter(
+            requests_per_minute=config.requests_per_minute,
+            input_tokens_per_minute=config.input_tokens_per_minute,
+            output_tokens_per_minute=config.output_tokens_per_minute
+        ) if rate_limiting else None
+        
+        # One pooled keep-alive HTTP client shared by every analysis
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout)
+        )
+        # No SDK retries: a 429 must reach the rate limiter, which settles
+        # the reservation and backs off before the delivery is retried
+        self.client = AsyncAnthropic(
+            api_key=config.api_key, base_url=config.base_url, http_client=self._http_client,
+            max_retries=0
+        )
+        
+        # Lane for analyses that can wait for the Message Batches API
+        self.batch_lane = (
+            BatchLane(
+                batch_config,
+                self.client,
+                # Kept whole so tool calls survive the round trip through SQLite
+                message_text=lambda message: AnalysisText.from_message(message).to_cache()
+            )
+            if batch_config is not None and batch_config.enabled else None
+        )
+        
+        # Gate requests on the pool size so saturation is measurable
+        self._pool_slots = asyncio.Semaphore(config.max_connections)
+        self._in_flight = 0
+        self._waiting = 0
+        self._peak_in_flight = 0
+        self._pool_wait_total = 0.0
+        
         self._request_count = 0
-        self._last_request_time = 0.0
+        self._streams = 0
+        self._time_to_first_token: deque = deque(maxlen=100)
+        self._usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
+    
+    async def warm_up(self) -> None:
+        """Open a connection to the API ahead of the first analysis."""
+        try:
+            await self._http_client.head(str(self.client.base_url), timeout=self.config.connect_timeout)
+            logger.info("Claude connection pool warmed up")
+        except httpx.HTTPError as e:
+            logger.warning("Claude connection warm-up failed", error=str(e))
+    
+    async def close(self) -> None:
+        """Close pooled connections."""
+        await self.client.close()
+        if self.response_cache:
+            self.response_cache.close()
+        if self.batch_lane:
+            self.batch_lane.close()
     
-    async def analyze(self, prompt: str, context: str) -> str:
-        """Analyze content using Claude."""
+    async def analyze(
+        self,
+        prompt: str,
+        context: str,
+        use_cache: bool = True,
+        system: Optional[str] = None,
+        on_text: Optional[TextCallback] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Analyze content using Claude.
         
-        # Simple rate limiting
-        current_time = time.time()
-        if current_time - self._last_request_time < 1.0:  # 1 second between requests
-            await asyncio.sleep(1.0 - (current_time - self._last_request_time))
+        ``system`` is the static part of a prompt template; it is sent as a
+        system block marked for prompt caching so it forms a reusable prefix
+        ahead of the per-event context. Identical requests are answered from
+        the response cache unless ``use_cache`` is False.
+        
+        When ``on_text`` is given the response is streamed and each chunk is
+        passed to it as it arrives; the full text is still returned.
+        ``model`` and ``max_tokens`` override the configured defaults.
+        
+        With ``tools`` Claude must answer by calling the first of them, with
+        its analysis in the call's ``analysis`` field. The result is then an
+        AnalysisText whose ``tool_input`` holds the rest of the call's input.
+        """
+        
+        # Combine per-event context with the dynamic part of the prompt
+        full_prompt = f"{context}\n\n{prompt}" if prompt else context
+        model = model or self.config.model
+        max_tokens = max_tokens or self.config.max_tokens
+        
+        key = None
+        if use_cache and self.response_cache:
+            key = cache_key(model, max_tokens, system or "", full_prompt, *(tool["name"] for tool in tools or ()))
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                if tools:
+                    cached = AnalysisText.from_cache(cached)
+                logger.info("Claude response served from cache", response_length=len(cached))
+                if on_text is not None:
+                    await on_text(cached)
+                return cached
         
-        self._last_request_time = time.time()
         self._request_count += 1
         
         try:
-            # Combine prompt and context
-            full_prompt = f"{context}\n\n{prompt}"
-            
             logger.info("Sending request to Claude", request_count=self._request_count)
             
-            # Make synchronous call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                self._make_claude_request,
-                full_prompt
+            response = await self._make_claude_request(full_prompt, system, on_text, model, max_tokens, tools)
+            
+            logger.info(
+                "Received response from Claude",
+                response_length=len(response), tool_called=response.tool_input is not None
             )
             
-            logger.info("Received response from Claude", response_length=len(response))
+            if key is not None and response:
+                self.response_cache.put(key, response.to_cache() if tools else response)
             return response
             
         except Exception as e:
             logger.error("Claude API error", error=str(e), exc_info=True)
             raise
     
-    def _make_claude_request(self, prompt: str) -> str:
-        """Make the actual Claude API request."""
-        response = self.client.messages.create(
-            model=self.config.model,
-            max_tokens=self.config.max_tokens,
-            messages=[{
+    async def analyze_batched(
+        self,
+        prompt: str,
+        context: str,
+        use_cache: bool = True,
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Analyze content through the batch lane.
+        
+        Returns the result once the request's batch has ended; until then the
+        request is queued and AnalysisDeferred is raised carrying its key.
+        Requests the batch could not complete fall back to a real-time call.
+        ``tools`` are forced as in ``analyze``, with the same AnalysisText result.
+        """
+        if self.batch_lane is None:
+            return await self.analyze(
+                prompt, context, use_cache=use_cache, system=system, model=model, max_tokens=max_tokens, tools=tools
+            )
+        
+        full_prompt = f"{context}\n\n{prompt}" if prompt else context
+        model = model or self.config.model
+        max_tokens = max_tokens or self.config.max_tokens
+        key = cache_key(model, max_tokens, system or "", full_prompt, *(tool["name"] for tool in tools or ()))
+        
+        if use_cache and self.response_cache:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                logger.info("Claude response served from cache", response_length=len(cached))
+                return AnalysisText.from_cache(cached) if tools else cached
+        
+        result = self.batch_lane.request(key, self.build_request(full_prompt, system, model, max_tokens, tools))
+        if result is None:
+            logger.info("Analysis deferred to batch lane", key=key)
+            raise AnalysisDeferred(key)
+        
+        if result.status != "succeeded":
+            logger.warning("Batched request failed, retrying in real time", error=result.error)
+            return await self.analyze(
+                prompt, context, use_cache=use_cache, system=system, model=model, max_tokens=max_tokens, tools=tools
+            )
+        
+        # Stored in the response cache's format for tool calls
+        response = AnalysisText.from_cache(result.text)
+        if use_cache and self.response_cache and response:
+            self.response_cache.put(key, response.to_cache() if tools else response)
+        return response if tools else str(response)
+    
+    def build_request(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Build Messages API parameters for a prompt."""
+        params: Dict[str, Any] = {
+            "model": model or self.config.model,
+            "max_tokens": max_tokens or self.config.max_tokens,
+            "messages": [{
                 "role": "user",
                 "content": prompt
             }]
+        }
+        if tools:
+            # Forced, so the triage result is always present
+            params["tools"] = tools
+            params["tool_choice"] = {"type": "tool", "name": tools[0]["name"]}
+        if system:
+            params["system"] = [{
+                "type": "text",
+                "text": system,
+                "cache_control": {"type": "ephemeral"}
+            }]
+        return params
+    
+    def _record_usage(self, usage: Any) -> None:
+        """Accumulate token usage, including prompt cache reads and writes."""
+        self._usage["input_tokens"] += usage.input_tokens
+        self._usage["output_tokens"] += usage.output_tokens
+        self._usage["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", None) or 0
+        self._usage["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", None) or 0
+    
+    async def _make_claude_request(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        on_text: Optional[TextCallback] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AnalysisText:
+        """Make the actual Claude API request under the rate limiter."""
+        params = self.build_request(prompt, system, model, max_tokens, tools)
+        
+        async def send() -> Tuple[Any, Mapping[str, str]]:
+            if on_text is not None:
+                return await self._stream(params, on_text)
+            return await self._send(params)
+        
+        if self.rate_limiter is None:
+            response, _ = await send()
+            self._record_usage(response.usage)
+            return AnalysisText.from_message(response)
+        
+        reservation = await self.rate_limiter.acquire(
+            input_tokens=(
+                estimate_tokens(prompt)
+                + (estimate_tokens(system) if system else 0)
+                + (estimate_tokens(json.dumps(tools)) if tools else 0)
+            ),
+            output_tokens=params["max_tokens"]
         )
+        try:
+            response, headers = await send()
+        except RateLimitError as e:
+            self.rate_limiter.settle(reservation, headers=e.response.headers)
+            if "retry-after" not in e.response.headers:
+                self.rate_limiter.back_off(60.0)
+            raise
+        except Exception:
+            self.rate_limiter.settle(reservation, input_tokens=0, output_tokens=0)
+            raise
         
-        return response.content[0].text if response.content else ""
+        self._record_usage(response.usage)
+        self.rate_limiter.settle(
+            reservation,
+            input_tokens=(
+                response.usage.input_tokens
+                + (getattr(response.usage, "cache_creation_input_tokens", None) or 0)
+            ),
+            output_tokens=response.usage.output_tokens,
+            headers=headers
+        )
+        return AnalysisText.from_message(response)
+    
+    @asynccontextmanager
+    async def _pool_slot(self) -> AsyncIterator[None]:
+        """Hold one pooled connection slot, recording wait time and concurrency."""
+        self._waiting += 1
+        wait_start = time.monotonic()
+        async with self._pool_slots:
+            self._waiting -= 1
+            self._pool_wait_total += time.monotonic() - wait_start
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+    
+    async def _send(self, params: Dict[str, Any]) -> Tuple[Any, Mapping[str, str]]:
+        """Send one request on a pooled connection; returns the message and response headers."""
+        async with self._pool_slot():
+            raw = await self.client.messages.with_raw_response.create(
+                **params, timeout=self.config.timeout
+            )
+        
+        return raw.parse(), raw.headers
+    
+    async def _stream(
+        self, params: Dict[str, Any], on_text: TextCallback
+    ) -> Tuple[Any, Mapping[str, str]]:
+        """Stream one request, passing text chunks to ``on_text`` as they arrive.
+        
+        An analysis written into a tool call is streamed from the call's
+        input as it is generated.
+        """
+        async with self._pool_slot():
+            started = time.monotonic()
+            first_token = True
+            tool_json, streamed = "", ""
+            async with self.client.messages.stream(**params, timeout=self.config.timeout) as stream:
+                async for event in stream:
+                    if event.type == "text":
+                        text = event.text
+                    elif event.type == "input_json":
+                        tool_json += event.partial_json
+                        analysis = partial_analysis(tool_json)
+                        if len(analysis) <= len(streamed) or not analysis.startswith(streamed):
+                            continue
+                        text, streamed = analysis[len(streamed):], analysis
+                    else:
+                        continue
+                    if first_token:
+                        first_token = False
+                        self._time_to_first_token.append(time.monotonic() - started)
+                    await on_text(text)
+                message = await stream.get_final_message()
+                headers = stream.response.headers
+        
+        self._streams += 1
+        return message, headers
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get client and connection pool statistics."""
+        return {
+            "requests_made": self._request_count,
+            "usage": dict(self._usage),
+            "rate_limiter": self.rate_limiter.get_stats() if self.rate_limiter else None,
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
+            "batch_lane": self.batch_lane.get_stats() if self.batch_lane else None,
+            "streaming": {
+                "streams": self._streams,
+                "average_time_to_first_token": (
+                    sum(self._time_to_first_token) / len(self._time_to_first_token)
+                    if self._time_to_first_token else 0
+                ),
+                "last_time_to_first_token": (
+                    self._time_to_first_token[-1] if self._time_to_first_token else None
+                )
+            },
+            "pool": {
+                "max_connections": self.config.max_connections,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "peak_in_flight": self._peak_in_flight,
+                "saturation": self._in_flight / self.config.max_connections,
+                "average_wait_seconds": (
+                    self._pool_wait_total / self._request_count
+                    if self._request_count > 0 else 0
+                )
+            }
+        }
 
 
 class GitHubClient:
-    """Client for interacting with GitHub API."""
+    """Client for interacting with GitHub API.
+    
+    All calls share one keep-alive connection pool and never block the
+    event loop. Concurrency is capped per host so a burst of deliveries
+    cannot exhaust the pool or trip GitHub's secondary rate limits.
+    
+    With an ``ETagCache``, reads are served from it while fresh and
+    revalidated with ``If-None-Match`` afterwards; writes drop the cached
+    resources they touch. A ``PRArtifactCache`` keeps each PR head's diff
+    and file list so later events on the same head fetch neither.
+    """
     
-    def __init__(self, config: GitHubConfig):
+    def __init__(
+        self,
+        config: GitHubConfig,
+        cache: Optional[ETagCache] = None,
+        artifacts: Optional[PRArtifactCache] = None
+    ):
         self.config = config
-        self.client = Github(config.token)
+        self.cache = cache
+        self.artifacts = artifacts
+        self._http = httpx.AsyncClient(
+            base_url=config.api_url,
+            headers={
+                "Authorization": f"Bearer {config.token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "User-Agent": "promptforge-webhook-handler"
+            },
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout)
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
         self._request_count = 0
+        self._rate_limit: Dict[str, Any] = {"limit": None, "remaining": None, "reset": None}
+    
+    async def warm_up(self) -> None:
+        """Open a connection to the API ahead of the first delivery."""
+        try:
+            await self._http.head("/", timeout=self.config.connect_timeout)
+            logger.info("GitHub connection pool warmed up")
+        except httpx.HTTPError as e:
+            logger.warning("GitHub connection warm-up failed", error=str(e))
+    
+    async def close(self) -> None:
+        """Close pooled connections."""
+        await self._http.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if self.artifacts is not None:
+            self.artifacts.close()
+    
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request, through the ETag cache for reads; raises on HTTP errors."""
+        request = self._http.build_request(method, url, **kwargs)
+        if self.cache is None:
+            response = await self._send(request)
+        elif method == "GET":
+            return await self._cached_get(request)
+        else:
+            response = await self._send(request)
+            if response.is_success:
+                self.cache.invalidate_for_write(request.url.path)
+        
+        response.raise_for_status()
+        if method != "GET":
+            self._record_write(request, response)
+        return response
+    
+    def _record_write(self, request: httpx.Request, response: httpx.Response) -> None:
+        """Note the resource a write changed; deleting one this delivery created cancels it out."""
+        writes = _github_writes.get()
+        if writes is None:
+            return
+        
+        if request.method == "DELETE" and request.url.path in writes:
+            writes.discard(request.url.path)
+            return
+        try:
+            resource = httpx.URL(response.json()["url"]).path
+        except (ValueError, TypeError, KeyError):
+            resource = request.url.path
+        writes.add(resource)
+    
+    async def _cached_get(self, request: httpx.Request) -> httpx.Response:
+        """Serve a read from the cache, revalidating it once stale."""
+        key = request_key(request)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_fresh_hit()
+            return entry.to_response(request)
+        
+        if entry is not None:
+            request.headers["If-None-Match"] = entry.etag
+        response = await self._send(request)
+        
+        # A 304 is not counted against the rate limit
+        if response.status_code == 304 and entry is not None:
+            return self.cache.revalidated(key, entry).to_response(request)
+        
+        self.cache.record_miss()
+        response.raise_for_status()
+        self.cache.store(key, resource_kind(request), response)
+        return response
+    
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        """Send a request under its host's concurrency limit."""
+        async with self._host_slot(request.url.host):
+            response = await self._http.send(request)
+        
+        self._record_rate_limit(response.headers)
+        return response
+    
+    @asynccontextmanager
+    async def _host_slot(self, host: str) -> AsyncIterator[None]:
+        """Hold one of a host's request slots."""
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.config.max_connections_per_host)
+        
+        async with slots:
+            self._request_count += 1
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            try:
+                yield
+            finally:
+                self._in_flight[host] -= 1
+    
+    def _record_rate_limit(self, headers: Mapping[str, str]) -> None:
+        """Track the core rate limit from response headers."""
+        if "x-ratelimit-remaining" not in headers:
+            return
+        try:
+            self._rate_limit = {
+                "limit": int(headers["x-ratelimit-limit"]),
+                "remaining": int(headers["x-ratelimit-remaining"]),
+                "reset": datetime.fromtimestamp(
+                    int(headers["x-ratelimit-reset"]), tz=timezone.utc
+                ).isoformat()
+            }
+        except (KeyError, ValueError):
+            pass
+    
+    async def _paginate(
+        self, url: str, params: Optional[Dict[str, Any]] = None, max_items: Optional[int] = None
+    ) -> List[Any]:
+        """Fetch pages of a list endpoint by following Link headers, up to ``max_items``."""
+        items: List[Any] = []
+        params = {"per_page": 100, **(params or {})}
+        while url and (max_items is None or len(items) < max_items):
+            response = await self._request("GET", url, params=params)
+            items.extend(response.json())
+            url = response.links.get("next", {}).get("url")
+            params = None  # The next link carries the query string
+        return items[:max_items]
     
     async def get_issue(self, repo_name: str, issue_number: int) -> Dict[str, Any]:
         """Get issue details."""
         try:
-            repo = self.client.get_repo(repo_name)
-            issue = repo.get_issue(issue_number)
+            issue = (await self._request("GET", f"/repos/{repo_name}/issues/{issue_number}")).json()
             
             return {
-                "number": issue.number,
-                "title": issue.title,
-                "body": issue.body or "",
-                "user": issue.user.login,
-                "state": issue.state,
-                "labels": [label.name for label in issue.labels],
-                "url": issue.html_url
+                "number": issue["number"],
+                "title": issue["title"],
+                "body": issue.get("body") or "",
+                "user": issue["user"]["login"],
+                "state": issue["state"],
+                "labels": [label["name"] for label in issue.get("labels", [])],
+                "url": issue["html_url"]
             }
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.error("GitHub API error getting issue", error=str(e))
             raise
     
-    async def get_pull_request(self, repo_name: str, pr_number: int) -> Dict[str, Any]:
-        """Get pull request details."""
+    async def get_pull_request(
+        self, repo_name: str, pr_number: int, known: Optional[PullRequest] = None
+    ) -> Dict[str, Any]:
+        """Get pull request details.
+        
+        Fields already in ``known`` (the webhook payload's pull request) are
+        not refetched: missing stats come from the file list, and the pull
+        request itself is fetched only if that list hit ``max_pr_files``.
+        The diff and the file list are fetched concurrently, and reused
+        from the artifact cache for a head SHA already seen.
+        """
+        pr_url = f"/repos/{repo_name}/pulls/{pr_number}"
+        head_sha = known.head_sha if known is not None else ""
+        if self.artifacts is not None and head_sha:
+            cached = self.artifacts.get(repo_name, pr_number, head_sha)
+            if cached is not None:
+                details = known.details()
+                for stat in ("additions", "deletions", "changed_files"):
+                    if details[stat] is None:
+                        details[stat] = getattr(cached, stat)
+                details["diff"] = cached.diff
+                details["files"] = list(cached.files)
+                return details
+        
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
+            fetches = [
+                self._get_diff(repo_name, pr_number),
+                self._paginate(f"{pr_url}/files", max_items=self.config.max_pr_files)
+            ]
+            if known is None:
+                fetches.append(self._request("GET", pr_url))
+            results = await asyncio.gather(*fetches)
+            diff_content, files = results[0], results[1]
+            truncated = len(files) >= self.config.max_pr_files
             
-            # Get diff (limited size)
-            diff_content = ""
-            try:
-                diff_response = requests.get(
-                    pr.diff_url,
-                    headers={"Authorization": f"token {self.config.token}"}
-                )
-                if diff_response.status_code == 200:
-                    diff_content = diff_response.text[:10000]  # Limit diff size
-            except Exception as e:
-                logger.warning("Could not fetch PR diff", error=str(e))
+            if known is None:
+                details = self._pull_request_details(results[2].json())
+            else:
+                details = known.details()
+                if None in (details["additions"], details["deletions"], details["changed_files"]):
+                    if truncated:
+                        fetched = self._pull_request_details((await self._request("GET", pr_url)).json())
+                        details.update(
+                            additions=fetched["additions"],
+                            deletions=fetched["deletions"],
+                            changed_files=fetched["changed_files"]
+                        )
+                    else:
+                        details.update(
+                            additions=sum(f.get("additions", 0) for f in files),
+                            deletions=sum(f.get("deletions", 0) for f in files),
+                            changed_files=len(files)
+                        )
             
-            return {
-                "number": pr.number,
-                "title": pr.title,
-                "body": pr.body or "",
-                "user": pr.user.login,
-                "state": pr.state,
-                "labels": [label.name for label in pr.labels],
-                "url": pr.html_url,
-                "diff": diff_content,
-                "files": [f.filename for f in pr.get_files()],
-                "additions": pr.additions,
-                "deletions": pr.deletions,
-                "changed_files": pr.changed_files
-            }
-        except GithubException as e:
+            if truncated:
+                logger.info("PR file list truncated", pr=pr_number, max_files=self.config.max_pr_files)
+            
+            details["diff"] = diff_content
+            details["files"] = [f["filename"] for f in files]
+            
+            # A failed diff download is not cached, so the next event retries it
+            if self.artifacts is not None and head_sha and diff_content.size:
+                self.artifacts.put(repo_name, pr_number, head_sha, PRArtifacts(
+                    diff=diff_content,
+                    files=tuple(details["files"]),
+                    additions=details["additions"],
+                    deletions=details["deletions"],
+                    changed_files=details["changed_files"]
+                ))
+            return details
+        except httpx.HTTPError as e:
             logger.error("GitHub API error getting PR", error=str(e))
             raise
     
+    async def _get_diff(self, repo_name: str, pr_number: int) -> DiffView:
+        """Stream the full diff into a view; prompts pack it into their token budget."""
+        try:
+            view = await self._stream_diff(f"/repos/{repo_name}/pulls/{pr_number}")
+        except httpx.HTTPError as e:
+            logger.warning("Could not fetch PR diff", error=str(e))
+            return DiffView(b"")
+        
+        if view.truncated:
+            logger.info(
+                "PR diff truncated",
+                pr=pr_number,
+                max_bytes=self.config.max_diff_bytes,
+                dropped=list(view.dropped)
+            )
+        return view
+    
+    async def get_compare_diff(self, repo_name: str, base: str, head: str) -> Optional[DiffView]:
+        """Diff between two commits, or None if GitHub cannot compare them."""
+        try:
+            return await self._stream_diff(f"/repos/{repo_name}/compare/{base}...{head}")
+        except httpx.HTTPError as e:
+            logger.warning("Could not fetch compare diff", base=base, head=head, error=str(e))
+            return None
+    
+    async def _stream_diff(self, url: str) -> DiffView:
+        """Stream a diff into a view; raises on HTTP errors.
+        
+        At most ``max_diff_bytes`` are read, and diffs over
+        ``diff_spill_bytes`` are kept in a temp file rather than in memory.
+        """
+        request = self._http.build_request("GET", url, headers={"Accept": "application/vnd.github.diff"})
+        async with self._host_slot(request.url.host):
+            response = await self._http.send(request, stream=True)
+            try:
+                self._record_rate_limit(response.headers)
+                response.raise_for_status()
+                return await read_diff(
+                    response.aiter_bytes(),
+                    max_bytes=self.config.max_diff_bytes,
+                    spill_bytes=self.config.diff_spill_bytes
+                )
+            finally:
+                await response.aclose()
+    
+    @staticmethod
+    def _pull_request_details(pr: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "number": pr["number"],
+            "title": pr["title"],
+            "body": pr.get("body") or "",
+            "user": pr["user"]["login"],
+            "state": pr["state"],
+            "labels": [label["name"] for label in pr.get("labels", [])],
+            "url": pr["html_url"],
+            "additions": pr["additions"],
+            "deletions": pr["deletions"],
+            "changed_files": pr["changed_files"]
+        }
+    
     async def post_issue_comment(self, repo_name: str, issue_number: int, comment: str) -> bool:
         """Post a comment on an issue."""
         try:
-            repo = self.client.get_repo(repo_name)
-            issue = repo.get_issue(issue_number)
-            issue.create_comment(comment)
+            await self._request(
+                "POST", f"/repos/{repo_name}/issues/{issue_number}/comments", json={"body": comment}
+            )
             
             logger.info("Posted comment on issue", repo=repo_name, issue=issue_number)
             return True
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.error("Failed to post issue comment", error=str(e))
             return False
     
     async def post_pr_comment(self, repo_name: str, pr_number: int, comment: str) -> bool:
         """Post a comment on a pull request."""
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
-            pr.create_issue_comment(comment)
+            await self._request(
+                "POST", f"/repos/{repo_name}/issues/{pr_number}/comments", json={"body": comment}
+            )
             
             logger.info("Posted comment on PR", repo=repo_name, pr=pr_number)
             return True
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.error("Failed to post PR comment", error=str(e))
             return False
     
-    async def add_issue_labels(self, repo_name: str, issue_number: int, labels: List[str]) -> bool:
-        """Add labels to an issue."""
+    async def create_comment(self, repo_name: str, issue_number: int, comment: str) -> Optional[int]:
+        """Post a comment on an issue or pull request and return its ID."""
         try:
-            repo = self.client.get_repo(repo_name)
-            issue = repo.get_issue(issue_number)
-            
-            # Get existing labels to avoid duplicates
-            existing_labels = {label.name for label in issue.labels}
-            new_labels = [label for label in labels if label not in existing_labels]
-            
-            if new_labels:
-                issue.add_to_labels(*new_labels)
-                logger.info("Added labels to issue", repo=repo_name, issue=issue_number, labels=new_labels)
+            response = await self._request(
+                "POST", f"/repos/{repo_name}/issues/{issue_number}/comments", json={"body": comment}
+            )
+            comment_id = response.json()["id"]
             
+            logger.info("Created comment", repo=repo_name, issue=issue_number, comment_id=comment_id)
+            return comment_id
+        except httpx.HTTPError as e:
+            logger.error("Failed to create comment", error=str(e))
+            return None
+    
+    async def update_comment(self, repo_name: str, issue_number: int, comment_id: int, comment: str) -> bool:
+        """Replace the body of an existing issue or pull request comment."""
+        try:
+            await self._request(
+                "PATCH", f"/repos/{repo_name}/issues/comments/{comment_id}", json={"body": comment}
+            )
             return True
-        except GithubException as e:
-            logger.error("Failed to add issue labels", error=str(e))
+        except httpx.HTTPError as e:
+            logger.error("Failed to update comment", comment_id=comment_id, error=str(e))
             return False
     
-    async def add_pr_labels(self, repo_name: str, pr_number: int, labels: List[str]) -> bool:
-        """Add labels to a pull request."""
+    async def delete_comment(self, repo_name: str, comment_id: int) -> bool:
+        """Delete an issue or pull request comment."""
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
-            
-            # Get existing labels to avoid duplicates
-            existing_labels = {label.name for label in pr.labels}
-            new_labels = [label for label in labels if label not in existing_labels]
-            
-            if new_labels:
-                pr.add_to_labels(*new_labels)
-                logger.info("Added labels to PR", repo=repo_name, pr=pr_number, labels=new_labels)
+            await self._request("DELETE", f"/repos/{repo_name}/issues/comments/{comment_id}")
             
+            logger.info("Deleted comment", repo=repo_name, comment_id=comment_id)
             return True
-        except GithubException as e:
-            logger.error("Failed to add PR labels", error=str(e))
+        except httpx.HTTPError as e:
+            logger.error("Failed to delete comment", comment_id=comment_id, error=str(e))
             return False
     
     async def close_issue(self, repo_name: str, issue_number: int, comment: Optional[str] = None) -> bool:
         """Close an issue."""
+        return await self.apply_mutations(IssueMutations(repo_name, issue_number).close(comment))
+    
+    async def apply_mutations(self, mutations: IssueMutations) -> bool:
+        """Apply a handler's writes to one issue or pull request.
+        
+        All new labels go in one request, concurrently with the comments;
+        comments are always posted before the issue is closed. Returns
+        whether every write succeeded.
+        """
+        writes = []
+        labels = mutations.new_labels()
+        if labels:
+            writes.append(self._post_labels(mutations.repo_name, mutations.number, labels))
+        if mutations.comments or mutations.close_issue:
+            writes.append(self._comment_and_close(mutations))
+        
+        return all(await asyncio.gather(*writes))
+    
+    async def _post_labels(self, repo_name: str, number: int, labels: List[str]) -> bool:
+        """Add labels; the endpoint leaves already-applied labels untouched."""
         try:
-            repo = self.client.get_repo(repo_name)
-            issue = repo.get_issue(issue_number)
-            
-            if comment:
-                issue.create_comment(comment)
-            
-            issue.edit(state="closed")
-            logger.info("Closed issue", repo=repo_name, issue=issue_number)
+            await self._request("POST", f"/repos/{repo_name}/issues/{number}/labels", json={"labels": labels})
+            logger.info("Added labels", repo=repo_name, number=number, labels=labels)
             return True
-        except GithubException as e:
-            logger.error("Failed to close issue", error=str(e))
+        except httpx.HTTPError as e:
+            logger.error("Failed to add labels", repo=repo_name, number=number, error=str(e))
             return False
     
+    async def _comment_and_close(self, mutations: IssueMutations) -> bool:
+        """Post the comments in order, then close; one GraphQL request when that saves calls."""
+        writes = len(mutations.comments) + mutations.close_issue
+        if self.config.graphql_mutations and mutations.node_id and writes > 1:
+            try:
+                return await self._graphql_comment_and_close(mutations)
+            except (httpx.ConnectError, httpx.HTTPStatusError) as e:
+                # Only a request that was never applied may be retried over REST
+                if isinstance(e, httpx.HTTPStatusError) and not e.response.is_client_error:
+                    logger.error("GraphQL mutation failed", number=mutations.number, error=str(e))
+                    return False
+                logger.warning("GraphQL mutation rejected, using REST", error=str(e))
+            except httpx.HTTPError as e:
+                logger.error("GraphQL mutation failed", number=mutations.number, error=str(e))
+                return False
+        
+        repo_name, number = mutations.repo_name, mutations.number
+        try:
+            for body in mutations.comments:
+                await self._request("POST", f"/repos/{repo_name}/issues/{number}/comments", json={"body": body})
+                logger.info("Posted comment", repo=repo_name, number=number)
+            if mutations.close_issue:
+                await self._request("PATCH", f"/repos/{repo_name}/issues/{number}", json={"state": "closed"})
+                logger.info("Closed issue", repo=repo_name, issue=number)
+            return True
+        except httpx.HTTPError as e:
+            logger.error("Failed to comment on or close issue", repo=repo_name, number=number, error=str(e))
+            return False
+    
+    async def _graphql_comment_and_close(self, mutations: IssueMutations) -> bool:
+        """Comments and close as one GraphQL document; its fields run in order."""
+        variables: Dict[str, Any] = {"subject": mutations.node_id}
+        params = ["$subject: ID!"]
+        fields = []
+        for index, body in enumerate(mutations.comments):
+            variables[f"body{index}"] = body
+            params.append(f"$body{index}: String!")
+            fields.append(
+                f"comment{index}: addComment(input: {{subjectId: $subject, body: $body{index}}}) "
+                "{ clientMutationId }"
+            )
+        if mutations.close_issue:
+            fields.append("close: closeIssue(input: {issueId: $subject}) { clientMutationId }")
+        
+        query = f"mutation({', '.join(params)}) {{\n  " + "\n  ".join(fields) + "\n}"
+        result = await self.graphql(query, variables)
+        
+        if self.cache is not None:
+            self.cache.invalidate_for_write(f"/repos/{mutations.repo_name}/issues/{mutations.number}")
+        
+        if result.get("errors"):
+            logger.error(
+                "GraphQL mutation reported errors",
+                repo=mutations.repo_name,
+                number=mutations.number,
+                errors=[error.get("message") for error in result["errors"]]
+            )
+            return False
+        logger.info(
+            "Applied comments and close",
+            repo=mutations.repo_name,
+            number=mutations.number,
+            comments=len(mutations.comments),
+            closed=mutations.close_issue
+        )
+        return True
+    
+    async def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a GraphQL query or mutation and return the response body."""
+        response = await self._request(
+            "POST", self._graphql_url(), json={"query": query, "variables": variables or {}}
+        )
+        return response.json()
+    
+    def _graphql_url(self) -> str:
+        if self.config.graphql_url:
+            return self.config.graphql_url
+        api_url = self.config.api_url.rstrip("/")
+        # GitHub Enterprise Server serves REST at /api/v3 and GraphQL at /api/graphql
+        if api_url.endswith("/api/v3"):
+            return api_url[:-len("/v3")] + "/graphql"
+        return api_url + "/graphql"
+    
     async def create_repository_labels(self, repo_name: str, labels: List[Dict[str, str]]) -> None:
         """Create repository labels if they don't exist."""
         try:
-            repo = self.client.get_repo(repo_name)
-            existing_labels = {label.name for label in repo.get_labels()}
+            existing_labels = {
+                label["name"] for label in await self._paginate(f"/repos/{repo_name}/labels")
+            }
             
             for label_info in labels:
                 if label_info["name"] not in existing_labels:
                     try:
-                        repo.create_label(
-                            name=label_info["name"],
-                            color=label_info.get("color", "ffffff"),
-                            description=label_info.get("description", "")
+                        await self._request(
+                            "POST",
+                            f"/repos/{repo_name}/labels",
+                            json={
+                                "name": label_info["name"],
+                                "color": label_info.get("color", "ffffff"),
+                                "description": label_info.get("description", "")
+                            }
                         )
                         logger.info("Created label", repo=repo_name, label=label_info["name"])
-                    except GithubException as e:
+                    except httpx.HTTPError as e:
                         logger.warning("Failed to create label", label=label_info["name"], error=str(e))
-        except GithubException as e:
+        except httpx.HTTPError as e:
             logger.error("Failed to setup repository labels", error=str(e))
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get client statistics."""
-        rate_limit = self.client.get_rate_limit()
+        """Get client statistics.
         
+        The rate limit is taken from the headers of the latest response, so
+        reading stats costs no API call.
+        """
         return {
             "requests_made": self._request_count,
             "rate_limit": {
-                "core": {
-                    "limit": rate_limit.core.limit,
-                    "remaining": rate_limit.core.remaining,
-                    "reset": rate_limit.core.reset.isoformat()
-                }
-            }
-        }
\ No newline at end of file
+                "core": dict(self._rate_limit)
+            },
+            "in_flight_by_host": dict(self._in_flight),
+            "etag_cache": self.cache.get_stats() if self.cache is not None else None,
+            "pr_artifacts": self.artifacts.get_stats() if self.artifacts is not None else None
+        }
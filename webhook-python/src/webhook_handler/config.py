@@ -3,9 +3,11 @@
 import os
 import yaml
 from typing import Dict, List, Optional, Any
-from pydantic import BaseSettings, Field
+from pydantic import BaseSettings, Field, PrivateAttr
 from pydantic_settings import SettingsConfigDict
 
+from .routing import RoutingDecision, RoutingTable
+
 
 class ServerConfig(BaseSettings):
     """Server configuration."""
@@ -18,13 +20,36 @@ class GitHubConfig(BaseSettings):
     """GitHub API configuration."""
     token: str = Field(..., env="GITHUB_TOKEN")
     webhook_secret: str = Field(..., env="GITHUB_WEBHOOK_SECRET")
+    comment_update_interval: float = 5.0
+    api_url: str = "https://api.github.com"
+    graphql_url: Optional[str] = None
+    graphql_mutations: bool = True
+    max_pr_files: int = 300
+    max_diff_bytes: int = 20 * 1024 * 1024
+    diff_spill_bytes: int = 1024 * 1024
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    max_connections_per_host: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
 
 
 class ClaudeConfig(BaseSettings):
     """Claude API configuration."""
     api_key: str = Field(..., env="ANTHROPIC_API_KEY")
     model: str = "claude-3-sonnet-20240229"
+    base_url: Optional[str] = None
     max_tokens: int = 4000
+    diff_token_budget: int = 12000
+    max_connections: int = 20
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    timeout: float = 120.0
+    connect_timeout: float = 10.0
+    requests_per_minute: int = 50
+    input_tokens_per_minute: int = 40000
+    output_tokens_per_minute: int = 8000
 
 
 class RepositoryConfig(BaseSettings):
@@ -38,6 +63,11 @@ class PromptsConfig(BaseSettings):
     """Prompts configuration."""
     base_dir: str = "./prompts"
     templates: Dict[str, Dict[str, str]] = {}
+    library_dirs: List[str] = []
+    index_refresh_seconds: float = 5.0
+    auto_reload: bool = True
+    cache_size: int = 400
+    bytecode_cache_dir: Optional[str] = None
 
 
 class OutputsConfig(BaseSettings):
@@ -61,6 +91,85 @@ class FeaturesConfig(BaseSettings):
     rate_limiting: bool = True
     signature_validation: bool = True
     payload_logging: bool = False
+    config_hot_reload: bool = True
+    streaming_responses: bool = False
+
+
+class QueueConfig(BaseSettings):
+    """Persistent job queue configuration."""
+    path: str = "./data/queue.db"
+    workers: int = 4
+    visibility_timeout: int = 900
+    max_attempts: int = 3
+    retry_delay: float = 30.0
+    poll_interval: float = 1.0
+
+
+class DedupConfig(BaseSettings):
+    """Delivery deduplication configuration."""
+    path: str = "./data/deliveries.db"
+    ttl_seconds: int = 259200
+    memory_entries: int = 10000
+
+
+class ResponseCacheConfig(BaseSettings):
+    """Claude response cache configuration."""
+    enabled: bool = True
+    path: str = "./data/responses.db"
+    ttl_seconds: int = 604800
+    max_size_mb: int = 256
+    memory_entries: int = 256
+
+
+class GitHubCacheConfig(BaseSettings):
+    """ETag cache for GitHub API reads."""
+    enabled: bool = True
+    memory_entries: int = 1024
+    disk_path: Optional[str] = None
+    disk_max_age_seconds: int = 86400
+    ttls: Dict[str, float] = {
+        "repository": 300,
+        "issue": 30,
+        "pull_request": 30,
+        "files": 60,
+        "labels": 300,
+        "default": 0
+    }
+
+
+class PRArtifactConfig(BaseSettings):
+    """Cache of PR diffs and file lists keyed by head SHA."""
+    enabled: bool = True
+    memory_max_mb: int = 64
+    disk_path: Optional[str] = None
+    disk_max_mb: int = 512
+
+
+class ReviewStateConfig(BaseSettings):
+    """Per-PR review records for incremental re-reviews."""
+    enabled: bool = True
+    path: str = "./data/reviews.db"
+    ttl_seconds: int = 2592000
+    prior_review_chars: int = 4000
+
+
+class LargePRConfig(BaseSettings):
+    """Map-reduce review of pull requests too large for one prompt."""
+    enabled: bool = True
+    group_token_budget: int = 12000
+    max_groups: int = 10
+    fan_out: int = 4
+
+
+class BatchConfig(BaseSettings):
+    """Message Batches lane configuration."""
+    enabled: bool = True
+    path: str = "./data/batches.db"
+    event_types: List[str] = []
+    window_seconds: float = 300.0
+    max_batch_size: int = 1000
+    poll_interval: float = 60.0
+    result_ttl_seconds: int = 86400
 
 
 class Settings(BaseSettings):
@@ -80,6 +189,25 @@ class Settings(BaseSettings):
     outputs: OutputsConfig = OutputsConfig()
     logging: LoggingConfig = LoggingConfig()
     features: FeaturesConfig = FeaturesConfig()
+    queue: QueueConfig = QueueConfig()
+    dedup: DedupConfig = DedupConfig()
+    response_cache: ResponseCacheConfig = ResponseCacheConfig()
+    github_cache: GitHubCacheConfig = GitHubCacheConfig()
+    pr_artifacts: PRArtifactConfig = PRArtifactConfig()
+    large_pr: LargePRConfig = LargePRConfig()
+    review_state: ReviewStateConfig = ReviewStateConfig()
+    batch: BatchConfig = BatchConfig()
+
+    _routing: RoutingTable = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        """Compile the repository routing table once at load."""
+        self._routing = RoutingTable(self.repositories)
+
+    @property
+    def routing(self) -> RoutingTable:
+        """Compiled repository routing table."""
+        return self._routing
 
     @classmethod
     def from_yaml(cls, config_path: str) -> "Settings":
@@ -107,14 +235,14 @@ class Settings(BaseSettings):
 
     def get_repository_config(self, repo_name: str) -> Optional[RepositoryConfig]:
         """Get configuration for a specific repository."""
-        for repo in self.repositories:
-            if repo.name == repo_name:
-                return repo
-        return None
+        route = self._routing.lookup(repo_name)
+        return route.config if route else None
 
     def is_event_enabled(self, repo_name: str, event_type: str) -> bool:
         """Check if an event type is enabled for a repository."""
-        repo_config = self.get_repository_config(repo_name)
-        if not repo_config:
-            return False
-        return event_type in repo_config.events
\ No newline at end of file
+        route = self._routing.lookup(repo_name)
+        return route is not None and event_type in route.events
+
+    def route(self, repo_name: str, event_type: str) -> RoutingDecision:
+        """Compute the routing decision for a delivery."""
+        return self._routing.decide(repo_name, event_type)
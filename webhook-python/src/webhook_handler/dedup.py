@@ -0,0 +1,118 @@
+"""Delivery-ID deduplication for GitHub webhook redeliveries."""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import DedupConfig
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    delivery_id TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_seen_at ON deliveries (seen_at);
+"""
+
+# Expired rows are purged from disk once every this many recorded deliveries
+_PURGE_EVERY = 500
+
+
+class DeliveryDeduplicator:
+    """Remembers recently seen delivery IDs.
+
+    Lookups go to an in-memory LRU first and fall back to an on-disk table,
+    so redeliveries are recognised across restarts.
+    """
+
+    def __init__(self, config: DedupConfig):
+        self.config = config
+        self.path = Path(config.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, float]" = OrderedDict()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._hits = 0
+        self._misses = 0
+        self._recorded = 0
+
+    def check_and_record(self, delivery_id: Optional[str]) -> bool:
+        """Return True if the delivery was already seen, otherwise record it."""
+        if not delivery_id:
+            return False
+
+        now = time.time()
+        cutoff = now - self.config.ttl_seconds
+
+        with self._lock:
+            seen_at = self._memory.get(delivery_id)
+            if seen_at is not None and seen_at > cutoff:
+                self._memory.move_to_end(delivery_id)
+                self._hits += 1
+                return True
+
+            row = self._conn.execute(
+                "SELECT seen_at FROM deliveries WHERE delivery_id = ?", (delivery_id,)
+            ).fetchone()
+            if row is not None and row[0] > cutoff:
+                self._remember(delivery_id, row[0])
+                self._hits += 1
+                return True
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO deliveries (delivery_id, seen_at) VALUES (?, ?)",
+                (delivery_id, now)
+            )
+            self._remember(delivery_id, now)
+            self._misses += 1
+
+            self._recorded += 1
+            if self._recorded % _PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM deliveries WHERE seen_at <= ?", (cutoff,))
+
+        return False
+
+    def forget(self, delivery_id: Optional[str]) -> None:
+        """Drop a delivery so that a redelivery is processed again."""
+        if not delivery_id:
+            return
+        with self._lock:
+            self._memory.pop(delivery_id, None)
+            self._conn.execute("DELETE FROM deliveries WHERE delivery_id = ?", (delivery_id,))
+
+    def _remember(self, delivery_id: str, seen_at: float) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry if full."""
+        self._memory[delivery_id] = seen_at
+        self._memory.move_to_end(delivery_id)
+        while len(self._memory) > self.config.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups > 0 else 0,
+            "cached_in_memory": len(self._memory),
+            "ttl_seconds": self.config.ttl_seconds
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,198 @@
+"""Token-budgeted assembly of pull request diffs for prompts."""
+
+from fnmatch import fnmatchcase
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .diff_view import DiffFile, DiffView
+from .rate_limit import estimate_tokens
+
+# Files that rarely matter for review: ranked after everything else
+LOW_PRIORITY_PATTERNS = (
+    "*package-lock.json", "*npm-shrinkwrap.json", "*yarn.lock", "*pnpm-lock.yaml",
+    "*poetry.lock", "*Pipfile.lock", "*uv.lock", "*Cargo.lock", "*go.sum",
+    "*composer.lock", "*Gemfile.lock", "*Podfile.lock", "*mix.lock",
+    "*.min.js", "*.min.css", "*.map", "*.snap", "*.svg",
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*", "*.g.dart",
+    "dist/*", "build/*", "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*",
+    "*/generated/*", "generated/*",
+)
+
+
+class Hunk(NamedTuple):
+    """One ``@@`` hunk of a file diff."""
+    text: str
+    tokens: int
+
+
+class FileDiff(NamedTuple):
+    """The diff of a single file, split into its header and hunks."""
+    path: str
+    header: str
+    hunks: Tuple[Hunk, ...]
+
+
+class DiffContext(NamedTuple):
+    """A diff packed into a token budget."""
+    text: str
+    tokens: int
+    included: Tuple[str, ...]
+    partial: Tuple[str, ...]
+    omitted: Tuple[str, ...]
+
+    @property
+    def complete(self) -> bool:
+        return not self.partial and not self.omitted
+
+    def omission_note(self) -> str:
+        """Markdown listing what did not fit, or an empty string."""
+        lines = []
+        if self.partial:
+            lines.append("Partially included (some hunks omitted): " + ", ".join(self.partial))
+        if self.omitted:
+            lines.append("Omitted to fit the context budget: " + ", ".join(self.omitted))
+        return "\n".join(lines)
+
+
+def is_low_priority(path: str) -> bool:
+    """Whether a path is a lockfile, generated or vendored file."""
+    return any(fnmatchcase(path, pattern) for pattern in LOW_PRIORITY_PATTERNS)
+
+
+def _file_diff(path: str, lines: List[str]) -> FileDiff:
+    header: List[str] = []
+    hunks: List[List[str]] = []
+
+    for line in lines:
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            header.append(line)
+
+    hunk_texts = ["\n".join(hunk) + "\n" for hunk in hunks]
+    return FileDiff(
+        path=path,
+        header="\n".join(header) + "\n",
+        hunks=tuple(Hunk(text, estimate_tokens(text)) for text in hunk_texts)
+    )
+
+
+def rank_entries(entries: Sequence[DiffFile]) -> List[DiffFile]:
+    """Order a DiffView's files by review relevance: source first, then by lines changed."""
+    return sorted(entries, key=lambda e: (is_low_priority(e.path), not e.has_hunks, -e.changed_lines))
+
+
+def _fit(file: FileDiff, remaining: int) -> Optional[Tuple[str, int, bool]]:
+    """The header and leading whole hunks of ``file`` that fit in ``remaining`` tokens.
+
+    Returns the text, its token cost and whether every hunk fit, or None
+    when not even the header and first hunk do.
+    """
+    cost = estimate_tokens(file.header)
+    if cost > remaining:
+        return None
+
+    hunks = []
+    for hunk in file.hunks:
+        if cost + hunk.tokens > remaining:
+            break
+        hunks.append(hunk)
+        cost += hunk.tokens
+
+    if file.hunks and not hunks:
+        return None
+    return file.header + "".join(hunk.text for hunk in hunks), cost, len(hunks) == len(file.hunks)
+
+
+def pack_view(view: DiffView, budget_tokens: int, entries: Optional[Sequence[DiffFile]] = None) -> DiffContext:
+    """Pack whole hunks of the most relevant files of ``view`` into ``budget_tokens``.
+
+    Files are considered in relevance order and never cut mid-hunk; a file
+    whose header and first hunk don't fit is omitted, but smaller files after
+    it may still be included. The packed files keep their original order.
+
+    Each file is decoded up to the bytes the remaining budget could hold
+    (a token is at least one byte per four characters), so memory use
+    follows the budget rather than the size of the diff. ``entries``
+    restricts packing to some of the view's files.
+    """
+    whole_view = entries is None
+    entries = view.files if entries is None else entries
+    remaining = budget_tokens
+    packed = {}
+    partial: List[str] = []
+
+    for entry in rank_entries(entries):
+        limit = remaining * 4 + 4
+        text = view.read(entry, limit)
+        if entry.size > limit:
+            # Drop the hunk the limit cut through
+            text = text[:text.rfind("\n@@") + 1]
+        if not text:
+            continue
+
+        file = _file_diff(entry.path, text.splitlines())
+        if entry.has_hunks and not file.hunks:
+            continue
+        fit = _fit(file, remaining)
+        if fit is None:
+            continue
+
+        packed[entry.path], cost, whole = fit
+        remaining -= cost
+        if not whole or entry.size > limit or not entry.complete:
+            partial.append(entry.path)
+
+    included = tuple(entry.path for entry in entries if entry.path in packed)
+    omitted = tuple(entry.path for entry in rank_entries(entries) if entry.path not in packed)
+    return DiffContext(
+        text="".join(packed[path] for path in included),
+        tokens=budget_tokens - remaining,
+        included=included,
+        partial=tuple(path for path in included if path in partial),
+        omitted=omitted + (view.dropped if whole_view else ())
+    )
+
+
+def _as_view(diff: Union[str, DiffView]) -> DiffView:
+    return diff if isinstance(diff, DiffView) else DiffView.from_text(diff)
+
+
+def assemble_diff(diff: Union[str, DiffView], budget_tokens: int) -> DiffContext:
+    """Pack a unified diff into ``budget_tokens``, most relevant files first."""
+    return pack_view(_as_view(diff), budget_tokens)
+
+
+def group_diff(
+    diff: Union[str, DiffView], group_budget: int, max_groups: int
+) -> Tuple[List[DiffContext], Tuple[str, ...]]:
+    """Split a diff into at most ``max_groups`` groups of ``group_budget`` tokens each.
+
+    Files are placed first-fit in relevance order; a file larger than a whole
+    group gets a group of its own and is packed hunk by hunk. Returns the
+    groups and the files that fit in none of them.
+    """
+    view = _as_view(diff)
+    groups: List[List[DiffFile]] = []
+    loads: List[int] = []
+    omitted: List[str] = []
+
+    for entry in rank_entries(view.files):
+        cost = min(entry.size // 4 + 1, group_budget)
+        for index, load in enumerate(loads):
+            if load + cost <= group_budget:
+                groups[index].append(entry)
+                loads[index] += cost
+                break
+        else:
+            if len(groups) < max_groups:
+                groups.append([entry])
+                loads.append(cost)
+            else:
+                omitted.append(entry.path)
+
+    return (
+        [pack_view(view, group_budget, sorted(group, key=lambda e: e.start)) for group in groups],
+        tuple(omitted) + view.dropped
+    )
@@ -0,0 +1,173 @@
+"""Memory-bounded, per-file indexed access to downloaded diffs."""
+
+import mmap
+import re
+import tempfile
+from typing import IO, AsyncIterator, List, NamedTuple, Optional, Tuple, Union
+
+
+_DIFF_GIT = re.compile(rb"^diff --git a/(.*) b/(.*)$")
+
+# Slice size for scans over a (possibly memory-mapped) diff
+_SCAN_CHUNK = 1024 * 1024
+
+
+class DiffFile(NamedTuple):
+    """Where one file's diff lies in a DiffView, and its change counts."""
+    path: str
+    start: int
+    end: int
+    has_hunks: bool
+    additions: int
+    deletions: int
+    # False when the download ceiling cut off the file's last hunks
+    complete: bool
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    @property
+    def changed_lines(self) -> int:
+        return self.additions + self.deletions
+
+
+class DiffView:
+    """A unified diff held in memory or in a memory-mapped temp file.
+
+    The diff is indexed by file when the view is created, so consumers
+    can read one file, or the first bytes of one, without decoding the
+    rest. A view cut off by the download ceiling ends at its last whole
+    hunk; a final file with no whole hunk is listed in ``dropped``.
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], truncated: bool = False, file: Optional[IO[bytes]] = None):
+        self._data = data
+        # Keeps the spilled temp file open for as long as the view lives
+        self._file = file
+        self.truncated = truncated
+        self.dropped: Tuple[str, ...] = ()
+        self.files = tuple(self._index())
+
+    @classmethod
+    def from_text(cls, text: str) -> "DiffView":
+        return cls(text.encode("utf-8"))
+
+    @classmethod
+    def from_file(cls, file: IO[bytes], truncated: bool = False) -> "DiffView":
+        file.flush()
+        if file.tell() == 0:
+            return cls(b"", truncated)
+        return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), truncated, file)
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def read(self, entry: DiffFile, limit: Optional[int] = None) -> str:
+        """Decode one file's diff, or its first ``limit`` bytes."""
+        end = entry.end if limit is None else min(entry.end, entry.start + limit)
+        return self._data[entry.start:end].decode("utf-8", errors="replace")
+
+    def text(self) -> str:
+        """Decode the whole diff, up to the cut if it was truncated."""
+        end = self.size
+        if self.truncated:
+            end = self.files[-1].end if self.files else 0
+        return self._data[:end].decode("utf-8", errors="replace")
+
+    def _count(self, needle: bytes, start: int, end: int) -> int:
+        """Count ``needle`` in a range, one bounded slice at a time."""
+        count = 0
+        overlap = len(needle) - 1
+        for offset in range(start, end, _SCAN_CHUNK):
+            count += self._data[max(start, offset - overlap):min(end, offset + _SCAN_CHUNK)].count(needle)
+        return count
+
+    def _file_starts(self, end: int) -> List[int]:
+        starts = []
+        position = self._data.find(b"diff --git ", 0, end)
+        while position != -1:
+            if position == 0 or self._data[position - 1:position] == b"\n":
+                starts.append(position)
+            position = self._data.find(b"diff --git ", position + 1, end)
+        return starts
+
+    def _index(self) -> List[DiffFile]:
+        data = self._data
+        end = len(data)
+        starts = self._file_starts(end)
+        complete_through = len(starts)
+
+        if self.truncated and starts:
+            # Stop at the last whole hunk; a final file without one is dropped
+            end = data.rfind(b"\n", 0, end) + 1
+            last = starts[-1]
+            first_hunk = data.find(b"\n@@", last, end)
+            last_hunk = data.rfind(b"\n@@", last, end)
+            if first_hunk != -1 and last_hunk > first_hunk:
+                end = last_hunk + 1
+                complete_through = len(starts) - 1
+            else:
+                end = last
+                line_end = data.find(b"\n", last, last + 4096)
+                match = _DIFF_GIT.match(data[last:line_end if line_end != -1 else last + 4096])
+                self.dropped = (match.group(2).decode("utf-8", errors="replace"),) if match else ()
+                starts.pop()
+                complete_through = len(starts)
+
+        files = []
+        for index, start in enumerate(starts):
+            file_end = starts[index + 1] if index + 1 < len(starts) else end
+            line_end = data.find(b"\n", start, file_end)
+            match = _DIFF_GIT.match(data[start:line_end if line_end != -1 else file_end])
+            if not match:
+                continue
+            path = match.group(2).decode("utf-8", errors="replace")
+            hunks = data.find(b"\n@@", start, file_end)
+            files.append(DiffFile(
+                path=path,
+                start=start,
+                end=file_end,
+                has_hunks=hunks != -1,
+                additions=self._count(b"\n+", hunks, file_end) if hunks != -1 else 0,
+                deletions=self._count(b"\n-", hunks, file_end) if hunks != -1 else 0,
+                complete=index < complete_through
+            ))
+        return files
+
+
+async def read_diff(chunks: AsyncIterator[bytes], max_bytes: int, spill_bytes: int) -> DiffView:
+    """Read a streamed diff into a view, keeping at most ``spill_bytes`` in memory.
+
+    Reading stops at ``max_bytes``; past ``spill_bytes`` the diff is
+    written to an anonymous temp file that the view memory-maps.
+    """
+    buffer = bytearray()
+    spill: Optional[IO[bytes]] = None
+    size = 0
+    truncated = False
+
+    async for chunk in chunks:
+        if size + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        if spill is None and size + len(chunk) > spill_bytes:
+            spill = tempfile.TemporaryFile()
+            spill.write(buffer)
+            buffer = bytearray()
+        if spill is not None:
+            spill.write(chunk)
+        else:
+            buffer += chunk
+        size += len(chunk)
+        if truncated:
+            break
+
+    if spill is not None:
+        return DiffView.from_file(spill, truncated)
+    return DiffView(bytes(buffer), truncated)
@@ -0,0 +1,216 @@
+"""ETag read-through cache for GitHub API reads."""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import httpx
+
+from .config import GitHubCacheConfig
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_fetched_at ON responses (fetched_at);
+"""
+
+# Resource kinds by API path; each kind has its own freshness TTL
+_RESOURCE_PATTERNS = (
+    ("files", re.compile(r"^/repos/[^/]+/[^/]+/pulls/\d+/files$")),
+    ("pull_request", re.compile(r"^/repos/[^/]+/[^/]+/pulls/\d+$")),
+    ("issue", re.compile(r"^/repos/[^/]+/[^/]+/issues/\d+$")),
+    ("labels", re.compile(r"^/repos/[^/]+/[^/]+/labels$")),
+    ("repository", re.compile(r"^/repos/[^/]+/[^/]+$")),
+)
+
+# Writes under an issue or PR change what is cached for both
+_ISSUE_OR_PULL = re.compile(r"^(/repos/[^/]+/[^/]+)/(?:issues|pulls)/(\d+)(?:/|$)")
+_LABELS = re.compile(r"^(/repos/[^/]+/[^/]+)/labels(?:/|$)")
+
+# Response headers kept with a cached body
+_KEPT_HEADERS = ("content-type", "etag", "link")
+
+
+def resource_kind(request: httpx.Request) -> str:
+    """Classify a GET request by the resource it reads."""
+    if "diff" in request.headers.get("accept", ""):
+        return "diff"
+    for kind, pattern in _RESOURCE_PATTERNS:
+        if pattern.match(request.url.path):
+            return kind
+    return "default"
+
+
+def request_key(request: httpx.Request) -> str:
+    """Cache key: path and query first so invalidation can match by prefix."""
+    query = request.url.query.decode("ascii")
+    return f"{request.url.path}?{query}|{request.headers.get('accept', '')}"
+
+
+class CachedResponse(NamedTuple):
+    """A stored 200 response and the ETag to revalidate it with."""
+    kind: str
+    etag: str
+    headers: Dict[str, str]
+    body: bytes
+    fetched_at: float
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers=self.headers, content=self.body, request=request)
+
+
+class ETagCache:
+    """In-memory LRU of GitHub responses with an optional SQLite tier.
+
+    Entries younger than their kind's TTL are served without a request;
+    older ones are revalidated with ``If-None-Match``, and a 304 (which
+    GitHub does not count against the rate limit) renews them.
+    """
+
+    def __init__(self, config: GitHubCacheConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if config.disk_path:
+            path = Path(config.disk_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+        self._fresh_hits = 0
+        self._revalidated = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._stores = 0
+
+    def ttl(self, kind: str) -> float:
+        return self.config.ttls.get(kind, self.config.ttls.get("default", 0))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up an entry in memory, then on disk."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT kind, etag, headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            entry = CachedResponse(row[0], row[1], json.loads(row[2]), row[3], row[4])
+            self._remember(key, entry)
+            return entry
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.fetched_at < self.ttl(entry.kind)
+
+    def record_fresh_hit(self) -> None:
+        self._fresh_hits += 1
+
+    def record_miss(self) -> None:
+        self._misses += 1
+
+    def revalidated(self, key: str, entry: CachedResponse) -> CachedResponse:
+        """Renew an entry after a 304."""
+        self._revalidated += 1
+        renewed = entry._replace(fetched_at=time.time())
+        self._write(key, renewed)
+        return renewed
+
+    def store(self, key: str, kind: str, response: httpx.Response) -> None:
+        """Cache a 200 response if it carries an ETag."""
+        etag = response.headers.get("etag")
+        if not etag:
+            return
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        self._write(key, CachedResponse(kind, etag, headers, response.content, time.time()))
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._remember(key, entry)
+            self._stores += 1
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, etag, headers, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry.kind, entry.etag, json.dumps(entry.headers), entry.body, entry.fetched_at)
+            )
+            if self._stores % 500 == 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE fetched_at <= ?",
+                    (time.time() - self.config.disk_max_age_seconds,)
+                )
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.memory_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate_for_write(self, path: str) -> None:
+        """Drop entries a write to ``path`` may have changed."""
+        match = _ISSUE_OR_PULL.match(path)
+        if match:
+            repo, number = match.groups()
+            prefixes = (f"{repo}/issues/{number}", f"{repo}/pulls/{number}")
+        else:
+            match = _LABELS.match(path)
+            if not match:
+                return
+            prefixes = (f"{match.group(1)}/labels",)
+
+        with self._lock:
+            stale = [
+                key for key in self._memory
+                if any(key.startswith(prefix + "?") or key.startswith(prefix + "/") for prefix in prefixes)
+            ]
+            for key in stale:
+                del self._memory[key]
+            if self._conn is not None:
+                for prefix in prefixes:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE substr(key, 1, ?) IN (?, ?)",
+                        (len(prefix) + 1, prefix + "?", prefix + "/")
+                    )
+            self._invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate and the API quota saved."""
+        lookups = self._fresh_hits + self._revalidated + self._misses
+        return {
+            "fresh_hits": self._fresh_hits,
+            "revalidated": self._revalidated,
+            "misses": self._misses,
+            "hit_rate": (self._fresh_hits + self._revalidated) / lookups if lookups > 0 else 0,
+            "saved_quota": self._fresh_hits + self._revalidated,
+            "invalidations": self._invalidations,
+            "cached_in_memory": len(self._memory)
+        }
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
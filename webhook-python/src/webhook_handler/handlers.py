@@ -1,14 +1,24 @@
 """Event-specific handlers for different GitHub webhook events."""
 
-import re
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
 from pathlib import Path
 
-from .clients import ClaudeClient, GitHubClient
-from .prompts import PromptLoader, create_prompt_context
-from .config import Settings
+from .batches import AnalysisDeferred
+from .clients import ClaudeClient, GitHubClient, is_retryable
+from .prompts import PromptLoader, RenderedPrompt, create_prompt_context
+from .config import RepositoryConfig, Settings
+from .diff_context import assemble_diff, group_diff
+from .diff_view import DiffView
 from .logging_config import get_logger
+from .mutations import IssueMutations
+from .payloads import WebhookEvent
+from .review_state import ReviewState, ReviewStateStore, review_summary, updated_comment
+from .routing import Route
+from .streaming import AnalysisStream, ProgressiveComment
+from .triage import TOOLS, Triage
 
 logger = get_logger(__name__)
 
@@ -16,79 +26,185 @@ logger = get_logger(__name__)
 class BaseHandler(ABC):
     """Base class for webhook event handlers."""
     
-    def __init__(self, settings: Settings, claude_client: ClaudeClient, github_client: GitHubClient, prompt_loader: PromptLoader):
+    # GitHub event type handled, used for per-event settings
+    event_type: str = ""
+    
+    def __init__(
+        self,
+        settings: Settings,
+        claude_client: ClaudeClient,
+        github_client: GitHubClient,
+        prompt_loader: PromptLoader,
+        review_state: Optional[ReviewStateStore] = None
+    ):
         self.settings = settings
         self.claude_client = claude_client
         self.github_client = github_client
         self.prompt_loader = prompt_loader
+        self.review_state = review_state
         self.outputs_dir = Path(settings.outputs.base_dir)
         self.outputs_dir.mkdir(parents=True, exist_ok=True)
     
     @abstractmethod
-    async def handle(self, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+    async def handle(
+        self, event: WebhookEvent, action: str, route: Optional[Route] = None
+    ) -> Dict[str, Any]:
         """Handle the webhook event."""
         pass
     
-    def extract_labels_from_analysis(self, analysis: str) -> List[str]:
-        """Extract suggested labels from Claude's analysis."""
-        labels = []
+    def get_repo_config(self, repo_name: str, route: Optional[Route] = None) -> Optional[RepositoryConfig]:
+        """Get the repository config from the delivery's route, looking it up only if absent."""
+        if route is not None:
+            return route.config
+        return self.settings.get_repository_config(repo_name)
+    
+    def use_response_cache(self, repo_config: Optional[RepositoryConfig]) -> bool:
+        """Whether cached Claude responses may be reused for this repository."""
+        return not repo_config or repo_config.settings.get("cache_analyses", True)
+    
+    def use_batch_lane(self) -> bool:
+        """Whether analyses for this event type go through the Message Batches lane."""
+        return (
+            self.claude_client.batch_lane is not None
+            and self.event_type in self.settings.batch.event_types
+        )
+    
+    def deferred(self, error: AnalysisDeferred) -> Dict[str, Any]:
+        """Result for a delivery waiting on the batch lane."""
+        return {"status": "deferred", "batch_key": error.key}
+    
+    def failed(self, error: Exception) -> Dict[str, Any]:
+        """Result for a delivery that failed unexpectedly; queued deliveries are retried if that is safe."""
+        return {"status": "error", "error": str(error), "retryable": is_retryable(error)}
+    
+    def progressive_comment(
+        self,
+        repo_config: Optional[RepositoryConfig],
+        repo_name: str,
+        number: int,
+        render: Callable[[str], str]
+    ) -> Optional[ProgressiveComment]:
+        """A comment to update while the analysis streams, if the repository opts in."""
+        if not (
+            self.settings.features.streaming_responses
+            and repo_config
+            and repo_config.settings.get("post_analysis_comments", True)
+            and repo_config.settings.get("progressive_comments", False)
+        ):
+            return None
+        return ProgressiveComment(
+            self.github_client, repo_name, number, render,
+            interval=self.settings.github.comment_update_interval
+        )
+    
+    async def analyze(
+        self,
+        prompt: RenderedPrompt,
+        claude_context: str,
+        repo_config: Optional[RepositoryConfig]
+    ) -> str:
+        """Analyze with Claude in real time, or through the batch lane for batched event types.
         
-        # Define label patterns
-        label_patterns = {
-            r'\bbug\b': 'bug',
-            r'\benhancement\b': 'enhancement',
-            r'\bquestion\b': 'question',
-            r'\bdocumentation\b': 'documentation',
-            r'\bmaintenance\b': 'maintenance',
-            r'\bhigh.priority\b|\bpriority.high\b': 'priority-high',
-            r'\bmedium.priority\b|\bpriority.medium\b': 'priority-medium',
-            r'\blow.priority\b|\bpriority.low\b': 'priority-low',
-            r'\beasy\b|\bdifficulty.easy\b': 'difficulty-easy',
-            r'\bmoderate\b|\bdifficulty.moderate\b': 'difficulty-moderate',
-            r'\bcomplex\b|\bdifficulty.complex\b': 'difficulty-complex',
-            r'\bfrontend\b|\bcomponent.frontend\b': 'component-frontend',
-            r'\bbackend\b|\bcomponent.backend\b': 'component-backend',
-            r'\bdatabase\b|\bcomponent.database\b': 'component-database'
-        }
+        Batched requests are sent without tools; their triage comes from
+        the fallback markers.
+        """
+        use_cache = self.use_response_cache(repo_config)
+        if self.use_batch_lane():
+            return await self.claude_client.analyze_batched(
+                prompt.dynamic, claude_context, use_cache=use_cache, system=prompt.static,
+                model=prompt.model, max_tokens=prompt.max_tokens, tools=self.tools_for(prompt)
+            )
+        return await self.claude_client.analyze(
+            prompt.dynamic, claude_context, use_cache=use_cache, system=prompt.static,
+            model=prompt.model, max_tokens=prompt.max_tokens, tools=self.tools_for(prompt)
+        )
+    
+    async def run_analysis(
+        self,
+        prompt: RenderedPrompt,
+        claude_context: str,
+        repo_config: Optional[RepositoryConfig],
+        analysis_file: Path,
+        comment: Optional[ProgressiveComment] = None
+    ) -> Tuple[str, bool]:
+        """Analyze with Claude and save the result to ``analysis_file``.
         
-        analysis_lower = analysis.lower()
-        for pattern, label in label_patterns.items():
-            if re.search(pattern, analysis_lower):
-                labels.append(label)
+        With streaming enabled the file is appended to as the response
+        arrives, and ``comment`` is updated along the way. Returns the
+        analysis and whether ``comment`` already holds it. Event types
+        routed to the batch lane raise AnalysisDeferred until their batch
+        has ended.
+        """
+        if self.use_batch_lane() or not self.settings.features.streaming_responses:
+            analysis = await self.analyze(prompt, claude_context, repo_config)
+            with open(analysis_file, 'w', encoding='utf-8') as f:
+                f.write(analysis)
+            return analysis, False
         
-        return list(set(labels))  # Remove duplicates
+        stream = AnalysisStream(analysis_file, comment)
+        await stream.open()
+        try:
+            analysis = await self.claude_client.analyze(
+                prompt.dynamic, claude_context, use_cache=self.use_response_cache(repo_config),
+                system=prompt.static, on_text=stream.write,
+                model=prompt.model, max_tokens=prompt.max_tokens, tools=self.tools_for(prompt)
+            )
+        except Exception:
+            await stream.close(failed=True)
+            raise
+        return analysis, await stream.close()
+    
+    def tools_for(self, prompt: RenderedPrompt) -> Optional[List[Dict[str, Any]]]:
+        """Definitions of the tools a prompt's frontmatter offers Claude."""
+        tools = []
+        for name in prompt.tools:
+            if name in TOOLS:
+                tools.append(TOOLS[name])
+            else:
+                logger.warning("Prompt names an unknown tool", tool=name)
+        return tools or None
+    
+    def extract_labels_from_analysis(self, analysis: str) -> List[str]:
+        """Extract suggested labels from Claude's analysis."""
+        return list(Triage.from_analysis(analysis).labels)
     
     def should_close_issue(self, analysis: str) -> bool:
         """Check if Claude recommends closing the issue."""
-        return "RECOMMENDATION: CLOSE ISSUE" in analysis
+        return Triage.from_analysis(analysis).close_issue
 
 
 class IssueHandler(BaseHandler):
     """Handler for GitHub issue events."""
     
-    async def handle(self, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+    event_type = "issues"
+    
+    async def handle(
+        self, event: WebhookEvent, action: str, route: Optional[Route] = None
+    ) -> Dict[str, Any]:
         """Handle issue events."""
         
         if action != "opened":
             return {"status": "ignored", "reason": f"action '{action}' not handled"}
         
-        issue = payload.get("issue", {})
-        issue_number = issue.get("number")
-        repository = payload.get("repository", {})
-        repo_name = repository.get("full_name")
+        issue = event.issue
+        if issue is None:
+            return {"status": "ignored", "reason": "no issue in payload"}
+        
+        issue_number = issue.number
+        repo_name = event.repository.full_name
+        repo_config = self.get_repo_config(repo_name, route)
         
         logger.info("Processing issue", repo=repo_name, issue=issue_number, action=action)
         
         try:
             # Check if already analyzed
-            labels = [label["name"] for label in issue.get("labels", [])]
-            if "clide-analyzed" in labels:
+            if "clide-analyzed" in issue.labels:
                 logger.info("Issue already analyzed", issue=issue_number)
                 return {"status": "skipped", "reason": "already analyzed"}
             
             # Load and render prompt
-            context = create_prompt_context("issues", payload)
-            prompt = self.prompt_loader.render_prompt("issues", action, context)
+            context = create_prompt_context("issues", event)
+            prompt = self.prompt_loader.render_prompt_parts("issues", action, context)
             
             if not prompt:
                 logger.error("No prompt found for issue", action=action)
@@ -100,35 +216,16 @@ class IssueHandler(BaseHandler):
 ## Issue Details
 - **Repository**: {repo_name}
 - **Issue Number**: #{issue_number}
-- **Title**: {issue.get('title', '')}
-- **URL**: {issue.get('html_url', '')}
-- **Author**: {issue.get('user', {}).get('login', '')}
+- **Title**: {issue.title}
+- **URL**: {issue.html_url}
+- **Author**: {issue.user}
 
 ## Issue Description
-{issue.get('body', '')}
+{issue.body}
 """
             
-            # Analyze with Claude
-            analysis = await self.claude_client.analyze(prompt, issue_context)
-            
-            # Save analysis
-            output_dir = self.outputs_dir / self.settings.outputs.directories["issues"]
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            analysis_file = output_dir / f"issue_{issue_number}_analysis.md"
-            with open(analysis_file, 'w', encoding='utf-8') as f:
-                f.write(analysis)
-            
-            # Extract labels and post comment
-            repo_config = self.settings.get_repository_config(repo_name)
-            if repo_config and repo_config.settings.get("apply_labels", True):
-                suggested_labels = self.extract_labels_from_analysis(analysis)
-                if suggested_labels:
-                    await self.github_client.add_issue_labels(repo_name, issue_number, suggested_labels)
-            
-            # Post analysis comment
-            if repo_config and repo_config.settings.get("post_analysis_comments", True):
-                comment = f"""## 🤖 Automated Issue Analysis
+            def render_comment(analysis: str) -> str:
+                return f"""## 🤖 Automated Issue Analysis
 
 Hi! I've automatically analyzed this issue using Claude Code. Here's my assessment:
 
@@ -141,13 +238,37 @@ Hi! I've automatically analyzed this issue using Claude Code. Here's my assessme
 *This analysis was generated automatically by the PromptForge webhook system. The suggestions above are AI-generated and should be reviewed by a human maintainer.*
 
 *Issue analyzed at: {context.get('timestamp', 'unknown')}*"""
-                
-                await self.github_client.post_issue_comment(repo_name, issue_number, comment)
+            
+            output_dir = self.outputs_dir / self.settings.outputs.directories["issues"]
+            output_dir.mkdir(parents=True, exist_ok=True)
+            analysis_file = output_dir / f"issue_{issue_number}_analysis.md"
+            
+            # Analyze with Claude and save the analysis
+            analysis, commented = await self.run_analysis(
+                prompt, issue_context, repo_config, analysis_file,
+                comment=self.progressive_comment(repo_config, repo_name, issue_number, render_comment)
+            )
+            
+            # Collect the writes to apply them in as few calls as possible
+            writes = IssueMutations(
+                repo_name, issue_number, node_id=issue.node_id or None, existing_labels=issue.labels
+            )
+            
+            # Extract labels and post comment
+            triage = Triage.from_analysis(analysis)
+            if repo_config and repo_config.settings.get("apply_labels", True):
+                suggested_labels = list(triage.labels)
+                writes.add_labels(suggested_labels)
+            
+            # Post analysis comment
+            if (not commented and repo_config and
+                    repo_config.settings.get("post_analysis_comments", True)):
+                writes.comment(render_comment(analysis))
             
             # Check if should close
             if (repo_config and 
                 repo_config.settings.get("auto_close_invalid", False) and 
-                self.should_close_issue(analysis)):
+                triage.close_issue):
                 
                 close_comment = """## Issue Closed by Automated Analysis
 
@@ -157,10 +278,11 @@ If you believe this was closed in error, please feel free to provide additional
 
 Thank you for your interest in the project!"""
                 
-                await self.github_client.close_issue(repo_name, issue_number, close_comment)
+                writes.close(close_comment)
             
             # Mark as analyzed
-            await self.github_client.add_issue_labels(repo_name, issue_number, ["clide-analyzed"])
+            writes.add_labels(["clide-analyzed"])
+            await self.github_client.apply_mutations(writes)
             
             logger.info("Issue analysis completed", issue=issue_number)
             
@@ -171,56 +293,77 @@ Thank you for your interest in the project!"""
                 "labels_applied": suggested_labels if repo_config and repo_config.settings.get("apply_labels") else []
             }
             
+        except AnalysisDeferred as e:
+            return self.deferred(e)
         except Exception as e:
             logger.error("Error processing issue", issue=issue_number, error=str(e), exc_info=True)
-            return {"status": "error", "error": str(e)}
+            return self.failed(e)
 
 
 class PullRequestHandler(BaseHandler):
     """Handler for GitHub pull request events."""
     
-    async def handle(self, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+    event_type = "pull_request"
+    
+    async def handle(
+        self, event: WebhookEvent, action: str, route: Optional[Route] = None
+    ) -> Dict[str, Any]:
         """Handle pull request events."""
         
         if action not in ["opened", "synchronize"]:
             return {"status": "ignored", "reason": f"action '{action}' not handled"}
         
-        pr = payload.get("pull_request", {})
-        pr_number = pr.get("number")
-        repository = payload.get("repository", {})
-        repo_name = repository.get("full_name")
+        pr = event.pull_request
+        if pr is None:
+            return {"status": "ignored", "reason": "no pull request in payload"}
+        
+        pr_number = pr.number
+        repo_name = event.repository.full_name
+        repo_config = self.get_repo_config(repo_name, route)
         
         logger.info("Processing PR", repo=repo_name, pr=pr_number, action=action)
         
         try:
-            # Get full PR details including diff
-            pr_details = await self.github_client.get_pull_request(repo_name, pr_number)
+            # Pushes to a reviewed PR are reviewed from the delta alone
+            previous = None
+            if action == "synchronize" and self.review_state is not None and pr.head_sha:
+                previous = self.review_state.get(repo_name, pr_number)
+            if previous is not None and previous.head_sha == pr.head_sha:
+                return {"status": "skipped", "reason": "head already reviewed"}
+            if previous is not None:
+                result = await self.review_increment(event, repo_config, previous)
+                if result is not None:
+                    return result
+            
+            # Complete the payload's PR details with the diff and file list
+            pr_details = await self.github_client.get_pull_request(repo_name, pr_number, known=pr)
             
             # Load and render prompt
-            context = create_prompt_context("pull_request", payload)
-            context.update(pr_details)  # Add detailed PR info
+            context = create_prompt_context("pull_request", event, pr_details)
+            
+            diff = assemble_diff(pr_details.get('diff', ''), self.settings.claude.diff_token_budget)
             
             prompt_action = "new_pr" if action == "opened" else "pr_updated"
-            prompt = self.prompt_loader.render_prompt("pull_request", prompt_action, context)
+            prompt = self.prompt_loader.render_prompt_parts("pull_request", prompt_action, context)
             
             if not prompt:
                 logger.error("No prompt found for PR", action=action)
                 return {"status": "error", "reason": "no prompt template"}
             
             # Create context for Claude
-            pr_context = f"""# GitHub Pull Request Analysis Request
+            pr_header = f"""# GitHub Pull Request Analysis Request
 
 ## PR Details
 - **Repository**: {repo_name}
 - **PR Number**: #{pr_number}
-- **Title**: {pr.get('title', '')}
-- **URL**: {pr.get('html_url', '')}
-- **Author**: {pr.get('user', {}).get('login', '')}
-- **State**: {pr.get('state', '')}
-- **Draft**: {pr.get('draft', False)}
+- **Title**: {pr.title}
+- **URL**: {pr.html_url}
+- **Author**: {pr.user}
+- **State**: {pr.state}
+- **Draft**: {pr.draft}
 
 ## PR Description
-{pr.get('body', '')}
+{pr.body}
 
 ## Files Changed
 {', '.join(pr_details.get('files', []))}
@@ -229,28 +372,29 @@ class PullRequestHandler(BaseHandler):
 - **Additions**: {pr_details.get('additions', 0)}
 - **Deletions**: {pr_details.get('deletions', 0)}
 - **Changed Files**: {pr_details.get('changed_files', 0)}
-
-## Code Diff (truncated)
+"""
+            
+            # Diffs over the budget are reviewed in parts and merged
+            parts = None
+            if not diff.complete and self.settings.large_pr.enabled:
+                parts = await self.review_in_parts(
+                    pr_header, pr_details.get('diff', ''), context, repo_config
+                )
+            
+            if parts is not None:
+                prompt, pr_context, part_stats = parts
+            else:
+                part_stats = []
+                pr_context = f"""{pr_header}
+## Code Diff
 ```diff
-{pr_details.get('diff', '')[:5000]}...
+{diff.text}
 ```
+{diff.omission_note()}
 """
             
-            # Analyze with Claude
-            analysis = await self.claude_client.analyze(prompt, pr_context)
-            
-            # Save analysis
-            output_dir = self.outputs_dir / self.settings.outputs.directories["pull_requests"]
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            analysis_file = output_dir / f"pr_{pr_number}_analysis.md"
-            with open(analysis_file, 'w', encoding='utf-8') as f:
-                f.write(analysis)
-            
-            # Post analysis comment
-            repo_config = self.settings.get_repository_config(repo_name)
-            if repo_config and repo_config.settings.get("post_analysis_comments", True):
-                comment = f"""## 🔍 Automated PR Review
+            def render_comment(analysis: str) -> str:
+                return f"""## 🔍 Automated PR Review
 
 Hi! I've automatically reviewed this pull request using Claude Code. Here's my assessment:
 
@@ -263,28 +407,214 @@ Hi! I've automatically reviewed this pull request using Claude Code. Here's my a
 *This review was generated automatically by the PromptForge webhook system. The suggestions above are AI-generated and should be reviewed by a human maintainer.*
 
 *PR analyzed at: {context.get('timestamp', 'unknown')}*"""
-                
-                await self.github_client.post_pr_comment(repo_name, pr_number, comment)
             
-            # Apply PR labels if configured
-            if repo_config and repo_config.settings.get("apply_labels", True):
-                # Extract PR-specific labels (size, type, etc.)
-                pr_labels = self._extract_pr_labels(analysis, pr_details)
-                if pr_labels:
-                    await self.github_client.add_pr_labels(repo_name, pr_number, pr_labels)
+            output_dir = self.outputs_dir / self.settings.outputs.directories["pull_requests"]
+            output_dir.mkdir(parents=True, exist_ok=True)
+            analysis_file = output_dir / f"pr_{pr_number}_analysis.md"
             
-            logger.info("PR analysis completed", pr=pr_number)
+            # Analyze with Claude and save the analysis
+            comment = self.progressive_comment(repo_config, repo_name, pr_number, render_comment)
+            analysis, commented = await self.run_analysis(
+                prompt, pr_context, repo_config, analysis_file, comment=comment
+            )
             
-            return {
+            # Post the comment and apply PR labels concurrently
+            labels = IssueMutations(
+                repo_name, pr_number, node_id=pr.node_id or None, existing_labels=pr.labels
+            )
+            if repo_config and repo_config.settings.get("apply_labels", True):
+                # Extract PR-specific labels (size, type, etc.)
+                labels.add_labels(self._extract_pr_labels(analysis, pr_details))
+            
+            body = render_comment(analysis)
+            comment_id = comment.comment_id if commented else None
+            post = (not commented and repo_config and
+                    repo_config.settings.get("post_analysis_comments", True))
+            writes = []
+            if post:
+                writes.append(self.github_client.create_comment(repo_name, pr_number, body))
+            if not labels.empty:
+                writes.append(self.github_client.apply_mutations(labels))
+            if writes:
+                results = await asyncio.gather(*writes)
+                if post:
+                    comment_id = results[0]
+            
+            if self.review_state is not None and pr.head_sha:
+                self.review_state.record(repo_name, pr_number, pr.head_sha, analysis, comment_id, body)
+            
+            logger.info("PR analysis completed", pr=pr_number, parts=len(part_stats))
+            
+            result = {
                 "status": "success",
                 "pr_number": pr_number,
                 "analysis_file": str(analysis_file),
                 "action": action
             }
+            if part_stats:
+                result["parts"] = part_stats
+            return result
             
+        except AnalysisDeferred as e:
+            return self.deferred(e)
         except Exception as e:
             logger.error("Error processing PR", pr=pr_number, error=str(e), exc_info=True)
-            return {"status": "error", "error": str(e)}
+            return self.failed(e)
+    
+    async def review_increment(
+        self,
+        event: WebhookEvent,
+        repo_config: Optional[RepositoryConfig],
+        previous: ReviewState
+    ) -> Optional[Dict[str, Any]]:
+        """Review only the commits pushed since ``previous``.
+        
+        Claude gets the compare diff and a summary of the previous review,
+        and the update replaces any earlier one in the existing bot comment. Returns
+        None, for a full review instead, when the template is missing or
+        GitHub cannot compare the two heads (e.g. after a force-push).
+        """
+        pr = event.pull_request
+        repo_name = event.repository.full_name
+        old, new = previous.head_sha[:7], pr.head_sha[:7]
+        
+        context = create_prompt_context("pull_request", event)
+        context.update({"previous_head_sha": previous.head_sha, "head_sha": pr.head_sha})
+        prompt = self.prompt_loader.render_prompt_parts("pull_request", "incremental_review", context)
+        if not prompt:
+            return None
+        
+        delta_view = await self.github_client.get_compare_diff(repo_name, previous.head_sha, pr.head_sha)
+        if delta_view is None:
+            return None
+        delta = assemble_diff(delta_view, self.settings.claude.diff_token_budget)
+        
+        review_context = f"""# GitHub Pull Request Update Review Request
+
+## PR Details
+- **Repository**: {repo_name}
+- **PR Number**: #{pr.number}
+- **Title**: {pr.title}
+- **URL**: {pr.html_url}
+- **Author**: {pr.user}
+
+## Previous Review (at {old})
+{review_summary(previous.analysis, self.settings.review_state.prior_review_chars)}
+
+## Changes Since Previous Review ({old}..{new})
+```diff
+{delta.text}
+```
+{delta.omission_note()}
+"""
+        
+        output_dir = self.outputs_dir / self.settings.outputs.directories["pull_requests"]
+        output_dir.mkdir(parents=True, exist_ok=True)
+        analysis_file = output_dir / f"pr_{pr.number}_update_{new}.md"
+        
+        analysis, _ = await self.run_analysis(prompt, review_context, repo_config, analysis_file)
+        
+        body = updated_comment(previous.comment_body, new, analysis)
+        comment_id = previous.comment_id
+        if repo_config and repo_config.settings.get("post_analysis_comments", True):
+            updated = comment_id is not None and await self.github_client.update_comment(
+                repo_name, pr.number, comment_id, body
+            )
+            if not updated:
+                comment_id = await self.github_client.create_comment(repo_name, pr.number, body)
+        
+        if repo_config and repo_config.settings.get("apply_labels", True):
+            labels = IssueMutations(repo_name, pr.number, existing_labels=pr.labels)
+            stats = {"additions": pr.additions or 0, "deletions": pr.deletions or 0}
+            labels.add_labels(self._extract_pr_labels(analysis, stats))
+            if not labels.empty:
+                await self.github_client.apply_mutations(labels)
+        
+        self.review_state.record(repo_name, pr.number, pr.head_sha, analysis, comment_id, body)
+        logger.info("PR update reviewed", pr=pr.number, base=old, head=new, delta_tokens=delta.tokens)
+        
+        return {
+            "status": "success",
+            "pr_number": pr.number,
+            "analysis_file": str(analysis_file),
+            "action": "synchronize",
+            "incremental": True,
+            "base_sha": previous.head_sha,
+            "delta_tokens": delta.tokens
+        }
+    
+    async def review_in_parts(
+        self,
+        pr_header: str,
+        diff: Union[str, DiffView],
+        context: Dict[str, Any],
+        repo_config: Optional[RepositoryConfig]
+    ) -> Optional[Tuple[RenderedPrompt, str, List[Dict[str, Any]]]]:
+        """Map-reduce review of a diff too large for one prompt.
+        
+        The diff is split into file groups that are reviewed concurrently,
+        at most ``large_pr.fan_out`` at a time. Returns the merge prompt, a
+        context holding the partial reviews and per-part statistics, or None
+        if the part templates are not configured.
+        """
+        chunk_prompt = self.prompt_loader.render_prompt_parts("pull_request", "review_chunk", context)
+        merge_prompt = self.prompt_loader.render_prompt_parts("pull_request", "review_merge", context)
+        if not chunk_prompt or not merge_prompt:
+            logger.warning("No large PR templates, reviewing the packed diff only")
+            return None
+        
+        config = self.settings.large_pr
+        groups, omitted = group_diff(diff, config.group_token_budget, config.max_groups)
+        slots = asyncio.Semaphore(config.fan_out)
+        
+        async def review_part(index: int) -> Tuple[str, float]:
+            group = groups[index]
+            part_context = f"""{pr_header}
+## Part {index + 1} of {len(groups)}
+Files: {', '.join(group.included)}
+
+## Code Diff
+```diff
+{group.text}
+```
+{group.omission_note()}
+"""
+            async with slots:
+                started = time.monotonic()
+                analysis = await self.analyze(chunk_prompt, part_context, repo_config)
+                latency = time.monotonic() - started
+            
+            logger.info("Reviewed PR part", part=index + 1, files=len(group.included), latency=f"{latency:.2f}s")
+            return analysis, latency
+        
+        results = await asyncio.gather(
+            *(review_part(index) for index in range(len(groups))), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # A deferred part means the batch lane will re-run this delivery
+            raise next((e for e in errors if isinstance(e, AnalysisDeferred)), errors[0])
+        
+        sections = "\n\n".join(
+            f"### Part {index + 1}: {', '.join(group.included)}\n\n{analysis}"
+            for index, (group, (analysis, _)) in enumerate(zip(groups, results))
+        )
+        not_reviewed = sorted(set(omitted).union(*(group.omitted for group in groups)))
+        partly_reviewed = sorted(set().union(*(group.partial for group in groups)))
+        merge_context = f"""{pr_header}
+## Partial Reviews
+{sections}
+"""
+        if not_reviewed:
+            merge_context += f"\n## Not Reviewed\n{', '.join(not_reviewed)}\n"
+        if partly_reviewed:
+            merge_context += f"\n## Partly Reviewed (some hunks omitted)\n{', '.join(partly_reviewed)}\n"
+        
+        part_stats = [
+            {"files": len(group.included), "tokens": group.tokens, "latency": latency}
+            for group, (_, latency) in zip(groups, results)
+        ]
+        return merge_prompt, merge_context, part_stats
     
     def _extract_pr_labels(self, analysis: str, pr_details: Dict[str, Any]) -> List[str]:
         """Extract PR-specific labels."""
@@ -299,16 +629,10 @@ Hi! I've automatically reviewed this pull request using Claude Code. Here's my a
         else:
             labels.append('size/large')
         
-        # Type labels from analysis
-        analysis_lower = analysis.lower()
-        if 'bug' in analysis_lower or 'fix' in analysis_lower:
-            labels.append('type/bug-fix')
-        elif 'feature' in analysis_lower or 'enhancement' in analysis_lower:
-            labels.append('type/feature')
-        elif 'refactor' in analysis_lower:
-            labels.append('type/refactor')
-        elif 'documentation' in analysis_lower or 'docs' in analysis_lower:
-            labels.append('type/docs')
+        # Type label from Claude's triage
+        change_type = Triage.from_analysis(analysis).change_type
+        if change_type:
+            labels.append(f'type/{change_type}')
         
         return labels
 
@@ -316,34 +640,39 @@ Hi! I've automatically reviewed this pull request using Claude Code. Here's my a
 class ReviewHandler(BaseHandler):
     """Handler for GitHub pull request review events."""
     
-    async def handle(self, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+    event_type = "pull_request_review"
+    
+    async def handle(
+        self, event: WebhookEvent, action: str, route: Optional[Route] = None
+    ) -> Dict[str, Any]:
         """Handle review request events."""
         
-        pr = payload.get("pull_request", {})
-        pr_number = pr.get("number")
-        repository = payload.get("repository", {})
-        repo_name = repository.get("full_name")
+        pr = event.pull_request
+        repo_name = event.repository.full_name
+        repo_config = self.get_repo_config(repo_name, route)
         
         # Handle review requests
-        if "requested_reviewer" in payload:
-            reviewer = payload.get("requested_reviewer", {}).get("login", "")
-            requester = payload.get("sender", {}).get("login", "")
+        if event.requested_reviewer is not None and pr is not None:
+            pr_number = pr.number
+            reviewer = event.requested_reviewer
+            requester = event.sender
             
             logger.info("Processing review request", repo=repo_name, pr=pr_number, reviewer=reviewer)
             
             try:
-                # Get full PR details
-                pr_details = await self.github_client.get_pull_request(repo_name, pr_number)
+                # Complete the payload's PR details with the diff and file list
+                pr_details = await self.github_client.get_pull_request(repo_name, pr_number, known=pr)
                 
                 # Load and render prompt
-                context = create_prompt_context("pull_request_review", payload)
-                context.update(pr_details)
+                context = create_prompt_context("pull_request_review", event, pr_details)
                 context.update({
                     "reviewer": reviewer,
                     "requester": requester
                 })
                 
-                prompt = self.prompt_loader.render_prompt("pull_request_review", "requested", context)
+                diff = assemble_diff(pr_details.get('diff', ''), self.settings.claude.diff_token_budget)
+                
+                prompt = self.prompt_loader.render_prompt_parts("pull_request_review", "requested", context)
                 
                 if not prompt:
                     logger.error("No prompt found for review request")
@@ -355,40 +684,26 @@ class ReviewHandler(BaseHandler):
 ## Review Request Details
 - **Repository**: {repo_name}
 - **PR Number**: #{pr_number}
-- **PR Title**: {pr.get('title', '')}
-- **PR Author**: {pr.get('user', {}).get('login', '')}
+- **PR Title**: {pr.title}
+- **PR Author**: {pr.user}
 - **Reviewer Requested**: {reviewer}
 - **Requested By**: {requester}
 
 ## PR Description
-{pr.get('body', '')}
+{pr.body}
 
 ## Files to Review
 {', '.join(pr_details.get('files', []))}
 
 ## Code Changes
 ```diff
-{pr_details.get('diff', '')[:8000]}...
+{diff.text}
 ```
+{diff.omission_note()}
 """
                 
-                # Analyze with Claude
-                analysis = await self.claude_client.analyze(prompt, review_context)
-                
-                # Save analysis
-                output_dir = self.outputs_dir / self.settings.outputs.directories["reviews"]
-                output_dir.mkdir(parents=True, exist_ok=True)
-                
-                import time
-                timestamp = int(time.time())
-                analysis_file = output_dir / f"pr_{pr_number}_review_{timestamp}.md"
-                with open(analysis_file, 'w', encoding='utf-8') as f:
-                    f.write(analysis)
-                
-                # Post review comment
-                repo_config = self.settings.get_repository_config(repo_name)
-                if repo_config and repo_config.settings.get("post_analysis_comments", True):
-                    comment = f"""## 👁️ Automated Code Review
+                def render_comment(analysis: str) -> str:
+                    return f"""## 👁️ Automated Code Review
 
 A review was requested from **{reviewer}**. Here's an automated analysis to help with the review:
 
@@ -401,8 +716,25 @@ A review was requested from **{reviewer}**. Here's an automated analysis to help
 *This review was generated automatically by the PromptForge webhook system. The suggestions above are AI-generated and should supplement, not replace, human code review.*
 
 *Review analysis completed at: {context.get('timestamp', 'unknown')}*"""
-                    
-                    await self.github_client.post_pr_comment(repo_name, pr_number, comment)
+                
+                output_dir = self.outputs_dir / self.settings.outputs.directories["reviews"]
+                output_dir.mkdir(parents=True, exist_ok=True)
+                
+                timestamp = int(time.time())
+                analysis_file = output_dir / f"pr_{pr_number}_review_{timestamp}.md"
+                
+                # Analyze with Claude and save the analysis
+                analysis, commented = await self.run_analysis(
+                    prompt, review_context, repo_config, analysis_file,
+                    comment=self.progressive_comment(repo_config, repo_name, pr_number, render_comment)
+                )
+                
+                # Post review comment
+                if (not commented and repo_config and
+                        repo_config.settings.get("post_analysis_comments", True)):
+                    await self.github_client.post_pr_comment(
+                        repo_name, pr_number, render_comment(analysis)
+                    )
                 
                 logger.info("Review analysis completed", pr=pr_number, reviewer=reviewer)
                 
@@ -413,9 +745,11 @@ A review was requested from **{reviewer}**. Here's an automated analysis to help
                     "analysis_file": str(analysis_file)
                 }
                 
+            except AnalysisDeferred as e:
+                return self.deferred(e)
             except Exception as e:
                 logger.error("Error processing review request", pr=pr_number, error=str(e), exc_info=True)
-                return {"status": "error", "error": str(e)}
+                return self.failed(e)
         
         return {"status": "ignored", "reason": "not a review request"}
 
@@ -423,29 +757,35 @@ A review was requested from **{reviewer}**. Here's an automated analysis to help
 class WorkflowHandler(BaseHandler):
     """Handler for GitHub workflow events."""
     
-    async def handle(self, payload: Dict[str, Any], action: str) -> Dict[str, Any]:
+    event_type = "workflow_run"
+    
+    async def handle(
+        self, event: WebhookEvent, action: str, route: Optional[Route] = None
+    ) -> Dict[str, Any]:
         """Handle workflow events."""
         
         if action != "completed":
             return {"status": "ignored", "reason": f"action '{action}' not handled"}
         
-        workflow_run = payload.get("workflow_run", {})
-        conclusion = workflow_run.get("conclusion")
+        workflow_run = event.workflow_run
+        if workflow_run is None:
+            return {"status": "ignored", "reason": "no workflow run in payload"}
         
+        conclusion = workflow_run.conclusion
         if conclusion != "failure":
             return {"status": "ignored", "reason": f"conclusion '{conclusion}' not handled"}
         
-        workflow_name = workflow_run.get("name", "")
-        workflow_id = workflow_run.get("id")
-        repository = payload.get("repository", {})
-        repo_name = repository.get("full_name")
+        workflow_name = workflow_run.name
+        workflow_id = workflow_run.id
+        repo_name = event.repository.full_name
+        repo_config = self.get_repo_config(repo_name, route)
         
         logger.info("Processing failed workflow", repo=repo_name, workflow=workflow_name, run_id=workflow_id)
         
         try:
             # Load and render prompt
-            context = create_prompt_context("workflow_run", payload)
-            prompt = self.prompt_loader.render_prompt("workflow_run", "completed", context)
+            context = create_prompt_context("workflow_run", event)
+            prompt = self.prompt_loader.render_prompt_parts("workflow_run", "completed", context)
             
             if not prompt:
                 logger.error("No prompt found for workflow failure")
@@ -459,26 +799,22 @@ class WorkflowHandler(BaseHandler):
 - **Workflow**: {workflow_name}
 - **Run ID**: {workflow_id}
 - **Conclusion**: {conclusion}
-- **Commit**: {workflow_run.get('head_sha', '')}
-- **Branch**: {workflow_run.get('head_branch', '')}
+- **Commit**: {workflow_run.head_sha}
+- **Branch**: {workflow_run.head_branch}
 
 ## Workflow URL
-{workflow_run.get('html_url', '')}
+{workflow_run.html_url}
 
 ## Commit Message
-{workflow_run.get('head_commit', {}).get('message', '')}
+{workflow_run.head_commit_message}
 """
             
-            # Analyze with Claude
-            analysis = await self.claude_client.analyze(prompt, workflow_context)
-            
-            # Save analysis
             output_dir = self.outputs_dir / self.settings.outputs.directories["workflows"]
             output_dir.mkdir(parents=True, exist_ok=True)
-            
             analysis_file = output_dir / f"workflow_{workflow_id}_analysis.md"
-            with open(analysis_file, 'w', encoding='utf-8') as f:
-                f.write(analysis)
+            
+            # Analyze with Claude and save the analysis
+            await self.run_analysis(prompt, workflow_context, repo_config, analysis_file)
             
             logger.info("Workflow failure analysis completed", workflow=workflow_name, run_id=workflow_id)
             
@@ -489,9 +825,11 @@ class WorkflowHandler(BaseHandler):
                 "analysis_file": str(analysis_file)
             }
             
+        except AnalysisDeferred as e:
+            return self.deferred(e)
         except Exception as e:
             logger.error("Error processing workflow failure", workflow=workflow_name, error=str(e), exc_info=True)
-            return {"status": "error", "error": str(e)}
+            return self.failed(e)
 
 
 # Handler registry
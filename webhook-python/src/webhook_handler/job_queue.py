@@ -0,0 +1,321 @@
+"""Durable SQLite-backed job queue and async worker pool."""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import QueueConfig
+from .logging_config import get_logger
+from .payloads import decode_payload
+
+logger = get_logger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type TEXT NOT NULL,
+    delivery_id TEXT,
+    request_id TEXT,
+    payload BLOB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, available_at);
+"""
+
+
+class JobFailed(Exception):
+    """Raised by a job's processor to hand the job back to the queue for retry."""
+
+
+@dataclass
+class Job:
+    """A unit of webhook work claimed from the queue."""
+    id: int
+    event_type: str
+    delivery_id: Optional[str]
+    request_id: Optional[str]
+    body: bytes
+    attempts: int
+    created_at: float
+
+    @cached_property
+    def payload(self) -> Dict[str, Any]:
+        """The webhook payload, decoded from the stored body on first use."""
+        return decode_payload(self.body)
+
+
+class JobQueue:
+    """Persistent FIFO queue with visibility timeouts.
+
+    Jobs are leased rather than removed when claimed: a claimed job becomes
+    visible again once its lease expires, so work held by a crashed or
+    redeployed process is picked up by the next worker.
+    """
+
+    def __init__(self, config: QueueConfig):
+        self.config = config
+        self.path = Path(config.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        logger.info("Job queue opened", path=str(self.path), depth=self.depth())
+
+    def enqueue(
+        self,
+        event_type: str,
+        body: bytes,
+        delivery_id: Optional[str] = None,
+        request_id: Optional[str] = None
+    ) -> int:
+        """Append a job holding the raw webhook body and return its id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (event_type, delivery_id, request_id, payload, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (event_type, delivery_id, request_id, body, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Job]:
+        """Lease the oldest visible job, or return None if there is none.
+
+        A job whose lease has already expired ``max_attempts`` times, such
+        as one that crashes its worker, is dead-lettered rather than leased
+        again.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._conn.execute(
+                        "SELECT id, event_type, delivery_id, request_id, payload, attempts, created_at "
+                        "FROM jobs WHERE status = 'pending' AND available_at <= ? "
+                        "ORDER BY id LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        self._conn.execute("COMMIT")
+                        return None
+                    if row[5] < self.config.max_attempts:
+                        break
+
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?",
+                        (f"Lease expired after {row[5]} attempts", row[0])
+                    )
+                    logger.error("Job dead-lettered after lease expiry", job_id=row[0], attempts=row[5])
+
+                self._conn.execute(
+                    "UPDATE jobs SET attempts = attempts + 1, available_at = ? WHERE id = ?",
+                    (now + self.config.visibility_timeout, row[0])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return Job(
+            id=row[0],
+            event_type=row[1],
+            delivery_id=row[2],
+            request_id=row[3],
+            body=row[4],
+            attempts=row[5] + 1,
+            created_at=row[6]
+        )
+
+    def complete(self, job_id: int) -> None:
+        """Remove a finished job."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def release(self, job_id: int) -> None:
+        """Return a leased job to the queue immediately without counting the attempt."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = MAX(attempts - 1, 0), available_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Release a failed job for retry; returns False once it is dead-lettered."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return False
+
+            if row[0] >= self.config.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?",
+                    (error, job_id)
+                )
+                return False
+
+            self._conn.execute(
+                "UPDATE jobs SET available_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + self.config.retry_delay * row[0], error, job_id)
+            )
+            return True
+
+    def dead_letter(self, job_id: int, error: str) -> None:
+        """Dead-letter a job that cannot succeed on retry."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?",
+                (error, job_id)
+            )
+
+    def depth(self) -> int:
+        """Number of pending (queued or leased) jobs."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and age statistics."""
+        now = time.time()
+        with self._lock:
+            pending, in_flight, oldest = self._conn.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(CASE WHEN attempts > 0 AND available_at > ? THEN 1 ELSE 0 END), 0), "
+                "MIN(created_at) "
+                "FROM jobs WHERE status = 'pending'",
+                (now,)
+            ).fetchone()
+            dead = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'dead'"
+            ).fetchone()[0]
+
+        return {
+            "depth": pending,
+            "in_flight": in_flight,
+            "dead": dead,
+            "oldest_age_seconds": now - oldest if oldest is not None else 0
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class WorkerPool:
+    """Bounded pool of async workers draining a JobQueue."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        process: Callable[[Job], Awaitable[Any]],
+        workers: int,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.process = process
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+        self._busy = 0
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info("Worker pool started", workers=self.workers)
+
+    async def stop(self) -> None:
+        """Stop the workers, handing any in-flight jobs back to the queue."""
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Worker pool stopped")
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, index: int) -> None:
+        """Claim and process jobs until stopped."""
+        while self._running:
+            self._wakeup.clear()
+            job = self.queue.claim()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._busy += 1
+            try:
+                # Decode up front: a body that does not decode never will
+                try:
+                    job.payload
+                except ValueError as e:
+                    self.queue.dead_letter(job.id, f"Undecodable payload: {e}")
+                    logger.error(
+                        "Job dead-lettered, payload does not decode",
+                        job_id=job.id,
+                        worker=index,
+                        error=str(e)
+                    )
+                    continue
+
+                await self.process(job)
+                self.queue.complete(job.id)
+            except asyncio.CancelledError:
+                self.queue.release(job.id)
+                raise
+            except Exception as e:
+                retrying = self.queue.fail(job.id, str(e))
+                logger.error(
+                    "Job failed",
+                    job_id=job.id,
+                    worker=index,
+                    attempts=job.attempts,
+                    retrying=retrying,
+                    error=str(e),
+                    exc_info=True
+                )
+            finally:
+                self._busy -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker utilisation statistics."""
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            **self.queue.get_stats()
+        }
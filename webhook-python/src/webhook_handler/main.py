@@ -1,20 +1,26 @@
 """Main FastAPI application for GitHub webhook handling."""
 
+import asyncio
 import hashlib
 import hmac
 import uuid
 from typing import Dict, Any
 
-from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 
+from .batches import BatchWaiter
 from .config import Settings
+from .job_queue import Job, JobFailed, JobQueue, WorkerPool
 from .logging_config import setup_logging, get_logger, request_id_processor
+from .payloads import decode_payload
+from .reloader import ConfigReloader
 from .webhook_processor import WebhookProcessor
 
 
 # Load configuration
-settings = Settings.from_yaml("config/settings.yaml")
+CONFIG_PATH = "config/settings.yaml"
+settings = Settings.from_yaml(CONFIG_PATH)
 
 # Setup logging
 setup_logging(settings.logging)
@@ -30,9 +36,91 @@ app = FastAPI(
 # Initialize webhook processor
 webhook_processor = WebhookProcessor(settings)
 
+# Reloads settings.yaml into the processor; request handlers always read
+# webhook_processor.settings rather than the startup snapshot above
+config_reloader = ConfigReloader(CONFIG_PATH, webhook_processor)
+
+
+async def process_job(job: Job) -> None:
+    """Run a queued webhook delivery through the processor.
+    
+    Failures the processor reports as retryable are raised, so the queue
+    retries the job and dead-letters it after ``max_attempts``.
+    """
+    result = await webhook_processor.process_webhook(
+        event_type=job.event_type,
+        payload=job.payload,
+        delivery_id=job.delivery_id,
+        request_id=job.request_id
+    )
+    if result.get("retryable"):
+        raise JobFailed(result["error"])
+
+
+# Initialize persistent job queue and worker pool
+job_queue = JobQueue(settings.queue)
+worker_pool = WorkerPool(
+    job_queue,
+    process_job,
+    workers=settings.queue.workers,
+    poll_interval=settings.queue.poll_interval
+)
+
+
+async def resume_batched_delivery(waiter: BatchWaiter) -> None:
+    """Re-run a delivery whose batched analysis has finished."""
+    if webhook_processor.settings.features.async_processing:
+        job_queue.enqueue(
+            event_type=waiter.event_type,
+            body=waiter.payload,
+            delivery_id=waiter.delivery_id,
+            request_id=waiter.request_id
+        )
+        worker_pool.notify()
+    else:
+        await webhook_processor.process_webhook(
+            event_type=waiter.event_type,
+            payload=decode_payload(waiter.payload),
+            delivery_id=waiter.delivery_id,
+            request_id=waiter.request_id
+        )
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    """Compile prompts, warm up API connections and start the background workers."""
+    # Fail fast on a template that does not compile
+    webhook_processor.prompt_loader.warm_up()
+    await asyncio.gather(
+        webhook_processor.claude_client.warm_up(),
+        webhook_processor.github_client.warm_up()
+    )
+    if settings.features.async_processing:
+        worker_pool.start()
+    if webhook_processor.claude_client.batch_lane:
+        webhook_processor.claude_client.batch_lane.start(resume_batched_delivery)
+    if settings.features.config_hot_reload:
+        config_reloader.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """Stop the background workers and release queues and connections."""
+    await config_reloader.stop()
+    if webhook_processor.claude_client.batch_lane:
+        await webhook_processor.claude_client.batch_lane.stop()
+    await worker_pool.stop()
+    job_queue.close()
+    webhook_processor.deduplicator.close()
+    if webhook_processor.review_state:
+        webhook_processor.review_state.close()
+    await webhook_processor.claude_client.close()
+    await webhook_processor.github_client.close()
+
 
 def verify_signature(payload: bytes, signature: str) -> bool:
     """Verify GitHub webhook signature."""
+    settings = webhook_processor.settings
     if not settings.features.signature_validation:
         return True
     
@@ -60,22 +148,22 @@ async def health_check() -> Dict[str, str]:
 
 
 @app.post(settings.server.webhook_path)
-async def handle_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks
-) -> JSONResponse:
+async def handle_webhook(request: Request) -> JSONResponse:
     """Handle incoming GitHub webhooks."""
     
+    # Snapshot the live settings for this request
+    settings = webhook_processor.settings
+    
     # Generate request ID for tracking
     request_id = str(uuid.uuid4())
     request_id_processor.set_request_id(request_id)
+    delivery_id = request.headers.get("X-GitHub-Delivery")
     
     logger.info("Webhook received", request_id=request_id)
     
     try:
         # Get headers
         event_type = request.headers.get("X-GitHub-Event")
-        delivery_id = request.headers.get("X-GitHub-Delivery")
         signature = request.headers.get("X-Hub-Signature-256")
         
         if not event_type:
@@ -89,9 +177,14 @@ async def handle_webhook(
             logger.error("Invalid webhook signature", request_id=request_id)
             raise HTTPException(status_code=401, detail="Invalid signature")
         
-        # Parse JSON payload
+        # Drop GitHub retries and manual redeliveries before doing any work
+        if webhook_processor.deduplicator.check_and_record(delivery_id):
+            logger.info("Duplicate delivery", delivery_id=delivery_id, request_id=request_id)
+            return JSONResponse({"status": "duplicate", "delivery_id": delivery_id})
+        
+        # Parse JSON payload (once, from the bytes already read for the signature)
         try:
-            payload = await request.json()
+            payload = decode_payload(payload_bytes)
         except Exception as e:
             logger.error("Invalid JSON payload", error=str(e), request_id=request_id)
             raise HTTPException(status_code=400, detail="Invalid JSON payload")
@@ -104,45 +197,40 @@ async def handle_webhook(
             logger.warning("No repository information in payload", request_id=request_id)
             return JSONResponse({"status": "ignored", "reason": "no repository"})
         
-        # Check if repository is configured
-        if not settings.get_repository_config(repo_name):
+        # Route the delivery once against the compiled repository table
+        decision = settings.route(repo_name, event_type)
+        if not decision.enabled:
             logger.info(
-                "Repository not configured", 
-                repository=repo_name,
-                request_id=request_id
-            )
-            return JSONResponse({"status": "ignored", "reason": "repository not configured"})
-        
-        # Check if event type is enabled
-        if not settings.is_event_enabled(repo_name, event_type):
-            logger.info(
-                "Event type not enabled",
+                "Webhook not routed",
+                reason=decision.reason,
                 event_type=event_type,
                 repository=repo_name,
                 request_id=request_id
             )
-            return JSONResponse({"status": "ignored", "reason": "event type not enabled"})
+            return JSONResponse({"status": "ignored", "reason": decision.reason})
         
-        # Process webhook in background
+        # Persist webhook for the worker pool
         if settings.features.async_processing:
-            background_tasks.add_task(
-                webhook_processor.process_webhook,
+            job_id = job_queue.enqueue(
                 event_type=event_type,
-                payload=payload,
+                body=payload_bytes,
                 delivery_id=delivery_id,
                 request_id=request_id
             )
+            worker_pool.notify()
             
             logger.info(
                 "Webhook queued for processing",
                 event_type=event_type,
                 repository=repo_name,
+                job_id=job_id,
                 request_id=request_id
             )
             
             return JSONResponse({
                 "status": "queued",
                 "request_id": request_id,
+                "job_id": job_id,
                 "event_type": event_type,
                 "repository": repo_name
             })
@@ -152,7 +240,8 @@ async def handle_webhook(
                 event_type=event_type,
                 payload=payload,
                 delivery_id=delivery_id,
-                request_id=request_id
+                request_id=request_id,
+                decision=decision
             )
             
             return JSONResponse({
@@ -164,6 +253,8 @@ async def handle_webhook(
     except HTTPException:
         raise
     except Exception as e:
+        # Let GitHub's redelivery retry a delivery we failed to accept
+        webhook_processor.deduplicator.forget(delivery_id)
         logger.error(
             "Unexpected error processing webhook",
             error=str(e),
@@ -173,10 +264,29 @@ async def handle_webhook(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post("/admin/reload-config")
+async def reload_config(request: Request) -> Dict[str, Any]:
+    """Re-read settings.yaml and apply it without a restart.
+    
+    Requests must be signed with the webhook secret like a GitHub delivery.
+    """
+    payload_bytes = await request.body()
+    if not verify_signature(payload_bytes, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    result = config_reloader.reload()
+    if result["status"] == "error":
+        raise HTTPException(status_code=422, detail=result["error"])
+    return result
+
+
 @app.get("/stats")
 async def get_stats() -> Dict[str, Any]:
     """Get webhook processing statistics."""
-    return await webhook_processor.get_stats()
+    stats = await webhook_processor.get_stats()
+    stats["queue"] = worker_pool.get_stats()
+    stats["config_reload"] = config_reloader.get_stats()
+    return stats
 
 
 if __name__ == "__main__":
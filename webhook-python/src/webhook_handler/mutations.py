@@ -0,0 +1,53 @@
+"""Coalesced writes to a single GitHub issue or pull request."""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class IssueMutations:
+    """Writes a handler wants applied to one issue or pull request.
+
+    Handlers collect labels, comments and a close here and hand the whole
+    set to ``GitHubClient.apply_mutations``. That call merges every label
+    into one request, runs it alongside the comments, and always posts
+    the comments before closing.
+    """
+    repo_name: str
+    number: int
+    # GraphQL node ID from the webhook payload; enables one-request mutations
+    node_id: Optional[str] = None
+    # Labels the payload says are already applied
+    existing_labels: Tuple[str, ...] = ()
+    labels: List[str] = field(default_factory=list)
+    comments: List[str] = field(default_factory=list)
+    close_issue: bool = False
+
+    def add_labels(self, labels: List[str]) -> "IssueMutations":
+        self.labels.extend(labels)
+        return self
+
+    def comment(self, body: str) -> "IssueMutations":
+        self.comments.append(body)
+        return self
+
+    def close(self, comment: Optional[str] = None) -> "IssueMutations":
+        """Close the issue, after ``comment`` and any other comments."""
+        if comment:
+            self.comments.append(comment)
+        self.close_issue = True
+        return self
+
+    def new_labels(self) -> List[str]:
+        """Requested labels not already applied, de-duplicated in order."""
+        seen = set(self.existing_labels)
+        new = []
+        for label in self.labels:
+            if label not in seen:
+                seen.add(label)
+                new.append(label)
+        return new
+
+    @property
+    def empty(self) -> bool:
+        return not (self.new_labels() or self.comments or self.close_issue)
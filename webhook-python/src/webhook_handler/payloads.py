@@ -0,0 +1,212 @@
+"""Webhook payload decoding and typed payload structs."""
+
+import json
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional fast path
+    orjson = None
+
+
+def decode_payload(body: bytes) -> Dict[str, Any]:
+    """Decode a webhook body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """Encode a payload back to bytes for storage, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def _login(user: Optional[Dict[str, Any]]) -> str:
+    """Extract a login from a (possibly null) user object."""
+    return (user or {}).get("login") or ""
+
+
+def _label_names(labels: Optional[list]) -> Tuple[str, ...]:
+    """Extract label names from a label list."""
+    return tuple(label["name"] for label in labels or ())
+
+
+class Repository(NamedTuple):
+    """Repository fields used by the handlers."""
+    full_name: str
+    html_url: str
+    description: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Repository":
+        return cls(
+            full_name=data.get("full_name") or "",
+            html_url=data.get("html_url") or "",
+            description=data.get("description") or ""
+        )
+
+
+class Issue(NamedTuple):
+    """Issue fields used by the handlers."""
+    number: Optional[int]
+    node_id: str
+    title: str
+    body: str
+    html_url: str
+    user: str
+    state: str
+    labels: Tuple[str, ...]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Issue":
+        return cls(
+            number=data.get("number"),
+            node_id=data.get("node_id") or "",
+            title=data.get("title") or "",
+            body=data.get("body") or "",
+            html_url=data.get("html_url") or "",
+            user=_login(data.get("user")),
+            state=data.get("state") or "",
+            labels=_label_names(data.get("labels"))
+        )
+
+
+class PullRequest(NamedTuple):
+    """Pull request fields used by the handlers."""
+    number: Optional[int]
+    node_id: str
+    title: str
+    body: str
+    html_url: str
+    diff_url: str
+    user: str
+    state: str
+    draft: bool
+    labels: Tuple[str, ...]
+    head_sha: str
+    base_sha: str
+    additions: Optional[int]
+    deletions: Optional[int]
+    changed_files: Optional[int]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PullRequest":
+        return cls(
+            number=data.get("number"),
+            node_id=data.get("node_id") or "",
+            title=data.get("title") or "",
+            body=data.get("body") or "",
+            html_url=data.get("html_url") or "",
+            diff_url=data.get("diff_url") or "",
+            user=_login(data.get("user")),
+            state=data.get("state") or "",
+            draft=bool(data.get("draft", False)),
+            labels=_label_names(data.get("labels")),
+            head_sha=(data.get("head") or {}).get("sha") or "",
+            base_sha=(data.get("base") or {}).get("sha") or "",
+            additions=data.get("additions"),
+            deletions=data.get("deletions"),
+            changed_files=data.get("changed_files")
+        )
+
+    def details(self) -> Dict[str, Any]:
+        """Pull request details carried by the payload, in ``get_pull_request`` form.
+
+        ``additions``, ``deletions`` and ``changed_files`` are None when the
+        payload omits them, as ``pull_request_review`` payloads do.
+        """
+        return {
+            "number": self.number,
+            "title": self.title,
+            "body": self.body,
+            "user": self.user,
+            "state": self.state,
+            "labels": list(self.labels),
+            "url": self.html_url,
+            "additions": self.additions,
+            "deletions": self.deletions,
+            "changed_files": self.changed_files
+        }
+
+
+class Review(NamedTuple):
+    """Pull request review fields used by the handlers."""
+    id: Optional[int]
+    state: str
+    body: str
+    user: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Review":
+        return cls(
+            id=data.get("id"),
+            state=data.get("state") or "",
+            body=data.get("body") or "",
+            user=_login(data.get("user"))
+        )
+
+
+class WorkflowRun(NamedTuple):
+    """Workflow run fields used by the handlers."""
+    id: Optional[int]
+    name: str
+    status: str
+    conclusion: str
+    html_url: str
+    head_sha: str
+    head_branch: str
+    head_commit_message: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WorkflowRun":
+        return cls(
+            id=data.get("id"),
+            name=data.get("name") or "",
+            status=data.get("status") or "",
+            conclusion=data.get("conclusion") or "",
+            html_url=data.get("html_url") or "",
+            head_sha=data.get("head_sha") or "",
+            head_branch=data.get("head_branch") or "",
+            head_commit_message=(data.get("head_commit") or {}).get("message") or ""
+        )
+
+
+class WebhookEvent(NamedTuple):
+    """Typed view of a webhook payload, built once per delivery."""
+    action: str
+    repository: Repository
+    sender: str
+    sender_type: str
+    issue: Optional[Issue]
+    pull_request: Optional[PullRequest]
+    review: Optional[Review]
+    workflow_run: Optional[WorkflowRun]
+    requested_reviewer: Optional[str]
+    raw: Dict[str, Any]
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "WebhookEvent":
+        """Build the typed view from a decoded payload."""
+        issue = payload.get("issue")
+        pull_request = payload.get("pull_request")
+        review = payload.get("review")
+        workflow_run = payload.get("workflow_run")
+        sender = payload.get("sender") or {}
+
+        return cls(
+            action=payload.get("action") or "",
+            repository=Repository.from_dict(payload.get("repository") or {}),
+            sender=_login(sender),
+            sender_type=sender.get("type") or "",
+            issue=Issue.from_dict(issue) if issue else None,
+            pull_request=PullRequest.from_dict(pull_request) if pull_request else None,
+            review=Review.from_dict(review) if review else None,
+            workflow_run=WorkflowRun.from_dict(workflow_run) if workflow_run else None,
+            requested_reviewer=(
+                _login(payload["requested_reviewer"])
+                if "requested_reviewer" in payload else None
+            ),
+            raw=payload
+        )
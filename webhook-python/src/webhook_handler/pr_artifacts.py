@@ -0,0 +1,219 @@
+"""Cache of pull request diffs and file lists keyed by head SHA."""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from .config import PRArtifactConfig
+from .diff_view import DiffView
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    artifacts TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (repo, number, head_sha)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_accessed_at ON artifacts (accessed_at);
+"""
+
+ArtifactKey = Tuple[str, int, str]
+
+
+class PRArtifacts(NamedTuple):
+    """What ``get_pull_request`` fetches for one head commit."""
+    diff: DiffView
+    files: Tuple[str, ...]
+    additions: int
+    deletions: int
+    changed_files: int
+
+    @property
+    def size(self) -> int:
+        return self.diff.size + sum(len(path) for path in self.files)
+
+
+class PRArtifactCache:
+    """Size-bounded LRU of PR artifacts keyed by (repo, number, head SHA).
+
+    A head SHA pins the diff, so entries never go stale; they are dropped
+    when a newer head is stored for the same PR or when evicted. Entries
+    evicted from memory spill to the optional SQLite tier, which is
+    bounded by size in the same least-recently-used order. Diffs already
+    spilled to a temp file by the download are evicted, not copied.
+    """
+
+    def __init__(self, config: PRArtifactConfig):
+        self.config = config
+        self.max_memory_bytes = config.memory_max_mb * 1024 * 1024
+        self.max_disk_bytes = config.disk_max_mb * 1024 * 1024
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[ArtifactKey, PRArtifacts]" = OrderedDict()
+        self._memory_bytes = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if config.disk_path:
+            path = Path(config.disk_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._disk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM artifacts"
+            ).fetchone()[0]
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._spills = 0
+        self._invalidations = 0
+
+    def get(self, repo: str, number: int, head_sha: str) -> Optional[PRArtifacts]:
+        """Return the artifacts for a head commit, from memory or disk."""
+        key = (repo, number, head_sha)
+        with self._lock:
+            artifacts = self._memory.get(key)
+            if artifacts is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return artifacts
+
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT artifacts FROM artifacts WHERE repo = ? AND number = ? AND head_sha = ?", key
+                ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            data = json.loads(row[0])
+            diff = DiffView.from_text(data["diff"])
+            diff.truncated = data["truncated"]
+            diff.dropped = tuple(data["dropped"])
+            artifacts = PRArtifacts(
+                diff, tuple(data["files"]),
+                data["additions"], data["deletions"], data["changed_files"]
+            )
+            self._delete_from_disk(key)
+            self._remember(key, artifacts)
+            self._hits += 1
+            return artifacts
+
+    def put(self, repo: str, number: int, head_sha: str, artifacts: PRArtifacts) -> None:
+        """Store a head commit's artifacts, dropping those of earlier heads."""
+        key = (repo, number, head_sha)
+        with self._lock:
+            self._invalidate(repo, number, keep_sha=head_sha)
+            self._remember(key, artifacts)
+
+    def invalidate(self, repo: str, number: int, keep_sha: Optional[str] = None) -> None:
+        """Drop a PR's artifacts for every head but ``keep_sha``."""
+        with self._lock:
+            self._invalidate(repo, number, keep_sha)
+
+    def _invalidate(self, repo: str, number: int, keep_sha: Optional[str]) -> None:
+        stale = [key for key in self._memory if key[:2] == (repo, number) and key[2] != keep_sha]
+        for key in stale:
+            self._memory_bytes -= self._memory.pop(key).size
+        dropped = len(stale)
+
+        if self._conn is not None:
+            rows = self._conn.execute(
+                "SELECT head_sha, size FROM artifacts WHERE repo = ? AND number = ? AND head_sha != ?",
+                (repo, number, keep_sha or "")
+            ).fetchall()
+            for head_sha, size in rows:
+                self._conn.execute(
+                    "DELETE FROM artifacts WHERE repo = ? AND number = ? AND head_sha = ?",
+                    (repo, number, head_sha)
+                )
+                self._disk_bytes -= size
+            dropped += len(rows)
+
+        self._invalidations += dropped
+
+    def _remember(self, key: ArtifactKey, artifacts: PRArtifacts) -> None:
+        """Insert into memory, spilling least recently used entries over the limit."""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size
+        self._memory[key] = artifacts
+        self._memory_bytes += artifacts.size
+
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: ArtifactKey, artifacts: PRArtifacts) -> None:
+        """Move an entry evicted from memory to disk, evicting old disk entries."""
+        if self._conn is None or artifacts.diff.spilled or artifacts.size > self.max_disk_bytes:
+            self._evictions += 1
+            return
+
+        data = json.dumps({
+            **artifacts._asdict(),
+            "diff": artifacts.diff.text(),
+            "truncated": artifacts.diff.truncated,
+            "dropped": list(artifacts.diff.dropped)
+        })
+        self._conn.execute(
+            "INSERT OR REPLACE INTO artifacts (repo, number, head_sha, artifacts, size, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, data, artifacts.size, time.time())
+        )
+        self._disk_bytes += artifacts.size
+        self._spills += 1
+
+        if self._disk_bytes > self.max_disk_bytes:
+            rows = self._conn.execute(
+                "SELECT repo, number, head_sha, size FROM artifacts ORDER BY accessed_at"
+            ).fetchall()
+            for repo, number, head_sha, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                self._delete_from_disk((repo, number, head_sha))
+                self._evictions += 1
+
+    def _delete_from_disk(self, key: ArtifactKey) -> None:
+        row = self._conn.execute(
+            "SELECT size FROM artifacts WHERE repo = ? AND number = ? AND head_sha = ?", key
+        ).fetchone()
+        if row is not None:
+            self._conn.execute(
+                "DELETE FROM artifacts WHERE repo = ? AND number = ? AND head_sha = ?", key
+            )
+            self._disk_bytes -= row[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss and size statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups > 0 else 0,
+            "invalidations": self._invalidations,
+            "spills": self._spills,
+            "evictions": self._evictions,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes
+        }
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
@@ -0,0 +1,332 @@
+"""Catalog of prompt files indexed by their YAML frontmatter."""
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import yaml
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+FRONTMATTER_DELIMITER = "---"
+
+# Selector keys accepted by PromptIndex.select, e.g. "tag:security,model:claude-3-opus"
+SELECTOR_KEYS = ("id", "tag", "model", "event")
+
+
+class PromptEntry(NamedTuple):
+    """Frontmatter of one prompt file.
+
+    ``path`` is relative to the prompt directory holding the file, which is
+    how the template loader names it. ``events`` holds ``event_type`` or
+    ``event_type:action`` keys the prompt serves, and ``tools`` the names
+    of tools Claude is offered with it.
+    """
+    path: str
+    id: str
+    title: str
+    model: Optional[str]
+    max_tokens: Optional[int]
+    tags: Tuple[str, ...]
+    events: Tuple[str, ...]
+    version: Optional[str]
+    tools: Tuple[str, ...] = ()
+
+
+def split_frontmatter(source: str) -> Tuple[Optional[str], str]:
+    """Split a file into its raw frontmatter and body.
+
+    The frontmatter is replaced by as many blank lines as it spanned, so
+    template error line numbers still match the file. Sources without a
+    frontmatter block come back unchanged with None.
+    """
+    if not source.startswith(FRONTMATTER_DELIMITER):
+        return None, source
+    lines = source.splitlines(keepends=True)
+    if lines[0].rstrip() != FRONTMATTER_DELIMITER:
+        return None, source
+
+    for end in range(1, len(lines)):
+        if lines[end].rstrip() == FRONTMATTER_DELIMITER:
+            return "".join(lines[1:end]), "\n" * (end + 1) + "".join(lines[end + 1:])
+    return None, source
+
+
+def read_frontmatter(path: Path) -> Optional[Dict[str, Any]]:
+    """Parse a file's frontmatter, reading no further than its closing delimiter."""
+    with open(path, "r", encoding="utf-8") as f:
+        if f.readline().rstrip() != FRONTMATTER_DELIMITER:
+            return None
+        lines = []
+        for line in f:
+            if line.rstrip() == FRONTMATTER_DELIMITER:
+                break
+            lines.append(line)
+        else:
+            return None
+
+    data = yaml.safe_load("".join(lines))
+    return data if isinstance(data, dict) else None
+
+
+def is_selector(value: str) -> bool:
+    """Whether a configured template value is an index selector rather than a file path."""
+    return value.partition(":")[0].strip() in SELECTOR_KEYS
+
+
+def _strings(value: Any) -> Tuple[str, ...]:
+    """A frontmatter list, or comma-separated string, as a tuple of strings."""
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(str(item).strip() for item in value if str(item).strip())
+
+
+def parse_entry(path: str, data: Dict[str, Any]) -> PromptEntry:
+    """Build a catalog entry from parsed frontmatter."""
+    prompt_id = str(data.get("id") or Path(path).stem)
+    max_tokens = data.get("max_tokens")
+    version = data.get("version")
+    return PromptEntry(
+        path=path,
+        id=prompt_id,
+        title=str(data.get("title") or prompt_id),
+        model=str(data["model"]) if data.get("model") else None,
+        max_tokens=int(max_tokens) if max_tokens else None,
+        tags=_strings(data.get("tags")),
+        events=_strings(data.get("events")),
+        version=str(version) if version is not None else None,
+        tools=_strings(data.get("tools"))
+    )
+
+
+class PromptIndex:
+    """In-memory catalog of the prompt files with frontmatter under a set of directories.
+
+    Files in earlier directories shadow files at the same relative path in
+    later ones, as they do for the template loader. A refresh re-lists only
+    directories whose mtime changed and re-reads only files whose mtime or
+    size changed, so keeping the catalog current costs one stat per file.
+    """
+
+    def __init__(self, directories: Sequence[str], refresh_interval: Optional[float] = None):
+        self.directories = [Path(directory) for directory in directories]
+        self.refresh_interval = refresh_interval
+
+        # Directory -> (mtime, prompt file names, subdirectory names)
+        self._listings: Dict[Path, Tuple[float, Tuple[str, ...], Tuple[str, ...]]] = {}
+        # File -> ((mtime, size), entry or None for files without frontmatter)
+        self._files: Dict[Path, Tuple[Tuple[float, int], Optional[PromptEntry]]] = {}
+
+        self._by_path: Dict[str, PromptEntry] = {}
+        self._by_id: Dict[str, PromptEntry] = {}
+        self._by_tag: Dict[str, FrozenSet[str]] = {}
+        self._by_model: Dict[str, FrozenSet[str]] = {}
+        self._by_event: Dict[str, FrozenSet[str]] = {}
+        self._selections: Dict[str, Optional[PromptEntry]] = {}
+
+        self._last_refresh: Optional[float] = None
+        self._refreshes = 0
+        self._parsed = 0
+        self._errors = 0
+
+    def maybe_refresh(self) -> None:
+        """Refresh if never built, or if ``refresh_interval`` has passed since the last refresh."""
+        if self._last_refresh is None or (
+            self.refresh_interval is not None
+            and time.monotonic() - self._last_refresh >= self.refresh_interval
+        ):
+            self.refresh()
+
+    def refresh(self) -> int:
+        """Bring the catalog up to date with the files on disk.
+
+        Returns the number of files whose frontmatter was (re)read.
+        """
+        self._last_refresh = time.monotonic()
+        self._refreshes += 1
+
+        files: Dict[Path, Tuple[Tuple[float, int], Optional[PromptEntry]]] = {}
+        listed: Set[Path] = set()
+        by_path: Dict[str, PromptEntry] = {}
+        shadowed: Set[str] = set()
+        parsed = 0
+
+        for root in self.directories:
+            for path in self._walk(root, listed):
+                relative = path.relative_to(root).as_posix()
+                if relative in shadowed:
+                    continue
+                shadowed.add(relative)
+
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                signature = (stat.st_mtime, stat.st_size)
+                cached = self._files.get(path)
+                if cached is not None and cached[0] == signature:
+                    entry = cached[1]
+                else:
+                    entry = self._read(path, relative)
+                    parsed += 1
+
+                files[path] = (signature, entry)
+                if entry is not None:
+                    by_path[relative] = entry
+
+        self._listings = {path: self._listings[path] for path in listed}
+        self._files = files
+        if parsed or by_path.keys() != self._by_path.keys():
+            self._rebuild(by_path)
+        self._parsed += parsed
+
+        if parsed:
+            logger.info("Prompt index refreshed", parsed=parsed, prompts=len(self._by_path))
+        return parsed
+
+    def _walk(self, directory: Path, listed: Set[Path]) -> Iterator[Path]:
+        """Yield the prompt files under a directory, re-listing it only if its mtime changed."""
+        try:
+            mtime = directory.stat().st_mtime
+        except OSError:
+            return
+
+        listing = self._listings.get(directory)
+        if listing is None or listing[0] != mtime:
+            names, subdirectories = [], []
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if item.is_dir():
+                        subdirectories.append(item.name)
+                    elif item.name.endswith(".md"):
+                        names.append(item.name)
+            listing = (mtime, tuple(sorted(names)), tuple(sorted(subdirectories)))
+            self._listings[directory] = listing
+        listed.add(directory)
+
+        for name in listing[1]:
+            yield directory / name
+        for name in listing[2]:
+            yield from self._walk(directory / name, listed)
+
+    def _read(self, path: Path, relative: str) -> Optional[PromptEntry]:
+        try:
+            data = read_frontmatter(path)
+        except (OSError, UnicodeDecodeError, yaml.YAMLError) as e:
+            self._errors += 1
+            logger.warning("Failed to read prompt frontmatter", path=str(path), error=str(e))
+            return None
+        if data is None:
+            return None
+        try:
+            return parse_entry(relative, data)
+        except (TypeError, ValueError) as e:
+            self._errors += 1
+            logger.warning("Invalid prompt frontmatter", path=str(path), error=str(e))
+            return None
+
+    def _rebuild(self, by_path: Dict[str, PromptEntry]) -> None:
+        """Rebuild the lookup tables from the current entries."""
+        by_id: Dict[str, PromptEntry] = {}
+        by_tag: Dict[str, Set[str]] = {}
+        by_model: Dict[str, Set[str]] = {}
+        by_event: Dict[str, Set[str]] = {}
+
+        for path in sorted(by_path):
+            entry = by_path[path]
+            if entry.id in by_id:
+                logger.warning("Duplicate prompt id", id=entry.id, path=path, kept=by_id[entry.id].path)
+            else:
+                by_id[entry.id] = entry
+            for tag in entry.tags:
+                by_tag.setdefault(tag, set()).add(path)
+            if entry.model:
+                by_model.setdefault(entry.model, set()).add(path)
+            for event in entry.events:
+                by_event.setdefault(event, set()).add(path)
+
+        self._by_path = by_path
+        self._by_id = by_id
+        self._by_tag = {key: frozenset(paths) for key, paths in by_tag.items()}
+        self._by_model = {key: frozenset(paths) for key, paths in by_model.items()}
+        self._by_event = {key: frozenset(paths) for key, paths in by_event.items()}
+        self._selections = {}
+
+    def get(self, prompt_id: str) -> Optional[PromptEntry]:
+        """Look up a prompt by its frontmatter id."""
+        return self._by_id.get(prompt_id)
+
+    def get_path(self, path: str) -> Optional[PromptEntry]:
+        """Look up a prompt by its path relative to its prompt directory."""
+        return self._by_path.get(path)
+
+    def find(
+        self,
+        tag: Optional[str] = None,
+        model: Optional[str] = None,
+        event: Optional[str] = None
+    ) -> List[PromptEntry]:
+        """Prompts matching every given criterion, ordered by path."""
+        candidates: Optional[FrozenSet[str]] = None
+        for table, key in ((self._by_tag, tag), (self._by_model, model), (self._by_event, event)):
+            if key is None:
+                continue
+            paths = table.get(key, frozenset())
+            candidates = paths if candidates is None else candidates & paths
+        if candidates is None:
+            candidates = frozenset(self._by_path)
+        return [self._by_path[path] for path in sorted(candidates)]
+
+    def for_event(self, event_type: str, action: str) -> Optional[PromptEntry]:
+        """The prompt declaring ``event_type:action``, else one declaring ``event_type``."""
+        for key in (f"{event_type}:{action}", event_type):
+            paths = self._by_event.get(key)
+            if paths:
+                return self._by_path[min(paths)]
+        return None
+
+    def select(self, selector: str) -> Optional[PromptEntry]:
+        """Resolve a selector such as ``id:new-pr`` or ``tag:security,model:claude-3-opus``.
+
+        Several criteria must all match; when more than one prompt does, the
+        first by path is used. Results are memoised until the catalog changes.
+        """
+        if selector in self._selections:
+            return self._selections[selector]
+
+        criteria: Dict[str, str] = {}
+        for part in selector.split(","):
+            key, _, value = part.partition(":")
+            key, value = key.strip(), value.strip()
+            if key not in SELECTOR_KEYS or not value:
+                raise ValueError(f"Invalid prompt selector: {selector!r}")
+            criteria[key] = value
+
+        if "id" in criteria:
+            entry = self._by_id.get(criteria.pop("id"))
+            matches = [entry] if entry is not None else []
+            if criteria:
+                matches = [m for m in matches if m in self.find(**criteria)]
+        else:
+            matches = self.find(**criteria)
+
+        selected = matches[0] if matches else None
+        self._selections[selector] = selected
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get catalog statistics."""
+        return {
+            "prompts": len(self._by_path),
+            "tags": len(self._by_tag),
+            "models": len(self._by_model),
+            "events": len(self._by_event),
+            "refreshes": self._refreshes,
+            "files_parsed": self._parsed,
+            "errors": self._errors
+        }
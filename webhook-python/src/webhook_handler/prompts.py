@@ -2,104 +2,401 @@
 
 import os
 from pathlib import Path
-from typing import Dict, Optional, Any
-from jinja2 import Environment, FileSystemLoader, Template
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Any, Set, Tuple
+from jinja2 import (
+    Environment, FileSystemBytecodeCache, FileSystemLoader, Template, TemplateNotFound, TemplateSyntaxError, meta
+)
 
 from .config import PromptsConfig
+from .diff_view import DiffView
+from .prompt_index import PromptIndex, is_selector, split_frontmatter
 from .logging_config import get_logger
+from .payloads import WebhookEvent
 
 logger = get_logger(__name__)
 
+# Templates put this Jinja comment after their static instructions. Everything
+# above it is sent as a cacheable system prompt, everything below it follows
+# the per-event context in the user message.
+STATIC_SECTION_END = "{# end-static #}"
+
+# Template names address one section of a file as "<file>#static" or "<file>#dynamic"
+SECTION_SEPARATOR = "#"
+SECTIONS = ("static", "dynamic")
+
+
+class RenderedPrompt(NamedTuple):
+    """A rendered template split into its cacheable and per-event parts.
+    
+    ``model``, ``max_tokens`` and ``tools`` come from the template's
+    frontmatter; None means the configured Claude defaults.
+    """
+    static: str
+    dynamic: str
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    tools: Tuple[str, ...] = ()
+    
+    @property
+    def text(self) -> str:
+        return "\n\n".join(part for part in (self.static, self.dynamic) if part)
+
+
+class TemplateAnalysis(NamedTuple):
+    """A compiled template, the templates it includes, and the variables they use.
+    
+    ``names`` and ``templates`` list the template first, then its includes.
+    ``variables`` is None when an include is chosen at render time.
+    """
+    names: Tuple[str, ...]
+    templates: Tuple[Template, ...]
+    variables: Optional[FrozenSet[str]]
+
+
+class PromptContext(dict):
+    """Template variables, some computed only when a template uses them.
+    
+    Plain entries behave as in a dict. Resolvers registered with ``lazy``
+    run at most once, the first time a template or caller looks the name
+    up, so values no template references are never built.
+    """
+    
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._resolvers: Dict[str, Callable[[], Any]] = {}
+    
+    def lazy(self, **resolvers: Callable[[], Any]) -> None:
+        """Register zero-argument callables producing variable values."""
+        for name in resolvers:
+            self.pop(name, None)
+        self._resolvers.update(resolvers)
+    
+    def __missing__(self, name: str) -> Any:
+        resolver = self._resolvers.pop(name, None)
+        if resolver is None:
+            raise KeyError(name)
+        value = self[name] = resolver()
+        return value
+    
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+    
+    def resolve_all(self) -> Dict[str, Any]:
+        """Every variable, running the remaining resolvers."""
+        for name in list(self._resolvers):
+            self[name]
+        return dict(self)
+
+
+def select_variables(context: Dict[str, Any], names: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    """The entries of ``context`` a template references; all of them if unknown."""
+    if names is None:
+        return context.resolve_all() if isinstance(context, PromptContext) else context
+    
+    values = {}
+    for name in names:
+        try:
+            values[name] = context[name]
+        except KeyError:
+            continue
+    return values
+
+
+class SectionLoader(FileSystemLoader):
+    """FileSystemLoader that also serves the two sections of a template.
+
+    ``<name>#static`` and ``<name>#dynamic`` are the parts of ``<name>``
+    above and below STATIC_SECTION_END; a template without the marker is
+    all dynamic. Each section is compiled and cached as its own template
+    and shares the file's up-to-date check. Frontmatter is not part of
+    the template.
+    """
+    
+    def get_source(self, environment: Environment, template: str) -> Tuple[str, Optional[str], Optional[Callable[[], bool]]]:
+        name, _, section = template.partition(SECTION_SEPARATOR)
+        source, filename, uptodate = super().get_source(environment, name)
+        _, source = split_frontmatter(source)
+        if not section:
+            return source, filename, uptodate
+        
+        static, marker, dynamic = source.partition(STATIC_SECTION_END)
+        if not marker:
+            static, dynamic = "", source
+        return (static if section == "static" else dynamic), filename, uptodate
+
 
 class PromptLoader:
-    """Loads and processes prompt templates."""
+    """Loads and processes prompt templates.
+    
+    Templates are compiled once by the Jinja environment and kept in its
+    cache, so rendering is a lookup plus execution. With ``auto_reload`` the
+    cache checks each file's mtime before use and recompiles edited
+    templates; the optional bytecode cache lets restarts skip compilation.
+    
+    Templates are looked up in ``base_dir`` and then the ``library_dirs``.
+    Their frontmatter is cataloged in ``index``, which resolves events and
+    selectors not mapped to a file in ``templates``.
+    """
     
     def __init__(self, config: PromptsConfig):
         self.config = config
         self.base_dir = Path(config.base_dir)
+        search_path = [str(self.base_dir), *config.library_dirs]
+        
+        self.index = PromptIndex(
+            search_path,
+            refresh_interval=config.index_refresh_seconds if config.auto_reload else None
+        )
+        
+        bytecode_cache = None
+        if config.bytecode_cache_dir:
+            Path(config.bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(config.bytecode_cache_dir)
         
         # Setup Jinja2 environment for templating
         self.jinja_env = Environment(
-            loader=FileSystemLoader(str(self.base_dir)),
+            loader=SectionLoader(search_path),
             trim_blocks=True,
-            lstrip_blocks=True
+            lstrip_blocks=True,
+            # Partials end in a newline; keep it so an included block stays on its own lines
+            keep_trailing_newline=True,
+            auto_reload=config.auto_reload,
+            cache_size=config.cache_size,
+            bytecode_cache=bytecode_cache
         )
         
-        # Cache for loaded prompts
-        self._prompt_cache: Dict[str, str] = {}
+        # Analyses and pre-rendered variable-free sections, keyed by template name
+        self._analyses: Dict[str, TemplateAnalysis] = {}
+        self._fragments: Dict[str, Tuple[TemplateAnalysis, str]] = {}
+        self._fragment_hits = 0
     
     def get_prompt_path(self, event_type: str, action: str) -> Optional[str]:
-        """Get the prompt file path for an event type and action."""
+        """Get the prompt file path for an event type and action.
+        
+        Files mapped in ``templates`` come first, then prompts whose
+        frontmatter declares the event. A mapped value may also be an index
+        selector such as ``id:new-pr`` or ``tag:security``.
+        """
+        self.index.maybe_refresh()
         templates = self.config.templates.get(event_type, {})
         
         # Try specific action first, then default
         prompt_file = templates.get(action) or templates.get("default")
         
+        if prompt_file and is_selector(prompt_file):
+            entry = self.index.select(prompt_file)
+            if entry is None:
+                logger.warning("No prompt matches selector", selector=prompt_file, event_type=event_type, action=action)
+                return None
+            return entry.path
+        
         if not prompt_file:
-            logger.warning("No prompt template found", event_type=event_type, action=action)
-            return None
+            entry = self.index.for_event(event_type, action)
+            if entry is None:
+                logger.warning("No prompt template found", event_type=event_type, action=action)
+                return None
+            prompt_file = entry.path
         
         return prompt_file
     
-    def load_prompt(self, event_type: str, action: str, use_cache: bool = True) -> Optional[str]:
-        """Load a prompt template for the given event type and action."""
+    def load_prompt(self, event_type: str, action: str) -> Optional[str]:
+        """Load the unrendered source of the template for an event type and action."""
         
-        # Get prompt file path
         prompt_file = self.get_prompt_path(event_type, action)
         if not prompt_file:
             return None
         
-        # Check cache first
-        cache_key = f"{event_type}:{action}"
-        if use_cache and cache_key in self._prompt_cache:
-            return self._prompt_cache[cache_key]
-        
-        # Load from file
-        full_path = self.base_dir / prompt_file
-        
-        if not full_path.exists():
-            logger.error("Prompt file not found", path=str(full_path))
-            return None
-        
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Cache the content
-            if use_cache:
-                self._prompt_cache[cache_key] = content
-            
-            logger.info("Loaded prompt template", event_type=event_type, action=action, file=prompt_file)
-            return content
-            
+            source, _, _ = self.jinja_env.loader.get_source(self.jinja_env, prompt_file)
+            return source
+        except TemplateNotFound:
+            logger.error("Prompt file not found", path=str(self.base_dir / prompt_file))
+            return None
         except Exception as e:
-            logger.error("Failed to load prompt file", path=str(full_path), error=str(e))
+            logger.error("Failed to load prompt file", path=str(self.base_dir / prompt_file), error=str(e))
             return None
     
     def render_prompt(self, event_type: str, action: str, context: Dict[str, Any]) -> Optional[str]:
         """Load and render a prompt template with context variables."""
         
-        prompt_template = self.load_prompt(event_type, action)
-        if not prompt_template:
+        rendered = self.render_prompt_parts(event_type, action, context)
+        return rendered.text if rendered else None
+    
+    def render_prompt_parts(self, event_type: str, action: str, context: Dict[str, Any]) -> Optional[RenderedPrompt]:
+        """Render a template as separate static and dynamic sections.
+        
+        Templates without a static section are treated as fully dynamic.
+        """
+        
+        prompt_file = self.get_prompt_path(event_type, action)
+        if not prompt_file:
             return None
         
         try:
-            # Render with Jinja2
-            template = Template(prompt_template)
-            rendered = template.render(**context)
+            static, dynamic = (
+                self._render(f"{prompt_file}{SECTION_SEPARATOR}{section}", context)
+                for section in SECTIONS
+            )
             
-            logger.info("Rendered prompt template", event_type=event_type, action=action)
-            return rendered
+            logger.info(
+                "Rendered prompt template", event_type=event_type, action=action,
+                static_chars=len(static), dynamic_chars=len(dynamic)
+            )
+            entry = self.index.get_path(prompt_file)
+            if entry is None:
+                return RenderedPrompt(static=static, dynamic=dynamic)
+            return RenderedPrompt(
+                static=static, dynamic=dynamic,
+                model=entry.model, max_tokens=entry.max_tokens, tools=entry.tools
+            )
             
+        except TemplateNotFound:
+            logger.error("Prompt file not found", path=str(self.base_dir / prompt_file))
+            return None
         except Exception as e:
             logger.error("Failed to render prompt template", error=str(e), exc_info=True)
-            return prompt_template  # Return unrendered template as fallback
+            prompt_template = self.load_prompt(event_type, action)
+            if prompt_template is None:
+                return None
+            return RenderedPrompt(static="", dynamic=prompt_template)  # Unrendered template as fallback
+    
+    def _render(self, name: str, context: Dict[str, Any]) -> str:
+        """Render one compiled template with only the variables it references.
+        
+        A template that references no variables renders the same text every
+        time, so it is rendered once and reused until it or a template it
+        includes is recompiled.
+        """
+        analysis = self._analyse(name)
+        if analysis.variables == frozenset():
+            cached = self._fragments.get(name)
+            if cached is not None and cached[0] is analysis:
+                self._fragment_hits += 1
+                return cached[1]
+            text = analysis.templates[0].render().strip()
+            self._fragments[name] = (analysis, text)
+            return text
+        
+        return analysis.templates[0].render(select_variables(context, analysis.variables)).strip()
+    
+    def template_variables(self, name: str) -> Optional[FrozenSet[str]]:
+        """Undeclared variables a template and the templates it includes reference.
+        
+        None when the template includes or extends a template chosen at
+        render time.
+        """
+        return self._analyse(name).variables
+    
+    def _analyse(self, name: str) -> TemplateAnalysis:
+        """Compile a template and its includes and find the variables they use.
+        
+        The analysis is kept while every template involved is still the one
+        the environment has compiled, so editing the template or any partial
+        it includes triggers a fresh one.
+        """
+        cached = self._analyses.get(name)
+        if cached is not None and all(
+            self.jinja_env.get_template(included) is template
+            for included, template in zip(cached.names, cached.templates)
+        ):
+            return cached
+        
+        names: List[str] = []
+        templates: List[Template] = []
+        variables: Optional[Set[str]] = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in names:
+                continue
+            names.append(current)
+            templates.append(self.jinja_env.get_template(current))
+            
+            source, _, _ = self.jinja_env.loader.get_source(self.jinja_env, current)
+            ast = self.jinja_env.parse(source)
+            referenced = list(meta.find_referenced_templates(ast))
+            if variables is not None:
+                variables |= meta.find_undeclared_variables(ast)
+                if None in referenced:
+                    variables = None
+            pending.extend(included for included in referenced if included is not None)
+        
+        analysis = TemplateAnalysis(
+            names=tuple(names),
+            templates=tuple(templates),
+            variables=frozenset(variables) if variables is not None else None
+        )
+        self._analyses[name] = analysis
+        return analysis
+    
+    def warm_up(self) -> int:
+        """Compile every configured template, raising on syntax errors.
+        
+        Covers the files and selectors in ``templates``, the indexed prompts
+        that declare events, and the partials they include. Sections without
+        variables are pre-rendered. Missing files are only logged, as they
+        are when an event needs them. Returns the number of templates compiled.
+        """
+        self.index.refresh()
+        
+        missing = []
+        prompt_files = {entry.path for entry in self.index.find() if entry.events}
+        for templates in self.config.templates.values():
+            for prompt_file in templates.values():
+                if is_selector(prompt_file):
+                    entry = self.index.select(prompt_file)
+                    if entry is None:
+                        missing.append(prompt_file)
+                        continue
+                    prompt_file = entry.path
+                prompt_files.add(prompt_file)
+        
+        compiled = 0
+        for prompt_file in sorted(prompt_files):
+            try:
+                for section in SECTIONS:
+                    name = f"{prompt_file}{SECTION_SEPARATOR}{section}"
+                    variables = self.template_variables(name)
+                    if variables == frozenset():
+                        self._render(name, {})
+                    elif section == "static":
+                        logger.warning(
+                            "Static prompt section uses variables and will not form a stable cache prefix",
+                            file=prompt_file, variables=sorted(variables) if variables is not None else None
+                        )
+            except TemplateNotFound as e:
+                missing.append(e.name)
+                continue
+            except TemplateSyntaxError as e:
+                logger.error("Prompt template does not compile", file=prompt_file, line=e.lineno, error=e.message)
+                raise
+            compiled += 1
+        
+        if missing:
+            logger.warning("Configured prompt templates not found", files=sorted(set(missing)))
+        logger.info("Prompt templates compiled", templates=compiled)
+        return compiled
     
     def clear_cache(self) -> None:
-        """Clear the prompt cache."""
-        self._prompt_cache.clear()
+        """Drop compiled templates so each is recompiled on next use."""
+        if self.jinja_env.cache is not None:
+            self.jinja_env.cache.clear()
+        self._analyses.clear()
+        self._fragments.clear()
         logger.info("Prompt cache cleared")
     
+    def get_stats(self) -> Dict[str, Any]:
+        """Get template cache and index statistics."""
+        return {
+            "compiled_templates": len(self.jinja_env.cache) if self.jinja_env.cache is not None else 0,
+            "prerendered_sections": len(self._fragments),
+            "prerendered_hits": self._fragment_hits,
+            "index": self.index.get_stats()
+        }
+    
     def list_available_prompts(self) -> Dict[str, Dict[str, str]]:
         """List all available prompt templates."""
         available = {}
@@ -117,76 +414,90 @@ class PromptLoader:
         return available
 
 
-def create_prompt_context(event_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Create context variables for prompt rendering."""
+def create_prompt_context(
+    event_type: str,
+    event: WebhookEvent,
+    pr_details: Optional[Dict[str, Any]] = None
+) -> PromptContext:
+    """Create context variables for prompt rendering.
     
-    context = {
-        "event_type": event_type,
-        "payload": payload
-    }
+    Event fields are resolved only for templates that reference them.
+    ``pr_details`` from ``get_pull_request`` adds the PR's full details;
+    its diff is decoded to text only if a template prints it.
+    """
+    
+    context = PromptContext(
+        event_type=event_type,
+        payload=event.raw,
+        sender_login=event.sender,
+        sender_type=event.sender_type
+    )
     
     # Extract common fields based on event type
-    repository = payload.get("repository", {})
-    context.update({
-        "repository_name": repository.get("full_name", ""),
-        "repository_url": repository.get("html_url", ""),
-        "repository_description": repository.get("description", "")
-    })
-    
-    if event_type == "issues":
-        issue = payload.get("issue", {})
-        context.update({
-            "issue_number": issue.get("number"),
-            "issue_title": issue.get("title", ""),
-            "issue_body": issue.get("body", ""),
-            "issue_user": issue.get("user", {}).get("login", ""),
-            "issue_url": issue.get("html_url", ""),
-            "issue_labels": [label["name"] for label in issue.get("labels", [])]
-        })
-    
-    elif event_type == "pull_request":
-        pr = payload.get("pull_request", {})
-        context.update({
-            "pr_number": pr.get("number"),
-            "pr_title": pr.get("title", ""),
-            "pr_body": pr.get("body", ""),
-            "pr_user": pr.get("user", {}).get("login", ""),
-            "pr_url": pr.get("html_url", ""),
-            "pr_labels": [label["name"] for label in pr.get("labels", [])],
-            "pr_state": pr.get("state", ""),
-            "pr_draft": pr.get("draft", False)
-        })
+    repository = event.repository
+    context.lazy(
+        repository_name=lambda: repository.full_name,
+        repository_url=lambda: repository.html_url,
+        repository_description=lambda: repository.description
+    )
+    
+    if event_type == "issues" and event.issue:
+        issue = event.issue
+        context.lazy(
+            issue_number=lambda: issue.number,
+            issue_title=lambda: issue.title,
+            issue_body=lambda: issue.body,
+            issue_user=lambda: issue.user,
+            issue_url=lambda: issue.html_url,
+            issue_labels=lambda: list(issue.labels)
+        )
+    
+    elif event_type == "pull_request" and event.pull_request:
+        pr = event.pull_request
+        context.lazy(
+            pr_number=lambda: pr.number,
+            pr_title=lambda: pr.title,
+            pr_body=lambda: pr.body,
+            pr_user=lambda: pr.user,
+            pr_url=lambda: pr.html_url,
+            pr_labels=lambda: list(pr.labels),
+            pr_state=lambda: pr.state,
+            pr_draft=lambda: pr.draft
+        )
     
     elif event_type == "pull_request_review":
-        review = payload.get("review", {})
-        pr = payload.get("pull_request", {})
-        context.update({
-            "review_id": review.get("id"),
-            "review_state": review.get("state", ""),
-            "review_body": review.get("body", ""),
-            "reviewer": review.get("user", {}).get("login", ""),
-            "pr_number": pr.get("number"),
-            "pr_title": pr.get("title", ""),
-            "pr_user": pr.get("user", {}).get("login", "")
-        })
-    
-    elif event_type == "workflow_run":
-        workflow_run = payload.get("workflow_run", {})
-        context.update({
-            "workflow_name": workflow_run.get("name", ""),
-            "workflow_status": workflow_run.get("status", ""),
-            "workflow_conclusion": workflow_run.get("conclusion", ""),
-            "workflow_run_id": workflow_run.get("id"),
-            "workflow_url": workflow_run.get("html_url", ""),
-            "commit_sha": workflow_run.get("head_sha", ""),
-            "commit_message": workflow_run.get("head_commit", {}).get("message", "")
-        })
-    
-    # Add sender information
-    sender = payload.get("sender", {})
-    context.update({
-        "sender_login": sender.get("login", ""),
-        "sender_type": sender.get("type", "")
-    })
-    
-    return context
\ No newline at end of file
+        review = event.review
+        pr = event.pull_request
+        if review:
+            context.lazy(
+                review_id=lambda: review.id,
+                review_state=lambda: review.state,
+                review_body=lambda: review.body,
+                reviewer=lambda: review.user
+            )
+        if pr:
+            context.lazy(
+                pr_number=lambda: pr.number,
+                pr_title=lambda: pr.title,
+                pr_user=lambda: pr.user
+            )
+    
+    elif event_type == "workflow_run" and event.workflow_run:
+        workflow_run = event.workflow_run
+        context.lazy(
+            workflow_name=lambda: workflow_run.name,
+            workflow_status=lambda: workflow_run.status,
+            workflow_conclusion=lambda: workflow_run.conclusion,
+            workflow_run_id=lambda: workflow_run.id,
+            workflow_url=lambda: workflow_run.html_url,
+            commit_sha=lambda: workflow_run.head_sha,
+            commit_message=lambda: workflow_run.head_commit_message
+        )
+    
+    if pr_details is not None:
+        context.update(pr_details)
+        diff = pr_details.get("diff")
+        if isinstance(diff, DiffView):
+            context.lazy(diff=diff.text)
+    
+    return context
@@ -0,0 +1,182 @@
+"""Token-bucket rate limiting for the Claude API."""
+
+import asyncio
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for admission."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """A continuously refilling budget of `limit` units per minute.
+
+    The level may go negative when actual usage exceeds what was reserved;
+    the debt is repaid by refill before the next caller is admitted.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.capacity = float(limit)
+        self.rate = limit / 60.0
+        self.level = float(limit)
+        self.outstanding = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Reserve units for an in-flight request."""
+        self._refill()
+        self.level -= amount
+        self.outstanding += amount
+
+    def settle(self, reserved: float, actual: float) -> None:
+        """Replace a reservation with the amount actually used."""
+        self._refill()
+        self.level += reserved - actual
+        self.outstanding = max(0.0, self.outstanding - reserved)
+
+    def sync(self, remaining: float) -> None:
+        """Adopt the server's view of the remaining budget."""
+        self._refill()
+        self.level = min(self.capacity, remaining - self.outstanding)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so nothing is admitted for `seconds`."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+
+class ClaudeRateLimiter:
+    """Shared limiter for requests, input tokens and output tokens per minute.
+
+    Callers are admitted strictly in arrival order: the head of the queue
+    holds the lock while it waits for budget, so later callers never race
+    ahead of it or wake up together.
+    """
+
+    HEADER_BUCKETS = {
+        "anthropic-ratelimit-requests-remaining": "requests",
+        "anthropic-ratelimit-input-tokens-remaining": "input_tokens",
+        "anthropic-ratelimit-output-tokens-remaining": "output_tokens",
+    }
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        input_tokens_per_minute: int,
+        output_tokens_per_minute: int
+    ):
+        self.buckets = {
+            "requests": TokenBucket("requests", requests_per_minute),
+            "input_tokens": TokenBucket("input_tokens", input_tokens_per_minute),
+            "output_tokens": TokenBucket("output_tokens", output_tokens_per_minute),
+        }
+        self._lock = asyncio.Lock()
+        self._queued = 0
+        self._admitted = 0
+        self._throttled_seconds = 0.0
+        self._rate_limited_responses = 0
+
+    async def acquire(self, input_tokens: int, output_tokens: int) -> Dict[str, float]:
+        """Wait for budget and reserve it; returns the reservation to settle later."""
+        reservation = {"requests": 1.0, "input_tokens": float(input_tokens), "output_tokens": float(output_tokens)}
+
+        self._queued += 1
+        try:
+            async with self._lock:
+                while True:
+                    wait = max(
+                        self.buckets[name].wait_time(amount)
+                        for name, amount in reservation.items()
+                    )
+                    if wait <= 0:
+                        break
+                    self._throttled_seconds += wait
+                    await asyncio.sleep(wait)
+
+                for name, amount in reservation.items():
+                    self.buckets[name].take(amount)
+        finally:
+            self._queued -= 1
+
+        self._admitted += 1
+        return reservation
+
+    def settle(
+        self,
+        reservation: Dict[str, float],
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        headers: Optional[Mapping[str, str]] = None
+    ) -> None:
+        """Record actual usage and refresh budgets from rate-limit headers."""
+        actual = {
+            "requests": reservation["requests"],
+            "input_tokens": reservation["input_tokens"] if input_tokens is None else float(input_tokens),
+            "output_tokens": reservation["output_tokens"] if output_tokens is None else float(output_tokens),
+        }
+        for name, amount in reservation.items():
+            self.buckets[name].settle(amount, actual[name])
+
+        if headers:
+            self.update_from_headers(headers)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adopt remaining budgets reported by the API, and back off on retry-after."""
+        for header, name in self.HEADER_BUCKETS.items():
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                self.buckets[name].sync(float(value))
+            except ValueError:
+                logger.warning("Unparseable rate-limit header", header=header, value=value)
+
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                self.back_off(float(retry_after))
+            except ValueError:
+                pass
+
+    def back_off(self, seconds: float) -> None:
+        """Stop admitting requests for `seconds` after a 429."""
+        self._rate_limited_responses += 1
+        self.buckets["requests"].drain(seconds)
+        logger.warning("Claude rate limit hit, backing off", seconds=seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics."""
+        stats: Dict[str, Any] = {
+            "queued": self._queued,
+            "admitted": self._admitted,
+            "throttled_seconds": self._throttled_seconds,
+            "rate_limited_responses": self._rate_limited_responses,
+        }
+        for name, bucket in self.buckets.items():
+            bucket._refill()
+            stats[name] = {
+                "limit_per_minute": bucket.capacity,
+                "available": bucket.level,
+                "outstanding": bucket.outstanding
+            }
+        return stats
@@ -0,0 +1,138 @@
+"""Hot reload of settings.yaml."""
+
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .config import Settings
+from .logging_config import get_logger
+
+if TYPE_CHECKING:
+    from .webhook_processor import WebhookProcessor
+
+logger = get_logger(__name__)
+
+# Sections that are only read at startup; changing them needs a restart
+RESTART_SECTIONS = (
+    "server", "github", "claude", "logging", "queue", "dedup", "response_cache", "github_cache",
+    "pr_artifacts", "review_state", "batch"
+)
+
+# Feature flags only read at startup. A reload keeps their running values,
+# and those of the sections above, until the restart: handlers consult them
+# per delivery, and enabling async_processing would otherwise queue
+# deliveries for a worker pool that was never started
+RESTART_FEATURES = ("async_processing", "rate_limiting", "config_hot_reload")
+
+
+class ConfigReloader:
+    """Re-parses the settings file and swaps it into the processor.
+
+    The file is polled for mtime/size changes, which works on every
+    filesystem including bind mounts where inotify events are not delivered.
+    Invalid files are rejected and the running config is kept.
+    """
+
+    def __init__(self, config_path: str, processor: "WebhookProcessor", interval: float = 2.0):
+        self.config_path = config_path
+        self.processor = processor
+        self.interval = interval
+
+        self._task: Optional[asyncio.Task] = None
+        self._signature = self._file_signature()
+        self._reloads = 0
+        self._failures = 0
+        self._last_reload: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    def _file_signature(self) -> Optional[Tuple[float, int]]:
+        """Modification time and size of the settings file."""
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def reload(self) -> Dict[str, Any]:
+        """Parse, validate and apply the settings file."""
+        self._signature = self._file_signature()
+
+        try:
+            settings = Settings.from_yaml(self.config_path)
+        except Exception as e:
+            return self._reject(e)
+
+        current = self.processor.settings
+        restart_required = [
+            section for section in RESTART_SECTIONS
+            if getattr(settings, section) != getattr(current, section)
+        ]
+        restart_required += [
+            f"features.{flag}" for flag in RESTART_FEATURES
+            if getattr(settings.features, flag) != getattr(current.features, flag)
+        ]
+        settings.features = settings.features.model_copy(
+            update={flag: getattr(current.features, flag) for flag in RESTART_FEATURES}
+        )
+        settings = settings.model_copy(
+            update={section: getattr(current, section) for section in RESTART_SECTIONS}
+        )
+        if restart_required:
+            logger.warning(
+                "Reloaded settings change sections that need a restart",
+                sections=restart_required
+            )
+
+        try:
+            # Compiles the configured prompt templates before swapping
+            self.processor.apply_settings(settings)
+        except Exception as e:
+            return self._reject(e)
+        self._reloads += 1
+        self._last_reload = time.time()
+        self._last_error = None
+
+        logger.info("Settings reloaded", path=self.config_path)
+        return {
+            "status": "reloaded",
+            "repositories": len(settings.repositories),
+            "restart_required": restart_required
+        }
+
+    def _reject(self, error: Exception) -> Dict[str, Any]:
+        """Record a failed reload; the running config stays in place."""
+        self._failures += 1
+        self._last_error = str(error)
+        logger.error("Settings reload rejected", path=self.config_path, error=str(error))
+        return {"status": "error", "error": str(error)}
+
+    def start(self) -> None:
+        """Start polling the settings file for changes."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+            logger.info("Watching settings file", path=self.config_path, interval=self.interval)
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        """Reload whenever the file signature changes."""
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = self._file_signature()
+            if signature is not None and signature != self._signature:
+                self.reload()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get reload statistics."""
+        return {
+            "reloads": self._reloads,
+            "failures": self._failures,
+            "last_reload": self._last_reload,
+            "last_error": self._last_error
+        }
@@ -0,0 +1,184 @@
+"""Content-addressed cache for Claude responses."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import ResponseCacheConfig
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_responses_created_at ON responses (created_at);
+"""
+
+# Memory hits are written back to accessed_at once this many have accrued
+_TOUCH_BATCH = 64
+
+
+def cache_key(*parts: Any) -> str:
+    """Hash request parts into a key; parts are length-prefixed so they can't run together."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Disk-backed response cache with a TTL and size-bounded LRU eviction.
+
+    A small in-memory LRU sits in front of the SQLite table so repeat hits
+    do not read from disk. Their access times are written back in batches,
+    and always before an eviction, so eviction on disk sees them.
+    """
+
+    def __init__(self, config: ResponseCacheConfig):
+        self.config = config
+        self.path = Path(config.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = config.max_size_mb * 1024 * 1024
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # Key -> last memory hit not yet written to disk
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, if present and fresh."""
+        now = time.time()
+        cutoff = now - self.config.ttl_seconds
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > cutoff:
+                self._memory.move_to_end(key)
+                self._touched[key] = now
+                if len(self._touched) >= _TOUCH_BATCH:
+                    self._flush_touched()
+                self._hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= cutoff:
+                self._misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._remember(key, row[0], row[1])
+            self._hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response and evict least recently used entries over the size limit."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._remember(key, response, now)
+            self._evict(now)
+
+    def _flush_touched(self) -> None:
+        """Write access times of memory hits back to disk."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        """Insert into the in-memory LRU."""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under the size limit."""
+        cutoff = now - self.config.ttl_seconds
+        expired = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at <= ?", (cutoff,)
+        ).fetchone()[0]
+        if expired:
+            self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (cutoff,))
+            self._total_bytes -= expired
+
+        if self._total_bytes > self.max_bytes:
+            self._flush_touched()
+            # Only the least recently used rows that cover the excess are read
+            victims = self._conn.execute(
+                "SELECT key, size FROM ("
+                "SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key) AS freed FROM responses"
+                ") WHERE freed - size < ?",
+                (self._total_bytes - self.max_bytes,)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at, key LIMIT ?)",
+                (len(victims),)
+            )
+            for key, size in victims:
+                self._memory.pop(key, None)
+                self._touched.pop(key, None)
+                self._total_bytes -= size
+            self._evictions += len(victims)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss and size statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups > 0 else 0,
+            "evictions": self._evictions,
+            "size_bytes": self._total_bytes,
+            "max_size_bytes": self.max_bytes
+        }
+
+    def close(self) -> None:
+        """Write back pending access times and close the database connection."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
@@ -0,0 +1,146 @@
+"""Per-PR record of the last review, for incremental re-reviews."""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from .config import ReviewStateConfig
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    comment_id INTEGER,
+    comment_body TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (repo, number)
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_updated_at ON reviews (updated_at);
+"""
+
+# Expired rows are purged once every this many recorded reviews
+_PURGE_EVERY = 500
+
+# Starts the section an incremental re-review adds to the PR comment
+UPDATE_HEADING = "\n\n---\n\n### 🔄 Update for "
+
+# GitHub rejects comment bodies longer than this many characters
+MAX_COMMENT_CHARS = 65536
+
+
+class ReviewState(NamedTuple):
+    """The last review of a pull request."""
+    head_sha: str
+    analysis: str
+    comment_id: Optional[int]
+    comment_body: str
+    updated_at: float
+
+
+def review_summary(analysis: str, max_chars: int, note: str = "earlier review truncated") -> str:
+    """The prior review shortened to ``max_chars``, cut at a paragraph break."""
+    if len(analysis) <= max_chars:
+        return analysis
+    cut = analysis.rfind("\n\n", 0, max_chars)
+    return analysis[:cut if cut > 0 else max_chars].rstrip() + f"\n\n_({note})_"
+
+
+def updated_comment(comment_body: str, head: str, analysis: str) -> str:
+    """The PR comment with its update section replaced by the review of ``head``.
+
+    Only the original review and the latest update are kept, so the comment
+    does not grow with every push. If the two together exceed GitHub's
+    comment limit, the original review is shortened first, down to half
+    the space, and then the update.
+    """
+    review = comment_body.split(UPDATE_HEADING, 1)[0]
+    heading = f"{UPDATE_HEADING}{head}\n\n"
+    # Leave room for the truncation notes
+    room = MAX_COMMENT_CHARS - len(heading) - 100
+    review = review_summary(review, max(room - len(analysis), room // 2), note="review truncated")
+    update = review_summary(analysis, room - len(review), note="update truncated")
+    return f"{review}{heading}{update}"
+
+
+class ReviewStateStore:
+    """SQLite table of the head SHA, analysis and bot comment last reviewed per PR."""
+
+    def __init__(self, config: ReviewStateConfig):
+        self.config = config
+        self.path = Path(config.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._recorded = 0
+        self._lookups = 0
+        self._found = 0
+
+    def get(self, repo: str, number: int) -> Optional[ReviewState]:
+        """Return the last review of a PR, if one was recorded within the TTL."""
+        cutoff = time.time() - self.config.ttl_seconds
+        with self._lock:
+            self._lookups += 1
+            row = self._conn.execute(
+                "SELECT head_sha, analysis, comment_id, comment_body, updated_at "
+                "FROM reviews WHERE repo = ? AND number = ? AND updated_at > ?",
+                (repo, number, cutoff)
+            ).fetchone()
+            if row is None:
+                return None
+            self._found += 1
+            return ReviewState(*row)
+
+    def record(
+        self,
+        repo: str,
+        number: int,
+        head_sha: str,
+        analysis: str,
+        comment_id: Optional[int],
+        comment_body: str
+    ) -> None:
+        """Record the review of ``head_sha``, replacing the PR's previous one."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews "
+                "(repo, number, head_sha, analysis, comment_id, comment_body, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repo, number, head_sha, analysis, comment_id, comment_body, now)
+            )
+            self._recorded += 1
+            if self._recorded % _PURGE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM reviews WHERE updated_at <= ?", (now - self.config.ttl_seconds,)
+                )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lookup statistics."""
+        with self._lock:
+            tracked = self._conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        return {
+            "tracked_prs": tracked,
+            "lookups": self._lookups,
+            "found": self._found,
+            "recorded": self._recorded
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,83 @@
+"""Precompiled repository and event routing."""
+
+from fnmatch import fnmatchcase
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from .config import RepositoryConfig
+
+# Upper bound on memoised wildcard lookups before the memo is reset
+_MAX_MEMO_ENTRIES = 4096
+
+
+class Route(NamedTuple):
+    """A compiled repository entry."""
+    pattern: str
+    config: "RepositoryConfig"
+    events: FrozenSet[str]
+
+
+class RoutingDecision(NamedTuple):
+    """The routing outcome for one delivery, computed once per request."""
+    repository: str
+    event_type: str
+    route: Optional[Route]
+    enabled: bool
+    reason: str
+
+    @property
+    def repo_config(self) -> Optional["RepositoryConfig"]:
+        return self.route.config if self.route else None
+
+
+class RoutingTable:
+    """Maps repository names to their configuration in O(1).
+
+    Entries are matched in order of specificity: exact names, then org-level
+    wildcards (``myorg/*``), then any other glob pattern in declaration order.
+    """
+
+    def __init__(self, repositories: List["RepositoryConfig"]):
+        self._exact: Dict[str, Route] = {}
+        self._orgs: Dict[str, Route] = {}
+        self._globs: List[Route] = []
+        self._memo: Dict[str, Optional[Route]] = {}
+
+        for repo in repositories:
+            route = Route(pattern=repo.name, config=repo, events=frozenset(repo.events))
+            if repo.name.endswith("/*") and not any(c in repo.name[:-2] for c in "*?["):
+                self._orgs.setdefault(repo.name[:-2], route)
+            elif any(c in repo.name for c in "*?["):
+                self._globs.append(route)
+            else:
+                self._exact.setdefault(repo.name, route)
+
+    def lookup(self, repo_name: str) -> Optional[Route]:
+        """Find the route for a repository, or None if it is not configured."""
+        route = self._exact.get(repo_name)
+        if route is not None:
+            return route
+
+        if repo_name in self._memo:
+            return self._memo[repo_name]
+
+        org, _, _ = repo_name.partition("/")
+        route = self._orgs.get(org)
+        if route is None:
+            route = next(
+                (r for r in self._globs if fnmatchcase(repo_name, r.pattern)), None
+            )
+
+        if len(self._memo) >= _MAX_MEMO_ENTRIES:
+            self._memo.clear()
+        self._memo[repo_name] = route
+        return route
+
+    def decide(self, repo_name: str, event_type: str) -> RoutingDecision:
+        """Compute the routing decision for a delivery."""
+        route = self.lookup(repo_name)
+        if route is None:
+            return RoutingDecision(repo_name, event_type, None, False, "repository not configured")
+        if event_type not in route.events:
+            return RoutingDecision(repo_name, event_type, route, False, "event type not enabled")
+        return RoutingDecision(repo_name, event_type, route, True, "")
@@ -0,0 +1,145 @@
+"""Incremental output for streamed Claude responses."""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from .clients import GitHubClient
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PLACEHOLDER_TEXT = "_Analysis in progress, this comment will update as it is written…_"
+FAILED_TEXT = "_The analysis could not be completed._"
+
+
+class ProgressiveComment:
+    """A placeholder GitHub comment that is edited as streamed text arrives.
+
+    Edits are throttled to one per ``interval`` seconds and run in the
+    background with at most one in flight, so a slow GitHub API never holds
+    up the stream; ``finish`` always writes the complete text. A stream that
+    fails ``discard``s the placeholder, so a retried delivery doesn't leave
+    a stale one behind.
+    """
+
+    def __init__(
+        self,
+        github_client: GitHubClient,
+        repo_name: str,
+        issue_number: int,
+        render: Callable[[str], str],
+        interval: float = 5.0
+    ):
+        self.github_client = github_client
+        self.repo_name = repo_name
+        self.issue_number = issue_number
+        self.render = render
+        self.interval = interval
+
+        self.comment_id: Optional[int] = None
+        self._last_update = 0.0
+        self._pending: Optional[asyncio.Task] = None
+
+    @property
+    def posted(self) -> bool:
+        """Whether the placeholder comment exists."""
+        return self.comment_id is not None
+
+    async def start(self) -> None:
+        """Post the placeholder comment."""
+        self.comment_id = await self.github_client.create_comment(
+            self.repo_name, self.issue_number, self.render(PLACEHOLDER_TEXT)
+        )
+        self._last_update = time.monotonic()
+
+    def update(self, text: Callable[[], str]) -> None:
+        """Schedule an edit with the text so far, unless one was made recently.
+
+        ``text`` is only called when an edit is actually made.
+        """
+        if not self.posted or self._pending is not None:
+            return
+        if time.monotonic() - self._last_update < self.interval:
+            return
+
+        self._last_update = time.monotonic()
+        self._pending = asyncio.create_task(self._edit(text()))
+        self._pending.add_done_callback(self._edit_done)
+
+    def _edit_done(self, task: asyncio.Task) -> None:
+        self._pending = None
+
+    async def finish(self, text: str) -> bool:
+        """Write the final text; returns whether the comment was updated."""
+        if not self.posted:
+            return False
+        await self._settle()
+        return await self._edit(text)
+
+    async def discard(self, text: str) -> None:
+        """Delete the comment, or mark it with ``text`` if it can't be deleted."""
+        if not self.posted:
+            return
+        await self._settle()
+        if await self.github_client.delete_comment(self.repo_name, self.comment_id):
+            self.comment_id = None
+        else:
+            await self._edit(text)
+
+    async def _settle(self) -> None:
+        if self._pending is not None:
+            await asyncio.gather(self._pending, return_exceptions=True)
+
+    async def _edit(self, text: str) -> bool:
+        return await self.github_client.update_comment(
+            self.repo_name, self.issue_number, self.comment_id, self.render(text)
+        )
+
+
+class AnalysisStream:
+    """Receives streamed text, appending it to the analysis file as it arrives."""
+
+    def __init__(self, path: Path, comment: Optional[ProgressiveComment] = None):
+        self.path = path
+        self.comment = comment
+        self._chunks: List[str] = []
+        self._received = 0
+        self._file = None
+
+    @property
+    def text(self) -> str:
+        """Text received so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    async def open(self) -> None:
+        """Truncate the output file and post the placeholder comment."""
+        self._file = open(self.path, "w", encoding="utf-8")
+        if self.comment is not None:
+            await self.comment.start()
+
+    async def write(self, chunk: str) -> None:
+        """Append a chunk to the file and refresh the comment."""
+        self._chunks.append(chunk)
+        self._received += len(chunk)
+        self._file.write(chunk)
+        self._file.flush()
+        if self.comment is not None:
+            self.comment.update(lambda: self.text)
+
+    async def close(self, failed: bool = False) -> bool:
+        """Close the file and finalise the comment; returns whether the comment holds the result."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self.comment is None:
+            return False
+        if failed:
+            logger.warning("Streamed analysis failed", path=str(self.path), received=self._received)
+            await self.comment.discard(f"{self.text}\n\n{FAILED_TEXT}" if self._received else FAILED_TEXT)
+            return False
+        return await self.comment.finish(self.text)
@@ -0,0 +1,152 @@
+"""Structured triage decisions from Claude's analyses."""
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Tool input field holding the markdown analysis. Claude is made to call
+# the tool, which leaves no room for a text reply, so the analysis is
+# written into the call itself
+ANALYSIS_FIELD = "analysis"
+
+# Tool Claude answers with; templates opt in by listing its name under
+# ``tools`` in their frontmatter
+TRIAGE_TOOL: Dict[str, Any] = {
+    "name": "record_triage",
+    "description": (
+        "Record the analysis requested above and the triage decision it arrives at "
+        "for the issue or pull request. Call it exactly once."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            ANALYSIS_FIELD: {
+                "type": "string",
+                "description": "The complete analysis, in markdown, with every section the instructions ask for"
+            },
+            "category": {
+                "type": "string",
+                "enum": ["bug", "enhancement", "question", "documentation", "maintenance"]
+            },
+            "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+            "difficulty": {"type": "string", "enum": ["easy", "moderate", "complex"]},
+            "components": {
+                "type": "array",
+                "items": {"type": "string", "enum": ["frontend", "backend", "database"]}
+            },
+            "change_type": {
+                "type": "string",
+                "enum": ["bug-fix", "feature", "refactor", "docs"],
+                "description": "Pull requests only: the kind of change made"
+            },
+            "close": {
+                "type": "boolean",
+                "description": "Issues only: whether the issue is spam, nonsensical, harmful or out of scope"
+            },
+            "close_label": {"type": "string", "enum": ["invalid", "wontfix"]}
+        },
+        "required": [ANALYSIS_FIELD]
+    }
+}
+
+TOOLS: Dict[str, Dict[str, Any]] = {TRIAGE_TOOL["name"]: TRIAGE_TOOL}
+
+_PROPERTIES = TRIAGE_TOOL["input_schema"]["properties"]
+_CATEGORIES: Tuple[str, ...] = tuple(_PROPERTIES["category"]["enum"])
+_CHANGE_TYPES: Tuple[str, ...] = tuple(_PROPERTIES["change_type"]["enum"])
+
+# Issue labels the fallback can find, in the order they are applied,
+# keyed by (field, value) as read from a marker
+_ISSUE_LABELS: Dict[Tuple[str, str], str] = {
+    **{("category", value): value for value in _CATEGORIES},
+    **{("priority", value): f"priority-{value}" for value in _PROPERTIES["priority"]["enum"]},
+    **{("difficulty", value): f"difficulty-{value}" for value in _PROPERTIES["difficulty"]["enum"]},
+    **{("component", value): f"component-{value}" for value in _PROPERTIES["components"]["items"]["enum"]}
+}
+
+# Marker names as written in an analysis -> field
+_FIELD_NAMES = {
+    "category": "category",
+    "classification": "category",
+    "priority": "priority",
+    "difficulty": "difficulty",
+    "complexity": "difficulty",
+    "component": "component",
+    "type": "type"
+}
+
+# Fallback for analyses without a tool result. Only explicit markers count:
+# label names like ``priority-high`` or ``type/bug-fix``, fields like
+# ``**Priority**: High``, category labels in backticks, and the close
+# recommendation. Prose words such as "complex" or "database" do not
+_MARKERS = re.compile(
+    r"(?P<close>(?-i:RECOMMENDATION: CLOSE ISSUE))"
+    r"|`(?P<label>" + "|".join(_CATEGORIES) + r")`"
+    r"|\b(?P<field>" + "|".join(_FIELD_NAMES) + r")(?:\s+level)?"
+    r"[\s*_`]*[-:/=][\s*_`]*"
+    r"(?P<value>[a-z]+(?:-[a-z]+)?)\b",
+    re.IGNORECASE
+)
+
+
+class Triage(NamedTuple):
+    """Labels and close decision for one analysis.
+
+    ``structured`` is True when they came from Claude's tool call rather
+    than the fallback markers.
+    """
+    labels: Tuple[str, ...]
+    change_type: Optional[str]
+    close_issue: bool
+    structured: bool
+
+    @classmethod
+    def from_tool_input(cls, data: Dict[str, Any]) -> "Triage":
+        """Build from the input of a ``record_triage`` call."""
+        labels: List[str] = []
+        if data.get("category"):
+            labels.append(data["category"])
+        for field in ("priority", "difficulty"):
+            if data.get(field):
+                labels.append(f"{field}-{data[field]}")
+        labels.extend(f"component-{component}" for component in data.get("components") or ())
+
+        close_issue = bool(data.get("close"))
+        if close_issue and data.get("close_label"):
+            labels.append(data["close_label"])
+
+        return cls(
+            labels=tuple(dict.fromkeys(labels)),
+            change_type=data.get("change_type"),
+            close_issue=close_issue,
+            structured=True
+        )
+
+    @classmethod
+    def from_text(cls, analysis: str) -> "Triage":
+        """Scan an analysis once for explicit label markers."""
+        close_issue = False
+        found = set()
+        for match in _MARKERS.finditer(analysis):
+            if match.group("close"):
+                close_issue = True
+            elif match.group("label"):
+                found.add(("category", match.group("label").lower()))
+            else:
+                field = _FIELD_NAMES[match.group("field").lower()]
+                value = match.group("value").lower()
+                # "Type" names the issue category or, for PRs, the change type
+                if field == "type" and value in _CATEGORIES:
+                    field = "category"
+                found.add((field, value))
+
+        labels = tuple(label for key, label in _ISSUE_LABELS.items() if key in found)
+        change_type = next((change for change in _CHANGE_TYPES if ("type", change) in found), None)
+        return cls(labels=labels, change_type=change_type, close_issue=close_issue, structured=False)
+
+    @classmethod
+    def from_analysis(cls, analysis: str) -> "Triage":
+        """Use the analysis's ``record_triage`` result when it has one, else the fallback markers."""
+        tool_input = getattr(analysis, "tool_input", None)
+        if tool_input is not None:
+            return cls.from_tool_input(tool_input)
+        return cls.from_text(analysis)
@@ -5,10 +5,17 @@ from typing import Dict, Any, Optional
 from collections import defaultdict, deque
 
 from .config import Settings
-from .clients import ClaudeClient, GitHubClient
+from .clients import ClaudeClient, GitHubClient, is_retryable, track_writes
+from .dedup import DeliveryDeduplicator
+from .github_cache import ETagCache
+from .pr_artifacts import PRArtifactCache
+from .review_state import ReviewStateStore
+from .response_cache import ResponseCache
 from .prompts import PromptLoader
-from .handlers import HANDLERS
+from .handlers import HANDLERS, BaseHandler
 from .logging_config import get_logger, request_id_processor
+from .payloads import WebhookEvent, encode_payload
+from .routing import RoutingDecision
 
 logger = get_logger(__name__)
 
@@ -20,16 +27,23 @@ class WebhookProcessor:
         self.settings = settings
         
         # Initialize clients
-        self.claude_client = ClaudeClient(settings.claude)
-        self.github_client = GitHubClient(settings.github)
+        self.claude_client = ClaudeClient(
+            settings.claude,
+            rate_limiting=settings.features.rate_limiting,
+            response_cache=ResponseCache(settings.response_cache) if settings.response_cache.enabled else None,
+            batch_config=settings.batch
+        )
+        self.github_client = GitHubClient(
+            settings.github,
+            cache=ETagCache(settings.github_cache) if settings.github_cache.enabled else None,
+            artifacts=PRArtifactCache(settings.pr_artifacts) if settings.pr_artifacts.enabled else None
+        )
         self.prompt_loader = PromptLoader(settings.prompts)
+        self.deduplicator = DeliveryDeduplicator(settings.dedup)
+        self.review_state = ReviewStateStore(settings.review_state) if settings.review_state.enabled else None
         
         # Initialize handlers
-        self.handlers = {}
-        for event_type, handler_class in HANDLERS.items():
-            self.handlers[event_type] = handler_class(
-                settings, self.claude_client, self.github_client, self.prompt_loader
-            )
+        self.handlers = self._build_handlers(settings, self.prompt_loader)
         
         # Statistics tracking
         self.stats = {
@@ -39,6 +53,10 @@ class WebhookProcessor:
             "events_by_type": defaultdict(int),
             "events_by_repo": defaultdict(int),
             "processing_times": deque(maxlen=100),  # Keep last 100 processing times
+            "large_pr_reviews": 0,
+            "incremental_reviews": 0,
+            "delta_tokens": deque(maxlen=100),
+            "part_latencies": deque(maxlen=100),
             "start_time": time.time()
         }
         
@@ -48,17 +66,56 @@ class WebhookProcessor:
             repositories=[repo.name for repo in settings.repositories]
         )
     
+    def _build_handlers(self, settings: Settings, prompt_loader: PromptLoader) -> Dict[str, BaseHandler]:
+        """Instantiate one handler per event type."""
+        return {
+            event_type: handler_class(
+                settings, self.claude_client, self.github_client, prompt_loader,
+                review_state=self.review_state
+            )
+            for event_type, handler_class in HANDLERS.items()
+        }
+    
+    def apply_settings(self, settings: Settings) -> None:
+        """Swap in reloaded settings for subsequent deliveries.
+        
+        Handlers in flight keep the settings and prompt loader they started
+        with; only deliveries dispatched after the swap see the new config.
+        Raises if a configured template does not compile, leaving the
+        current settings in place.
+        """
+        prompt_loader = PromptLoader(settings.prompts)
+        prompt_loader.warm_up()
+        handlers = self._build_handlers(settings, prompt_loader)
+        
+        # Single assignment with no await in between, so no delivery can
+        # observe a mix of old and new components
+        self.settings, self.prompt_loader, self.handlers = settings, prompt_loader, handlers
+        
+        logger.info(
+            "Settings applied",
+            repositories=[repo.name for repo in settings.repositories]
+        )
+    
     async def process_webhook(
         self, 
         event_type: str, 
         payload: Dict[str, Any], 
         delivery_id: Optional[str] = None,
-        request_id: Optional[str] = None
+        request_id: Optional[str] = None,
+        decision: Optional[RoutingDecision] = None
     ) -> Dict[str, Any]:
-        """Process a webhook event."""
+        """Process a webhook event.
+
+        ``decision`` may carry a routing decision already made for this
+        delivery; otherwise it is computed here, once.
+        """
         
         start_time = time.time()
         
+        # Snapshot the current config so a reload mid-delivery has no effect
+        settings, handlers = self.settings, self.handlers
+        
         # Set request ID for logging context
         if request_id:
             request_id_processor.set_request_id(request_id)
@@ -67,13 +124,11 @@ class WebhookProcessor:
         self.stats["total_webhooks"] += 1
         self.stats["events_by_type"][event_type] += 1
         
-        # Extract repository name
-        repository = payload.get("repository", {})
-        repo_name = repository.get("full_name", "unknown")
+        # Build the typed payload view once for the whole pipeline
+        event = WebhookEvent.from_payload(payload)
+        repo_name = event.repository.full_name or "unknown"
         self.stats["events_by_repo"][repo_name] += 1
-        
-        # Extract action
-        action = payload.get("action", "")
+        action = event.action
         
         logger.info(
             "Processing webhook",
@@ -83,80 +138,96 @@ class WebhookProcessor:
             delivery_id=delivery_id
         )
         
-        try:
-            # Check if we have a handler for this event type
-            if event_type not in self.handlers:
-                logger.warning("No handler for event type", event_type=event_type)
-                return {
-                    "status": "ignored",
-                    "reason": f"no handler for event type '{event_type}'"
-                }
-            
-            # Get repository configuration
-            repo_config = self.settings.get_repository_config(repo_name)
-            if not repo_config:
-                logger.info("Repository not configured", repository=repo_name)
-                return {
-                    "status": "ignored",
-                    "reason": "repository not configured"
-                }
-            
-            # Check if event is enabled for this repository
-            if not self.settings.is_event_enabled(repo_name, event_type):
+        # Writes to GitHub decide whether a failed delivery may be retried
+        with track_writes():
+            try:
+                # Check if we have a handler for this event type
+                if event_type not in handlers:
+                    logger.warning("No handler for event type", event_type=event_type)
+                    return {
+                        "status": "ignored",
+                        "reason": f"no handler for event type '{event_type}'"
+                    }
+                
+                # Route against the compiled repository table
+                if decision is None:
+                    decision = settings.route(repo_name, event_type)
+                if not decision.enabled:
+                    logger.info(
+                        "Webhook not routed",
+                        reason=decision.reason,
+                        event_type=event_type,
+                        repository=repo_name
+                    )
+                    return {
+                        "status": "ignored",
+                        "reason": decision.reason
+                    }
+                
+                # Process with appropriate handler
+                handler = handlers[event_type]
+                result = await handler.handle(event, action, decision.route)
+                
+                # Re-run the delivery once its batched analysis has finished
+                if result.get("status") == "deferred":
+                    self.claude_client.batch_lane.add_waiter(
+                        result["batch_key"],
+                        event_type,
+                        encode_payload(payload),
+                        delivery_id=delivery_id,
+                        request_id=request_id
+                    )
+                
+                # Record per-part latency of map-reduce reviews
+                if result.get("parts"):
+                    self.stats["large_pr_reviews"] += 1
+                    self.stats["part_latencies"].extend(part["latency"] for part in result["parts"])
+                
+                if result.get("incremental"):
+                    self.stats["incremental_reviews"] += 1
+                    self.stats["delta_tokens"].append(result["delta_tokens"])
+                
+                # Update success statistics
+                if result.get("status") == "success":
+                    self.stats["successful_processing"] += 1
+                elif result.get("status") == "error":
+                    self.stats["failed_processing"] += 1
+                
+                # Record processing time
+                processing_time = time.time() - start_time
+                self.stats["processing_times"].append(processing_time)
+                
                 logger.info(
-                    "Event type not enabled for repository",
+                    "Webhook processing completed",
+                    event_type=event_type,
+                    repository=repo_name,
+                    result_status=result.get("status"),
+                    processing_time=f"{processing_time:.2f}s"
+                )
+                
+                return result
+                
+            except Exception as e:
+                self.stats["failed_processing"] += 1
+                processing_time = time.time() - start_time
+                self.stats["processing_times"].append(processing_time)
+                
+                logger.error(
+                    "Error processing webhook",
                     event_type=event_type,
-                    repository=repo_name
+                    repository=repo_name,
+                    error=str(e),
+                    processing_time=f"{processing_time:.2f}s",
+                    exc_info=True
                 )
+                
                 return {
-                    "status": "ignored",
-                    "reason": "event type not enabled"
+                    "status": "error",
+                    "error": str(e),
+                    "event_type": event_type,
+                    "repository": repo_name,
+                    "retryable": is_retryable(e)
                 }
-            
-            # Process with appropriate handler
-            handler = self.handlers[event_type]
-            result = await handler.handle(payload, action)
-            
-            # Update success statistics
-            if result.get("status") == "success":
-                self.stats["successful_processing"] += 1
-            elif result.get("status") == "error":
-                self.stats["failed_processing"] += 1
-            
-            # Record processing time
-            processing_time = time.time() - start_time
-            self.stats["processing_times"].append(processing_time)
-            
-            logger.info(
-                "Webhook processing completed",
-                event_type=event_type,
-                repository=repo_name,
-                result_status=result.get("status"),
-                processing_time=f"{processing_time:.2f}s"
-            )
-            
-            return result
-            
-        except Exception as e:
-            self.stats["failed_processing"] += 1
-            processing_time = time.time() - start_time
-            self.stats["processing_times"].append(processing_time)
-            
-            logger.error(
-                "Error processing webhook",
-                event_type=event_type,
-                repository=repo_name,
-                error=str(e),
-                processing_time=f"{processing_time:.2f}s",
-                exc_info=True
-            )
-            
-            return {
-                "status": "error",
-                "error": str(e),
-                "event_type": event_type,
-                "repository": repo_name
-            }
     
     async def get_stats(self) -> Dict[str, Any]:
         """Get processing statistics."""
@@ -168,6 +239,9 @@ class WebhookProcessor:
         # Calculate uptime
         uptime = time.time() - self.stats["start_time"]
         
+        part_latencies = list(self.stats["part_latencies"])
+        delta_tokens = list(self.stats["delta_tokens"])
+        
         # Get client stats
         github_stats = self.github_client.get_stats()
         
@@ -184,6 +258,19 @@ class WebhookProcessor:
             "events_by_type": dict(self.stats["events_by_type"]),
             "events_by_repo": dict(self.stats["events_by_repo"]),
             "github_api": github_stats,
+            "claude_api": self.claude_client.get_stats(),
+            "prompts": self.prompt_loader.get_stats(),
+            "deduplication": self.deduplicator.get_stats(),
+            "large_pr": {
+                "reviews": self.stats["large_pr_reviews"],
+                "average_part_latency": sum(part_latencies) / len(part_latencies) if part_latencies else 0,
+                "max_part_latency": max(part_latencies, default=0)
+            },
+            "incremental_reviews": {
+                "reviews": self.stats["incremental_reviews"],
+                "average_delta_tokens": sum(delta_tokens) / len(delta_tokens) if delta_tokens else 0,
+                "state": self.review_state.get_stats() if self.review_state is not None else None
+            },
             "handlers": list(self.handlers.keys()),
             "repositories": [repo.name for repo in self.settings.repositories]
         }
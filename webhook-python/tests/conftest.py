@@ -20,9 +20,9 @@ def sample_prompts(temp_dir):
     prompts_dir = temp_dir / "prompts"
     
     # Create prompt directories
-    (prompts_dir / "issues").mkdir(parents=True)
-    (prompts_dir / "pull_requests").mkdir(parents=True)
-    (prompts_dir / "reviews").mkdir(parents=True)
+    (prompts_dir / "issues").mkdir(parents=True, exist_ok=True)
+    (prompts_dir / "pull_requests").mkdir(parents=True, exist_ok=True)
+    (prompts_dir / "reviews").mkdir(parents=True, exist_ok=True)
     
     # Create sample prompt files
     (prompts_dir / "issues" / "new_issue.md").write_text(
@@ -0,0 +1,177 @@
+"""Tests for the Message Batches lane, run against a local stand-in API server."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from anthropic import AsyncAnthropic
+
+from webhook_handler.batches import AnalysisDeferred, BatchLane
+from webhook_handler.clients import ClaudeClient
+from webhook_handler.config import BatchConfig, ClaudeConfig
+from webhook_handler.triage import TRIAGE_TOOL
+
+
+class StandInBatchesAPI(BaseHTTPRequestHandler):
+    """Implements just enough of /v1/messages/batches for the lane."""
+
+    batches = {}
+    ended = False
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _batch(self, batch_id):
+        host = f"http://{self.headers['Host']}"
+        ended = type(self).ended
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": "2024-01-01T00:01:00Z" if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{host}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        batch_id = f"msgbatch_{len(self.batches) + 1}"
+        self.batches[batch_id] = body["requests"]
+        self._send_json(self._batch(batch_id))
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        batch_id = parts[3]
+        if parts[-1] != "results":
+            self._send_json(self._batch(batch_id))
+            return
+
+        lines = []
+        for request in self.batches[batch_id]:
+            prompt = request["params"]["messages"][0]["content"]
+            if "tools" in request["params"]:
+                content = [{"type": "tool_use", "id": "toolu_1", "name": request["params"]["tools"][0]["name"],
+                            "input": {"analysis": f"echo: {prompt}", "category": "bug"}}]
+            else:
+                content = [{"type": "text", "text": f"echo: {prompt}"}]
+            if "fail" in prompt:
+                result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "boom"}}}
+            else:
+                result = {"type": "succeeded", "message": {
+                    "id": "msg_1", "type": "message", "role": "assistant", "model": "test",
+                    "content": content,
+                    "stop_reason": "end_turn", "stop_sequence": None,
+                    "usage": {"input_tokens": 5, "output_tokens": 5},
+                }}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+        self._send_json("\n".join(lines).encode(), content_type="application/binary")
+
+
+@pytest.fixture
+def stand_in_api():
+    StandInBatchesAPI.batches = {}
+    StandInBatchesAPI.ended = False
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBatchesAPI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def lane(stand_in_api, tmp_path):
+    config = BatchConfig(path=str(tmp_path / "batches.db"), window_seconds=0, poll_interval=0.01)
+    client = AsyncAnthropic(api_key="test", base_url=stand_in_api, max_retries=0)
+    lane = BatchLane(config, client)
+    yield lane
+    lane.close()
+
+
+def _params(prompt):
+    return {"model": "test", "max_tokens": 100, "messages": [{"role": "user", "content": prompt}]}
+
+
+@pytest.mark.asyncio
+async def test_batch_round_trip_resumes_waiters(lane):
+    resumed = []
+
+    async def resume(waiter):
+        resumed.append(waiter)
+
+    lane._resume = resume
+
+    assert lane.request("a" * 64, _params("hello")) is None
+    lane.add_waiter("a" * 64, "workflow_run", b'{"action": "completed"}', delivery_id="d1")
+
+    await lane.tick()
+    assert lane.get_stats()["submitted"] == 1
+    assert resumed == []
+
+    StandInBatchesAPI.ended = True
+    await lane.tick()
+
+    assert [w.delivery_id for w in resumed] == ["d1"]
+    assert resumed[0].payload == b'{"action": "completed"}'
+
+    result = lane.request("a" * 64, _params("hello"))
+    assert result.status == "succeeded"
+    assert result.text == "echo: hello"
+    assert lane.get_stats()["waiting_deliveries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_waits_for_window(lane):
+    lane.config = BatchConfig(path=lane.config.path, window_seconds=3600, max_batch_size=2)
+
+    lane.request("b" * 64, _params("one"))
+    assert await lane.submit_due() is None
+
+    lane.request("c" * 64, _params("two"))
+    assert await lane.submit_due() is not None
+    assert lane.get_stats()["requests_submitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_errored_request_is_reported(lane):
+    lane.request("d" * 64, _params("please fail"))
+    batch_id = await lane.submit_due()
+
+    StandInBatchesAPI.ended = True
+    assert await lane.collect(batch_id) is True
+
+    result = lane.request("d" * 64, _params("please fail"))
+    assert result.status == "errored"
+    assert lane.get_stats()["errored"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batched_tool_call_keeps_its_input(stand_in_api, tmp_path):
+    config = BatchConfig(path=str(tmp_path / "batches.db"), window_seconds=0)
+    client = ClaudeClient(ClaudeConfig(api_key="test", base_url=stand_in_api), rate_limiting=False, batch_config=config)
+
+    with pytest.raises(AnalysisDeferred):
+        await client.analyze_batched("prompt", "context", use_cache=False, tools=[TRIAGE_TOOL])
+    await client.batch_lane.tick()
+    submitted = next(iter(StandInBatchesAPI.batches.values()))[0]["params"]
+    assert submitted["tool_choice"] == {"type": "tool", "name": "record_triage"}
+
+    StandInBatchesAPI.ended = True
+    await client.batch_lane.tick()
+    analysis = await client.analyze_batched("prompt", "context", use_cache=False, tools=[TRIAGE_TOOL])
+    await client.close()
+
+    assert analysis == "echo: context\n\nprompt"
+    assert analysis.tool_input == {"category": "bug"}
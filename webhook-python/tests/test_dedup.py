@@ -0,0 +1,61 @@
+"""Tests for delivery-ID deduplication."""
+
+import time
+
+import pytest
+
+from webhook_handler.config import DedupConfig
+from webhook_handler.dedup import DeliveryDeduplicator
+
+
+@pytest.fixture
+def dedup_config(tmp_path):
+    """Deduplication config backed by a temporary database."""
+    return DedupConfig(path=str(tmp_path / "deliveries.db"), ttl_seconds=60, memory_entries=2)
+
+
+def test_redelivery_is_detected(dedup_config):
+    """The second delivery with the same ID is a duplicate."""
+    dedup = DeliveryDeduplicator(dedup_config)
+    
+    assert dedup.check_and_record("abc") is False
+    assert dedup.check_and_record("abc") is True
+    assert dedup.check_and_record("def") is False
+    
+    stats = dedup.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_missing_delivery_id_is_never_duplicate(dedup_config):
+    """Deliveries without an ID are always processed."""
+    dedup = DeliveryDeduplicator(dedup_config)
+    
+    assert dedup.check_and_record(None) is False
+    assert dedup.check_and_record(None) is False
+
+
+def test_disk_tier_survives_restart_and_lru_eviction(dedup_config):
+    """IDs evicted from memory or from a previous process are still found on disk."""
+    dedup = DeliveryDeduplicator(dedup_config)
+    for delivery_id in ("a", "b", "c"):
+        dedup.check_and_record(delivery_id)
+    assert dedup.get_stats()["cached_in_memory"] == 2
+    dedup.close()
+    
+    restarted = DeliveryDeduplicator(dedup_config)
+    assert restarted.check_and_record("a") is True
+
+
+def test_expired_and_forgotten_deliveries_are_processed_again(dedup_config):
+    """Entries older than the TTL, or explicitly forgotten, are not duplicates."""
+    dedup = DeliveryDeduplicator(dedup_config)
+    dedup.check_and_record("old")
+    dedup.check_and_record("failed")
+    
+    dedup._memory["old"] = time.time() - 120
+    dedup._conn.execute("UPDATE deliveries SET seen_at = ? WHERE delivery_id = 'old'", (time.time() - 120,))
+    dedup.forget("failed")
+    
+    assert dedup.check_and_record("old") is False
+    assert dedup.check_and_record("failed") is False
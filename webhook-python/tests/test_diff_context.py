@@ -0,0 +1,87 @@
+"""Tests for token-budgeted diff assembly."""
+
+from webhook_handler.diff_context import assemble_diff, group_diff, is_low_priority, pack_view, rank_entries
+from webhook_handler.diff_view import DiffView
+
+
+def _file(path, hunks, lines_per_hunk=3):
+    parts = [
+        f"diff --git a/{path} b/{path}",
+        "index 1111111..2222222 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+    ]
+    for h in range(hunks):
+        parts.append(f"@@ -{h * 10 + 1},3 +{h * 10 + 1},{lines_per_hunk} @@")
+        parts.extend(f"+added line {h}-{i} in {path}" for i in range(lines_per_hunk))
+    return "\n".join(parts) + "\n"
+
+
+def test_pack_view_packs_only_the_given_entries():
+    diff = _file("src/app.py", 2) + _file("README.md", 1, lines_per_hunk=1)
+    view = DiffView.from_text(diff)
+
+    packed = pack_view(view, 100000, entries=view.files[1:])
+
+    assert packed.included == ("README.md",)
+    assert packed.text == _file("README.md", 1, lines_per_hunk=1)
+    assert packed.omitted == ()
+
+
+def test_rank_puts_source_before_lockfiles_then_by_size():
+    diff = (
+        _file("package-lock.json", 5, lines_per_hunk=20)
+        + _file("src/small.py", 1, lines_per_hunk=1)
+        + _file("src/big.py", 3)
+    )
+    ranked = [e.path for e in rank_entries(DiffView.from_text(diff).files)]
+    assert ranked == ["src/big.py", "src/small.py", "package-lock.json"]
+
+    assert is_low_priority("frontend/node_modules/x/index.js")
+    assert is_low_priority("static/app.min.js")
+    assert not is_low_priority("src/lock.py")
+
+
+def test_assemble_fits_budget_with_whole_hunks():
+    diff = _file("src/a.py", 4) + _file("poetry.lock", 4)
+    full = assemble_diff(diff, 100000)
+    assert full.complete
+    assert full.text == diff
+
+    # The header and the first three of its four hunks
+    budget = assemble_diff(_file("src/a.py", 3), 100000).tokens
+    packed = assemble_diff(diff, budget)
+
+    assert packed.tokens <= budget
+    assert packed.included == ("src/a.py",)
+    assert packed.partial == ("src/a.py",)
+    assert packed.omitted == ("poetry.lock",)
+    # Never cut mid-hunk
+    assert packed.text.count("@@ -") == 3
+    assert packed.text.endswith("\n")
+    assert "poetry.lock" in packed.omission_note()
+
+
+def test_assemble_keeps_diff_order_and_skips_what_does_not_fit():
+    diff = _file("src/huge.py", 1, lines_per_hunk=200) + _file("src/b.py", 1) + _file("src/c.py", 1)
+    packed = assemble_diff(diff, 150)
+
+    assert packed.omitted == ("src/huge.py",)
+    assert packed.included == ("src/b.py", "src/c.py")
+    assert packed.text.index("src/b.py") < packed.text.index("src/c.py")
+
+
+def test_group_diff_fills_groups_and_reports_overflow():
+    diff = "".join(_file(f"src/f{i}.py", 1, lines_per_hunk=10) for i in range(5))
+    per_file = assemble_diff(_file("src/f0.py", 1, lines_per_hunk=10), 100000).tokens
+
+    groups, omitted = group_diff(diff, per_file * 2, max_groups=2)
+
+    assert [len(g.included) for g in groups] == [2, 2]
+    assert all(g.complete and g.tokens <= per_file * 2 for g in groups)
+    assert len(omitted) == 1
+
+    # A file larger than a group is packed hunk by hunk into its own group
+    groups, omitted = group_diff(_file("src/big.py", 6), per_file, max_groups=4)
+    assert groups[0].partial == ("src/big.py",)
+    assert omitted == ()
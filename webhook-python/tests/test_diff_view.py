@@ -0,0 +1,73 @@
+"""Tests for streamed, indexed diff views."""
+
+import pytest
+
+from webhook_handler.diff_context import assemble_diff, group_diff
+from webhook_handler.diff_view import DiffView, read_diff
+
+
+def _file(path, hunks, lines_per_hunk=3):
+    parts = [f"diff --git a/{path} b/{path}", f"--- a/{path}", f"+++ b/{path}"]
+    for h in range(hunks):
+        parts.append(f"@@ -{h * 10 + 1},3 +{h * 10 + 1},{lines_per_hunk} @@")
+        parts.extend(f"+added line {h}-{i} in {path}" for i in range(lines_per_hunk))
+        parts.append(f"-removed line {h} in {path}")
+    return "\n".join(parts) + "\n"
+
+
+async def _chunks(data, size=100):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_index_locates_files_and_counts_changes():
+    diff = _file("src/a.py", 2) + _file("src/b.py", 1, lines_per_hunk=5)
+    view = DiffView.from_text(diff)
+
+    assert [f.path for f in view.files] == ["src/a.py", "src/b.py"]
+    a, b = view.files
+    assert (a.additions, a.deletions) == (6, 2)
+    assert (b.additions, b.deletions) == (5, 1)
+    assert view.read(b) == _file("src/b.py", 1, lines_per_hunk=5)
+    assert view.read(a, limit=10) == "diff --git"
+    assert all(f.complete for f in view.files)
+
+
+@pytest.mark.asyncio
+async def test_large_diffs_spill_to_a_mapped_file():
+    diff = "".join(_file(f"src/f{i}.py", 3) for i in range(20))
+
+    view = await read_diff(_chunks(diff.encode()), max_bytes=10 ** 9, spill_bytes=500)
+
+    assert view.spilled
+    assert not view.truncated
+    assert view.text() == diff
+    assert assemble_diff(view, 300) == assemble_diff(diff, 300)
+    assert group_diff(view, 300, 3) == group_diff(diff, 300, 3)
+
+
+@pytest.mark.asyncio
+async def test_ceiling_cuts_at_the_last_whole_hunk():
+    diff = _file("src/a.py", 1) + _file("src/b.py", 4)
+    # Stop partway through b.py's third hunk
+    ceiling = diff.index("@@ -21,3") + 20
+
+    view = await read_diff(_chunks(diff.encode(), size=7), max_bytes=ceiling, spill_bytes=10 ** 9)
+
+    assert view.truncated
+    assert view.files[0].complete and not view.files[1].complete
+    assert view.text().endswith("-removed line 1 in src/b.py\n")
+
+    packed = assemble_diff(view, 10 ** 6)
+    assert packed.included == ("src/a.py", "src/b.py")
+    assert packed.partial == ("src/b.py",)
+
+
+@pytest.mark.asyncio
+async def test_ceiling_inside_a_files_first_hunk_drops_the_file():
+    diff = _file("src/a.py", 1) + _file("vendor/huge.js", 1, lines_per_hunk=500)
+    view = await read_diff(_chunks(diff.encode()), max_bytes=len(_file("src/a.py", 1)) + 200, spill_bytes=10 ** 9)
+
+    assert [f.path for f in view.files] == ["src/a.py"]
+    assert view.dropped == ("vendor/huge.js",)
+    assert assemble_diff(view, 10 ** 6).omitted == ("vendor/huge.js",)
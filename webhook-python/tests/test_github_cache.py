@@ -0,0 +1,90 @@
+"""Tests for the ETag cache on GitHub reads."""
+
+import httpx
+import pytest
+
+from webhook_handler.clients import GitHubClient
+from webhook_handler.config import GitHubCacheConfig, GitHubConfig
+from webhook_handler.github_cache import ETagCache
+from webhook_handler.mutations import IssueMutations
+
+ISSUE = {
+    "number": 5, "title": "T", "body": "b", "user": {"login": "u"},
+    "state": "open", "labels": [{"name": "bug"}], "html_url": "h"
+}
+
+
+def make_client(handler, **cache_overrides):
+    config = GitHubConfig(token="t", webhook_secret="s")
+    client = GitHubClient(config, cache=ETagCache(GitHubCacheConfig(**cache_overrides)))
+    client._http = httpx.AsyncClient(
+        base_url=config.api_url,
+        headers=client._http.headers,
+        transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def etag_server(calls):
+    def handler(request):
+        calls.append((request.method, request.url.path, request.headers.get("if-none-match")))
+        if request.method != "GET":
+            return httpx.Response(201, json={})
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=ISSUE, headers={"etag": '"v1"'})
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_fresh_entries_skip_the_api_and_stale_ones_revalidate():
+    calls = []
+    client = make_client(etag_server(calls), ttls={"issue": 3600})
+
+    first = await client.get_issue("o/r", 5)
+    second = await client.get_issue("o/r", 5)
+    assert first == second
+    assert len(calls) == 1
+
+    client.cache.config = GitHubCacheConfig(ttls={"issue": 0})
+    assert await client.get_issue("o/r", 5) == first
+    assert calls[-1] == ("GET", "/repos/o/r/issues/5", '"v1"')
+
+    stats = client.get_stats()["etag_cache"]
+    assert stats["fresh_hits"] == 1
+    assert stats["revalidated"] == 1
+    assert stats["misses"] == 1
+    assert stats["saved_quota"] == 2
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_the_issue():
+    calls = []
+    client = make_client(etag_server(calls), ttls={"issue": 3600})
+
+    await client.get_issue("o/r", 5)
+    await client.apply_mutations(IssueMutations("o/r", 5).add_labels(["question"]))
+    # The label POST dropped the cached issue
+    assert [c[0] for c in calls] == ["GET", "POST"]
+
+    await client.get_issue("o/r", 5)
+    assert calls[-1] == ("GET", "/repos/o/r/issues/5", None)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_keeps_etags_across_clients(tmp_path):
+    calls = []
+    path = str(tmp_path / "github_cache.db")
+
+    client = make_client(etag_server(calls), disk_path=path, ttls={"issue": 0})
+    await client.get_issue("o/r", 5)
+    await client.close()
+
+    client = make_client(etag_server(calls), disk_path=path, ttls={"issue": 0})
+    assert (await client.get_issue("o/r", 5))["title"] == "T"
+    assert calls[-1][2] == '"v1"'
+    assert client.get_stats()["etag_cache"]["revalidated"] == 1
+    await client.close()
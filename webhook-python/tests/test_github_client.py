@@ -0,0 +1,278 @@
+"""Tests for the async GitHub client."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from webhook_handler.clients import GitHubClient, is_retryable, track_writes
+from webhook_handler.config import GitHubConfig
+from webhook_handler.mutations import IssueMutations
+from webhook_handler.payloads import PullRequest
+
+
+def make_client(handler, **overrides):
+    config = GitHubConfig(token="t", webhook_secret="s", **overrides)
+    client = GitHubClient(config)
+    client._http = httpx.AsyncClient(
+        base_url=config.api_url,
+        headers=client._http.headers,
+        transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_get_pull_request_fetches_diff_and_all_file_pages():
+    def handler(request):
+        path = request.url.path
+        if path == "/repos/o/r/pulls/1" and "diff" in request.headers["accept"]:
+            return httpx.Response(200, text="diff --git a/x b/x\n")
+        if path == "/repos/o/r/pulls/1":
+            return httpx.Response(
+                200,
+                json={
+                    "number": 1, "title": "T", "body": None, "user": {"login": "u"},
+                    "state": "open", "labels": [{"name": "bug"}], "html_url": "h",
+                    "additions": 1, "deletions": 2, "changed_files": 3
+                },
+                headers={"x-ratelimit-limit": "5000", "x-ratelimit-remaining": "4999",
+                         "x-ratelimit-reset": "1700000000"}
+            )
+        if path == "/repos/o/r/pulls/1/files" and request.url.params.get("page") == "2":
+            return httpx.Response(200, json=[{"filename": "b.py"}])
+        if path == "/repos/o/r/pulls/1/files":
+            next_url = "https://api.github.com/repos/o/r/pulls/1/files?per_page=100&page=2"
+            return httpx.Response(200, json=[{"filename": "a.py"}], headers={"link": f'<{next_url}>; rel="next"'})
+        return httpx.Response(404)
+
+    client = make_client(handler)
+    pr = await client.get_pull_request("o/r", 1)
+
+    assert pr["diff"].text() == "diff --git a/x b/x\n"
+    assert pr["files"] == ["a.py", "b.py"]
+    assert pr["body"] == "" and pr["labels"] == ["bug"]
+
+    stats = client.get_stats()
+    assert stats["requests_made"] == 4
+    assert stats["rate_limit"]["core"]["remaining"] == 4999
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_close_issue_comments_first():
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path, request.content and json.loads(request.content)))
+        return httpx.Response(201, json={"id": 9})
+
+    client = make_client(handler)
+    assert await client.close_issue("o/r", 5, "bye") is True
+    assert [c[0] for c in calls] == ["POST", "PATCH"]
+    assert calls[1][2] == {"state": "closed"}
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_are_reported_not_raised_for_writes():
+    client = make_client(lambda request: httpx.Response(403, json={"message": "nope"}))
+
+    assert await client.post_issue_comment("o/r", 1, "hi") is False
+    assert await client.create_comment("o/r", 1, "hi") is None
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.get_issue("o/r", 1)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_tracked_and_deleting_a_created_comment_cancels_it():
+    def handler(request):
+        if request.method == "POST" and request.url.path.endswith("/comments"):
+            return httpx.Response(201, json={"id": 7, "url": "https://api.github.com/repos/o/r/issues/comments/7"})
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        return httpx.Response(200, json=[])
+
+    client = make_client(handler)
+    error = httpx.ConnectError("reset")
+    with track_writes() as writes:
+        comment_id = await client.create_comment("o/r", 1, "placeholder")
+        assert not is_retryable(error)
+        await client.delete_comment("o/r", comment_id)
+        assert not writes and is_retryable(error)
+
+        await client.apply_mutations(IssueMutations("o/r", 1).add_labels(["bug"]))
+        assert writes == {"/repos/o/r/issues/1/labels"}
+        assert not is_retryable(error)
+    await client.close()
+
+
+def test_only_transient_errors_are_retryable():
+    request = httpx.Request("GET", "https://api.github.com/repos/o/r")
+
+    def status_error(status):
+        return httpx.HTTPStatusError("", request=request, response=httpx.Response(status, request=request))
+
+    assert is_retryable(httpx.ReadTimeout("timeout", request=request))
+    assert is_retryable(status_error(502)) and is_retryable(status_error(429))
+    assert not is_retryable(status_error(404))
+    assert not is_retryable(ValueError("bad payload"))
+
+
+@pytest.mark.asyncio
+async def test_per_host_concurrency_limit():
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(201, json={"id": 1})
+
+    client = make_client(handler, max_connections_per_host=2)
+    results = await asyncio.gather(*(client.post_pr_comment("o/r", 1, "x") for _ in range(6)))
+
+    assert all(results)
+    assert peak == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_apply_mutations_merges_labels_and_orders_comment_before_close():
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={"id": 1})
+
+    client = make_client(handler, graphql_mutations=False)
+    writes = (
+        IssueMutations("o/r", 5, existing_labels=("bug",))
+        .add_labels(["bug", "question"])
+        .comment("analysis")
+        .close("closing")
+        .add_labels(["question", "clide-analyzed"])
+    )
+    assert await client.apply_mutations(writes) is True
+
+    label_calls = [c for c in calls if c[1].endswith("/labels")]
+    assert label_calls == [("POST", "/repos/o/r/issues/5/labels", {"labels": ["question", "clide-analyzed"]})]
+    chain = [(c[0], c[2]) for c in calls if not c[1].endswith("/labels")]
+    assert chain == [
+        ("POST", {"body": "analysis"}), ("POST", {"body": "closing"}), ("PATCH", {"state": "closed"})
+    ]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_apply_mutations_uses_one_graphql_request_with_node_id():
+    calls = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        calls.append((request.url.path, body))
+        if request.url.path == "/graphql":
+            return httpx.Response(200, json={"data": {"comment0": {}, "comment1": {}, "close": {}}})
+        return httpx.Response(200, json=[])
+
+    client = make_client(handler)
+    writes = IssueMutations("o/r", 5, node_id="I_kw1").comment("analysis").close("closing").add_labels(["x"])
+    assert await client.apply_mutations(writes) is True
+
+    assert sorted(path for path, _ in calls) == ["/graphql", "/repos/o/r/issues/5/labels"]
+    query = next(body for path, body in calls if path == "/graphql")
+    assert query["variables"] == {"subject": "I_kw1", "body0": "analysis", "body1": "closing"}
+    text = query["query"]
+    assert text.index("comment0:") < text.index("comment1:") < text.index("closeIssue")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rejected_graphql_falls_back_to_rest():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == "/graphql":
+            return httpx.Response(403, json={"message": "Resource not accessible by integration"})
+        return httpx.Response(200, json={"id": 1})
+
+    client = make_client(handler)
+    assert await client.apply_mutations(IssueMutations("o/r", 5, node_id="I_kw1").close("bye")) is True
+    assert calls == ["/graphql", "/repos/o/r/issues/5/comments", "/repos/o/r/issues/5"]
+
+    # Errors reported in the GraphQL body are not retried, so nothing is posted twice
+    calls.clear()
+    client._http = httpx.AsyncClient(
+        base_url=client.config.api_url,
+        transport=httpx.MockTransport(
+            lambda request: calls.append(request.url.path)
+            or httpx.Response(200, json={"data": {"comment0": {}, "close": None}, "errors": [{"message": "no"}]})
+        )
+    )
+    assert await client.apply_mutations(IssueMutations("o/r", 5, node_id="I_kw1").close("bye")) is False
+    assert calls == ["/graphql"]
+    await client.close()
+
+
+def pr_server(calls, file_pages=1):
+    def handler(request):
+        calls.append(request.url.path + ("#diff" if "diff" in request.headers["accept"] else ""))
+        path = request.url.path
+        if path == "/repos/o/r/pulls/1" and "diff" in request.headers["accept"]:
+            return httpx.Response(200, text="diff --git a/x b/x\n")
+        if path == "/repos/o/r/pulls/1":
+            return httpx.Response(200, json={
+                "number": 1, "title": "T", "body": None, "user": {"login": "u"}, "state": "open",
+                "labels": [], "html_url": "h", "additions": 500, "deletions": 400, "changed_files": 250
+            })
+        page = int(request.url.params.get("page", "1"))
+        headers = {}
+        if page < file_pages:
+            headers["link"] = f'<https://api.github.com{path}?per_page=100&page={page + 1}>; rel="next"'
+        files = [{"filename": f"f{page}_{i}.py", "additions": 2, "deletions": 1} for i in range(100)]
+        return httpx.Response(200, json=files, headers=headers)
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_get_pull_request_hydrates_from_payload():
+    calls = []
+    client = make_client(pr_server(calls))
+    known = PullRequest.from_dict({
+        "number": 1, "title": "From payload", "user": {"login": "u"}, "state": "open",
+        "additions": 7, "deletions": 3, "changed_files": 1
+    })
+
+    pr = await client.get_pull_request("o/r", 1, known=known)
+
+    assert pr["title"] == "From payload"
+    assert pr["additions"] == 7
+    assert pr["diff"].text() == "diff --git a/x b/x\n"
+    assert sorted(calls) == ["/repos/o/r/pulls/1#diff", "/repos/o/r/pulls/1/files"]
+
+    # Review payloads carry no stats: they are summed from the file list
+    calls.clear()
+    pr = await client.get_pull_request("o/r", 1, known=known._replace(additions=None))
+    assert (pr["additions"], pr["deletions"], pr["changed_files"]) == (200, 100, 100)
+    assert "/repos/o/r/pulls/1" not in calls
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_file_list_is_capped_and_stats_then_come_from_the_api():
+    calls = []
+    client = make_client(pr_server(calls, file_pages=5), max_pr_files=150)
+    known = PullRequest.from_dict({"number": 1, "title": "T"})
+
+    pr = await client.get_pull_request("o/r", 1, known=known)
+
+    assert len(pr["files"]) == 150
+    assert calls.count("/repos/o/r/pulls/1/files") == 2
+    assert pr["changed_files"] == 250
+    await client.close()
@@ -1,9 +1,17 @@
 """Tests for webhook event handlers."""
 
+import httpx
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
+from webhook_handler.batches import AnalysisDeferred
+from webhook_handler.clients import AnalysisText, track_writes
 from webhook_handler.handlers import IssueHandler, PullRequestHandler
-from webhook_handler.config import Settings
+from webhook_handler.config import ReviewStateConfig, Settings
+from webhook_handler.diff_view import DiffView
+from webhook_handler.payloads import WebhookEvent
+from webhook_handler.prompts import RenderedPrompt
+from webhook_handler.review_state import ReviewStateStore
+from webhook_handler.triage import TRIAGE_TOOL
 
 
 @pytest.fixture
@@ -17,6 +25,14 @@ def mock_settings():
         "reviews": "reviews",
         "workflows": "workflows"
     }
+    settings.features.streaming_responses = False
+    settings.github.comment_update_interval = 0.0
+    settings.batch.event_types = []
+    settings.claude.diff_token_budget = 12000
+    settings.large_pr.enabled = True
+    settings.large_pr.group_token_budget = 12000
+    settings.large_pr.max_groups = 10
+    settings.large_pr.fan_out = 4
     
     # Mock repository config
     repo_config = MagicMock()
@@ -37,8 +53,7 @@ def mock_clients():
     claude_client.analyze.return_value = "Mock analysis result"
     
     github_client = AsyncMock()
-    github_client.post_issue_comment.return_value = True
-    github_client.add_issue_labels.return_value = True
+    github_client.apply_mutations.return_value = True
     
     return claude_client, github_client
 
@@ -48,6 +63,9 @@ def mock_prompt_loader():
     """Mock prompt loader."""
     prompt_loader = MagicMock()
     prompt_loader.render_prompt.return_value = "Mock prompt template"
+    prompt_loader.render_prompt_parts.return_value = RenderedPrompt(
+        static="Mock prompt template", dynamic=""
+    )
     return prompt_loader
 
 
@@ -112,7 +130,7 @@ class TestIssueHandler:
         with patch("pathlib.Path.mkdir"), \
              patch("builtins.open", MagicMock()):
             
-            result = await handler.handle(issue_payload, "opened")
+            result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
         
         # Verify the result
         assert result["status"] == "success"
@@ -121,9 +139,91 @@ class TestIssueHandler:
         # Verify Claude was called
         claude_client.analyze.assert_called_once()
         
-        # Verify GitHub interactions
-        github_client.post_issue_comment.assert_called_once()
-        github_client.add_issue_labels.assert_called()
+        # Verify GitHub interactions: one coalesced set of writes
+        github_client.apply_mutations.assert_called_once()
+        writes = github_client.apply_mutations.call_args.args[0]
+        assert len(writes.comments) == 1
+        assert "clide-analyzed" in writes.new_labels()
+        assert writes.close_issue is False
+    
+    @pytest.mark.asyncio
+    async def test_handle_new_issue_streaming(
+        self, mock_settings, mock_clients, mock_prompt_loader, issue_payload, tmp_path
+    ):
+        """Test that streamed output goes to the file and a progressive comment."""
+        claude_client, github_client = mock_clients
+        github_client.create_comment.return_value = 99
+        github_client.update_comment.return_value = True
+        
+        async def stream_analysis(prompt, context, use_cache=True, system=None, on_text=None, model=None, max_tokens=None, tools=None):
+            for chunk in ("Mock ", "analysis ", "result"):
+                await on_text(chunk)
+            return "Mock analysis result"
+        claude_client.analyze.side_effect = stream_analysis
+        
+        mock_settings.outputs.base_dir = str(tmp_path)
+        mock_settings.features.streaming_responses = True
+        mock_settings.get_repository_config.return_value.settings["progressive_comments"] = True
+        
+        handler = IssueHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader
+        )
+        result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
+        
+        assert result["status"] == "success"
+        assert (tmp_path / "issues" / "issue_123_analysis.md").read_text() == "Mock analysis result"
+        
+        github_client.create_comment.assert_called_once()
+        final_body = github_client.update_comment.call_args_list[-1].args[3]
+        assert "Mock analysis result" in final_body
+        assert github_client.apply_mutations.call_args.args[0].comments == []
+    
+    @pytest.mark.asyncio
+    async def test_handle_new_issue_batched(
+        self, mock_settings, mock_clients, mock_prompt_loader, issue_payload
+    ):
+        """Test that batched event types are deferred until the batch ends."""
+        claude_client, github_client = mock_clients
+        claude_client.analyze_batched.side_effect = AnalysisDeferred("abc")
+        mock_settings.batch.event_types = ["issues"]
+        
+        handler = IssueHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader
+        )
+        
+        with patch("pathlib.Path.mkdir"):
+            result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
+        
+        assert result == {"status": "deferred", "batch_key": "abc"}
+        claude_client.analyze.assert_not_called()
+        github_client.apply_mutations.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_handle_new_issue_batched_result_is_labelled(
+        self, mock_settings, mock_clients, mock_prompt_loader, issue_payload
+    ):
+        """Test that a batched analysis is triaged from its tool call."""
+        claude_client, github_client = mock_clients
+        claude_client.analyze_batched.return_value = AnalysisText(
+            "Batched analysis", {"category": "bug", "priority": "high"}
+        )
+        mock_prompt_loader.render_prompt_parts.return_value = RenderedPrompt(
+            static="Static instructions", dynamic="Mock prompt template", tools=("record_triage",)
+        )
+        mock_settings.batch.event_types = ["issues"]
+        
+        handler = IssueHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader
+        )
+        
+        with patch("pathlib.Path.mkdir"), \
+             patch("builtins.open", MagicMock()):
+            result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
+        
+        assert result["status"] == "success"
+        assert claude_client.analyze_batched.call_args.kwargs["tools"] == [TRIAGE_TOOL]
+        writes = github_client.apply_mutations.call_args.args[0]
+        assert set(writes.new_labels()) == {"bug", "priority-high", "clide-analyzed"}
     
     @pytest.mark.asyncio
     async def test_handle_already_analyzed_issue(
@@ -139,7 +239,7 @@ class TestIssueHandler:
             mock_settings, claude_client, github_client, mock_prompt_loader
         )
         
-        result = await handler.handle(issue_payload, "opened")
+        result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
         
         # Should skip processing
         assert result["status"] == "skipped"
@@ -147,7 +247,7 @@ class TestIssueHandler:
         
         # Should not call Claude or GitHub
         claude_client.analyze.assert_not_called()
-        github_client.post_issue_comment.assert_not_called()
+        github_client.apply_mutations.assert_not_called()
     
     @pytest.mark.asyncio
     async def test_handle_unsupported_action(
@@ -160,12 +260,41 @@ class TestIssueHandler:
             mock_settings, claude_client, github_client, mock_prompt_loader
         )
         
-        result = await handler.handle(issue_payload, "closed")
+        result = await handler.handle(WebhookEvent.from_payload(issue_payload), "closed")
         
         # Should ignore unsupported actions
         assert result["status"] == "ignored"
         assert "not handled" in result["reason"]
     
+    @pytest.mark.asyncio
+    async def test_issue_triage_comes_from_the_tool_call(
+        self, mock_settings, mock_clients, mock_prompt_loader, issue_payload
+    ):
+        """Prompts offering record_triage get its result applied instead of keyword matches."""
+        claude_client, github_client = mock_clients
+        claude_client.analyze.return_value = AnalysisText(
+            "A complex frontend question.",
+            {"category": "bug", "priority": "high", "close": True, "close_label": "invalid"}
+        )
+        mock_prompt_loader.render_prompt_parts.return_value = RenderedPrompt(
+            static="Static instructions", dynamic="Mock prompt template", tools=("record_triage",)
+        )
+        mock_settings.get_repository_config.return_value.settings["auto_close_invalid"] = True
+        
+        handler = IssueHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader
+        )
+        
+        with patch("pathlib.Path.mkdir"), \
+             patch("builtins.open", MagicMock()):
+            result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
+        
+        assert result["status"] == "success"
+        assert claude_client.analyze.call_args.kwargs["tools"] == [TRIAGE_TOOL]
+        writes = github_client.apply_mutations.call_args.args[0]
+        assert set(writes.new_labels()) == {"bug", "priority-high", "invalid", "clide-analyzed"}
+        assert writes.close_issue is True
+    
     def test_extract_labels_from_analysis(
         self, mock_settings, mock_clients, mock_prompt_loader
     ):
@@ -187,8 +316,9 @@ class TestIssueHandler:
         
         labels = handler.extract_labels_from_analysis(analysis)
         
+        # Only the explicit markers count; "bug" in the prose does not
         expected_labels = {
-            "bug", "enhancement", "priority-high", 
+            "enhancement", "priority-high",
             "difficulty-complex", "component-frontend"
         }
         
@@ -240,7 +370,7 @@ class TestPullRequestHandler:
         with patch("pathlib.Path.mkdir"), \
              patch("builtins.open", MagicMock()):
             
-            result = await handler.handle(pr_payload, "opened")
+            result = await handler.handle(WebhookEvent.from_payload(pr_payload), "opened")
         
         # Verify the result
         assert result["status"] == "success"
@@ -248,8 +378,157 @@ class TestPullRequestHandler:
         assert result["action"] == "opened"
         
         # Verify GitHub client calls
-        github_client.get_pull_request.assert_called_once_with("test/repo", 456)
-        github_client.post_pr_comment.assert_called_once()
+        github_client.get_pull_request.assert_called_once()
+        assert github_client.get_pull_request.call_args.kwargs["known"].title == "Test PR"
+        github_client.create_comment.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_handle_large_pr_in_parts(
+        self, mock_settings, mock_clients, mock_prompt_loader, pr_payload
+    ):
+        """Test that a diff over the budget is reviewed in parts and merged."""
+        claude_client, github_client = mock_clients
+        
+        def file_diff(path):
+            lines = "\n".join(f"+line {i}" for i in range(40))
+            return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1,40 @@\n{lines}\n"
+        
+        github_client.get_pull_request.return_value = {
+            "files": ["a.py", "b.py", "c.py"],
+            "diff": file_diff("a.py") + file_diff("b.py") + file_diff("c.py"),
+            "additions": 120,
+            "deletions": 0,
+            "changed_files": 3
+        }
+        mock_settings.claude.diff_token_budget = 200
+        mock_settings.large_pr.group_token_budget = 200
+        claude_client.analyze.side_effect = lambda prompt, context, **kwargs: (
+            "merged review" if "## Partial Reviews" in context else "part review"
+        )
+        
+        handler = PullRequestHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader
+        )
+        
+        with patch("pathlib.Path.mkdir"), \
+             patch("builtins.open", MagicMock()):
+            
+            result = await handler.handle(WebhookEvent.from_payload(pr_payload), "opened")
+        
+        assert result["status"] == "success"
+        assert len(result["parts"]) == 3
+        assert all(part["latency"] >= 0 for part in result["parts"])
+        # Three part reviews and one merge
+        assert claude_client.analyze.call_count == 4
+        assert "merged review" in github_client.create_comment.call_args.args[2]
+    
+    @pytest.mark.asyncio
+    async def test_synchronize_reviews_only_the_delta(
+        self, mock_settings, mock_clients, mock_prompt_loader, pr_payload, tmp_path
+    ):
+        """Test that a push to a reviewed PR updates the review from the compare diff."""
+        claude_client, github_client = mock_clients
+        github_client.update_comment.return_value = True
+        github_client.get_compare_diff.return_value = DiffView.from_text(
+            "diff --git a/new.py b/new.py\n--- a/new.py\n+++ b/new.py\n@@ -0,0 +1 @@\n+delta line\n"
+        )
+        claude_client.analyze.return_value = "Looks good now"
+        mock_settings.outputs.base_dir = str(tmp_path)
+        mock_settings.review_state.prior_review_chars = 4000
+        
+        store = ReviewStateStore(ReviewStateConfig(path=str(tmp_path / "reviews.db")))
+        store.record("test/repo", 456, "a" * 40, "Must fix the parser", 77, "Original review body")
+        
+        pr_payload["action"] = "synchronize"
+        pr_payload["pull_request"]["head"] = {"sha": "b" * 40}
+        handler = PullRequestHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader, review_state=store
+        )
+        result = await handler.handle(WebhookEvent.from_payload(pr_payload), "synchronize")
+        
+        assert result["incremental"] is True
+        assert result["base_sha"] == "a" * 40
+        github_client.get_pull_request.assert_not_called()
+        github_client.get_compare_diff.assert_called_once_with("test/repo", "a" * 40, "b" * 40)
+        
+        claude_context = claude_client.analyze.call_args.args[1]
+        assert "Must fix the parser" in claude_context
+        assert "+delta line" in claude_context
+        
+        repo, number, comment_id, body = github_client.update_comment.call_args.args
+        assert comment_id == 77
+        assert body.startswith("Original review body") and "Looks good now" in body
+        github_client.create_comment.assert_not_called()
+        
+        state = store.get("test/repo", 456)
+        assert state.head_sha == "b" * 40 and state.comment_body == body
+        
+        # A redelivery of the same push is not reviewed again
+        result = await handler.handle(WebhookEvent.from_payload(pr_payload), "synchronize")
+        assert result["status"] == "skipped"
+        store.close()
+    
+    @pytest.mark.asyncio
+    async def test_successive_pushes_keep_only_the_latest_update(
+        self, mock_settings, mock_clients, mock_prompt_loader, pr_payload, tmp_path
+    ):
+        """Test that each push replaces the previous update and the comment stays under GitHub's limit."""
+        claude_client, github_client = mock_clients
+        github_client.update_comment.return_value = True
+        github_client.get_compare_diff.return_value = DiffView.from_text(
+            "diff --git a/new.py b/new.py\n--- a/new.py\n+++ b/new.py\n@@ -0,0 +1 @@\n+delta line\n"
+        )
+        mock_settings.outputs.base_dir = str(tmp_path)
+        mock_settings.review_state.prior_review_chars = 4000
+        
+        store = ReviewStateStore(ReviewStateConfig(path=str(tmp_path / "reviews.db")))
+        original = "Original review body\n\n" + "Finding paragraph.\n\n" * 2000
+        store.record("test/repo", 456, "0" * 40, "Must fix the parser", 77, original)
+        handler = PullRequestHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader, review_state=store
+        )
+        
+        for push in range(1, 5):
+            claude_client.analyze.return_value = f"Update review {push}\n\n" + "Detail.\n\n" * 2000
+            pr_payload["pull_request"]["head"] = {"sha": str(push) * 40}
+            result = await handler.handle(WebhookEvent.from_payload(pr_payload), "synchronize")
+            assert result["incremental"] is True
+        
+        body = github_client.update_comment.call_args.args[3]
+        assert len(body) <= 65536
+        assert body.startswith("Original review body")
+        assert body.count("### 🔄 Update for") == 1
+        assert "Update for 4444444" in body and "Update review 4" in body
+        assert "Update review 3" not in body
+        assert store.get("test/repo", 456).comment_body == body
+        store.close()
+    
+    @pytest.mark.asyncio
+    async def test_synchronize_without_compare_falls_back_to_full_review(
+        self, mock_settings, mock_clients, mock_prompt_loader, pr_payload, tmp_path
+    ):
+        """Test that a head GitHub cannot compare (e.g. force-push) gets a full review."""
+        claude_client, github_client = mock_clients
+        github_client.get_compare_diff.return_value = None
+        github_client.get_pull_request.return_value = {
+            "files": ["a.py"], "diff": "", "additions": 1, "deletions": 0, "changed_files": 1
+        }
+        github_client.create_comment.return_value = 88
+        mock_settings.outputs.base_dir = str(tmp_path)
+        
+        store = ReviewStateStore(ReviewStateConfig(path=str(tmp_path / "reviews.db")))
+        store.record("test/repo", 456, "a" * 40, "old", 77, "old body")
+        
+        pr_payload["pull_request"]["head"] = {"sha": "c" * 40}
+        handler = PullRequestHandler(
+            mock_settings, claude_client, github_client, mock_prompt_loader, review_state=store
+        )
+        result = await handler.handle(WebhookEvent.from_payload(pr_payload), "synchronize")
+        
+        assert result["status"] == "success" and "incremental" not in result
+        github_client.get_pull_request.assert_called_once()
+        assert store.get("test/repo", 456)[:3] == ("c" * 40, "Mock analysis result", 88)
+        store.close()
     
     def test_extract_pr_labels(
         self, mock_settings, mock_clients, mock_prompt_loader
@@ -263,7 +542,7 @@ class TestPullRequestHandler:
         
         # Small PR
         pr_details = {"additions": 20, "deletions": 5}
-        analysis = "This is a bug fix"
+        analysis = "This is a bug fix\n\nLabels: size/small, type/bug-fix"
         
         labels = handler._extract_pr_labels(analysis, pr_details)
         
@@ -272,7 +551,7 @@ class TestPullRequestHandler:
         
         # Large feature PR
         pr_details = {"additions": 500, "deletions": 100}
-        analysis = "This adds a new feature with documentation"
+        analysis = "This adds a new feature with documentation\n\n**Type**: feature"
         
         labels = handler._extract_pr_labels(analysis, pr_details)
         
@@ -294,8 +573,31 @@ async def test_handler_error_handling(
         mock_settings, claude_client, github_client, mock_prompt_loader
     )
     
-    result = await handler.handle(issue_payload, "opened")
+    result = await handler.handle(WebhookEvent.from_payload(issue_payload), "opened")
     
     # Should return error status
     assert result["status"] == "error"
-    assert "Claude API error" in result["error"]
\ No newline at end of file
+    assert "Claude API error" in result["error"]
+    assert not result["retryable"]
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retryable_until_github_is_written(
+    mock_settings, mock_clients, mock_prompt_loader, issue_payload
+):
+    """A retry must not repeat a comment, label or close already applied."""
+    claude_client, github_client = mock_clients
+    claude_client.analyze.side_effect = httpx.ConnectError("connection reset")
+    handler = IssueHandler(
+        mock_settings, claude_client, github_client, mock_prompt_loader
+    )
+    event = WebhookEvent.from_payload(issue_payload)
+    
+    with track_writes():
+        result = await handler.handle(event, "opened")
+    assert result["retryable"]
+    
+    with track_writes() as writes:
+        writes.add("/repos/test/repo/issues/comments/1")
+        result = await handler.handle(event, "opened")
+    assert not result["retryable"]
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Tests for the persistent job queue."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from webhook_handler.config import QueueConfig
+from webhook_handler.job_queue import JobFailed, JobQueue, WorkerPool
+
+
+def body(payload):
+    """Encode a payload the way GitHub delivers it."""
+    return json.dumps(payload).encode()
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    """Job queue backed by a temporary database."""
+    config = QueueConfig(
+        path=str(tmp_path / "queue.db"),
+        visibility_timeout=60,
+        max_attempts=2,
+        retry_delay=0
+    )
+    queue = JobQueue(config)
+    yield queue
+    queue.close()
+
+
+class TestJobQueue:
+    """Tests for JobQueue."""
+    
+    def test_enqueue_and_claim_in_order(self, job_queue):
+        """Jobs are claimed oldest first with their payload intact."""
+        job_queue.enqueue("issues", body({"n": 1}), delivery_id="a")
+        job_queue.enqueue("issues", body({"n": 2}), delivery_id="b")
+        
+        job = job_queue.claim()
+        assert job.payload == {"n": 1}
+        assert job.delivery_id == "a"
+        assert job.attempts == 1
+        
+        assert job_queue.claim().payload == {"n": 2}
+        assert job_queue.claim() is None
+    
+    def test_claimed_job_is_invisible_until_lease_expires(self, job_queue):
+        """A leased job reappears after its visibility timeout."""
+        job_queue.enqueue("issues", body({}))
+        job = job_queue.claim()
+        assert job_queue.claim() is None
+        
+        # Simulate a crashed worker by expiring the lease
+        job_queue._conn.execute("UPDATE jobs SET available_at = ?", (time.time() - 1,))
+        
+        retried = job_queue.claim()
+        assert retried.id == job.id
+        assert retried.attempts == 2
+    
+    def test_fail_dead_letters_after_max_attempts(self, job_queue):
+        """Failed jobs are retried until max_attempts, then dead-lettered."""
+        job_queue.enqueue("issues", body({}))
+        
+        assert job_queue.fail(job_queue.claim().id, "boom") is True
+        assert job_queue.fail(job_queue.claim().id, "boom") is False
+        
+        stats = job_queue.get_stats()
+        assert stats["depth"] == 0
+        assert stats["dead"] == 1
+    
+    def test_expired_leases_dead_letter_after_max_attempts(self, job_queue):
+        """A job whose lease keeps expiring is dead-lettered instead of leased forever."""
+        job_queue.enqueue("issues", body({}))
+        
+        for _ in range(2):
+            assert job_queue.claim() is not None
+            job_queue._conn.execute("UPDATE jobs SET available_at = ?", (time.time() - 1,))
+        
+        assert job_queue.claim() is None
+        assert job_queue.get_stats()["dead"] == 1
+    
+    def test_jobs_survive_reopen(self, job_queue):
+        """Queued jobs persist across process restarts."""
+        job_queue.enqueue("pull_request", body({"n": 7}))
+        
+        reopened = JobQueue(job_queue.config)
+        try:
+            assert reopened.claim().payload == {"n": 7}
+        finally:
+            reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_bounds_concurrency(job_queue):
+    """The pool never runs more jobs at once than it has workers."""
+    running = 0
+    peak = 0
+    done = asyncio.Event()
+    processed = []
+    
+    async def process(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        processed.append(job.id)
+        if len(processed) == 10:
+            done.set()
+    
+    for i in range(10):
+        job_queue.enqueue("issues", body({"n": i}))
+    
+    pool = WorkerPool(job_queue, process, workers=3, poll_interval=0.01)
+    pool.start()
+    await asyncio.wait_for(done.wait(), timeout=5)
+    await pool.stop()
+    
+    assert peak <= 3
+    assert job_queue.depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_retries_failures_and_dead_letters_bad_bodies(job_queue):
+    """Failed jobs go through fail(); undecodable bodies are dead-lettered without killing a worker."""
+    attempts = []
+    
+    async def process(job):
+        attempts.append(job.payload["n"])
+        raise JobFailed("Claude API returned 529")
+    
+    job_queue.enqueue("issues", b"{not json")
+    job_queue.enqueue("issues", body({"n": 1}))
+    
+    pool = WorkerPool(job_queue, process, workers=1, poll_interval=0.01)
+    pool.start()
+    for _ in range(500):
+        if job_queue.get_stats()["dead"] == 2:
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop()
+    
+    assert attempts == [1, 1]
+    assert job_queue.get_stats()["dead"] == 2
+    assert job_queue.depth() == 0
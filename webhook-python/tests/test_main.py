@@ -0,0 +1,65 @@
+"""Tests for the webhook endpoint."""
+
+import hashlib
+import hmac
+import importlib
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SECRET = "endpoint-test-secret"
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The application loaded from the shipped settings, with its data files under tmp_path."""
+    shutil.copytree(PROJECT_DIR / "config", tmp_path / "config")
+    shutil.copytree(PROJECT_DIR / "prompts", tmp_path / "prompts")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", SECRET)
+    
+    sys.modules.pop("webhook_handler.main", None)
+    main = importlib.import_module("webhook_handler.main")
+    yield main
+    main.job_queue.close()
+    main.webhook_processor.deduplicator.close()
+    sys.modules.pop("webhook_handler.main", None)
+
+
+def post(client, path, payload, delivery_id, secret=SECRET):
+    """Post a delivery signed the way GitHub signs it."""
+    body = json.dumps(payload).encode()
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return client.post(path, content=body, headers={
+        "Content-Type": "application/json",
+        "X-GitHub-Event": "issues",
+        "X-GitHub-Delivery": delivery_id,
+        "X-Hub-Signature-256": f"sha256={signature}"
+    })
+
+
+def test_signed_delivery_is_decoded_and_queued(app_module):
+    """A signed delivery for a configured repository is decoded and persisted for the workers."""
+    payload = {
+        "action": "opened",
+        "repository": {"full_name": "protocolus/promptforge"},
+        "issue": {"number": 1, "title": "Crash on start", "body": "Stack trace"}
+    }
+    client = TestClient(app_module.app)
+    path = app_module.settings.server.webhook_path
+    
+    response = post(client, path, payload, "delivery-1")
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    
+    job = app_module.job_queue.claim()
+    assert job.id == response.json()["job_id"]
+    assert job.payload == payload
+    
+    assert post(client, path, payload, "delivery-1").json()["status"] == "duplicate"
+    assert post(client, path, payload, "delivery-2", secret="wrong").status_code == 401
@@ -0,0 +1,53 @@
+"""Tests for payload decoding and typed payload structs."""
+
+import json
+
+from webhook_handler.payloads import WebhookEvent, decode_payload
+
+
+def test_decode_payload_round_trips_json():
+    """Raw webhook bytes decode to the original payload."""
+    payload = {"action": "opened", "issue": {"number": 1, "title": "ü"}}
+    assert decode_payload(json.dumps(payload).encode()) == payload
+
+
+def test_event_extracts_handler_fields():
+    """The typed view flattens the nested fields handlers use."""
+    event = WebhookEvent.from_payload({
+        "action": "opened",
+        "pull_request": {
+            "number": 5,
+            "title": "Add feature",
+            "body": None,
+            "user": {"login": "octocat"},
+            "labels": [{"name": "bug"}],
+            "head": {"sha": "abc123"},
+            "additions": 10
+        },
+        "repository": {"full_name": "test/repo"},
+        "sender": {"login": "octocat", "type": "User"}
+    })
+    
+    assert event.action == "opened"
+    assert event.repository.full_name == "test/repo"
+    assert event.sender == "octocat"
+    assert event.issue is None
+    assert event.requested_reviewer is None
+    
+    pr = event.pull_request
+    assert pr.number == 5
+    assert pr.body == ""
+    assert pr.user == "octocat"
+    assert pr.labels == ("bug",)
+    assert pr.head_sha == "abc123"
+    assert pr.additions == 10
+    assert pr.deletions is None
+
+
+def test_requested_reviewer_is_detected():
+    """Review request deliveries expose the requested reviewer."""
+    event = WebhookEvent.from_payload({
+        "action": "review_requested",
+        "requested_reviewer": {"login": "reviewer"}
+    })
+    assert event.requested_reviewer == "reviewer"
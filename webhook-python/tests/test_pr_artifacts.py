@@ -0,0 +1,85 @@
+"""Tests for the head-SHA keyed PR artifact cache."""
+
+import httpx
+import pytest
+
+from webhook_handler.clients import GitHubClient
+from webhook_handler.config import GitHubConfig, PRArtifactConfig
+from webhook_handler.diff_view import DiffView
+from webhook_handler.payloads import PullRequest
+from webhook_handler.pr_artifacts import PRArtifactCache, PRArtifacts
+
+
+def artifacts(diff, files=("a.py",)):
+    return PRArtifacts(diff=DiffView.from_text(diff), files=tuple(files), additions=1, deletions=2, changed_files=len(files))
+
+
+def test_new_head_drops_earlier_heads():
+    cache = PRArtifactCache(PRArtifactConfig())
+    cache.put("o/r", 1, "sha1", artifacts("one"))
+    cache.put("o/r", 2, "sha1", artifacts("other pr"))
+
+    cache.put("o/r", 1, "sha2", artifacts("two"))
+
+    assert cache.get("o/r", 1, "sha1") is None
+    assert cache.get("o/r", 1, "sha2").diff.text() == "two"
+    assert cache.get("o/r", 2, "sha1").diff.text() == "other pr"
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_memory_overflow_spills_to_disk_and_disk_is_bounded(tmp_path):
+    config = PRArtifactConfig(memory_max_mb=1, disk_path=str(tmp_path / "artifacts.db"), disk_max_mb=1)
+    cache = PRArtifactCache(config)
+    big = "x" * (600 * 1024)
+
+    cache.put("o/r", 1, "a", artifacts(big))
+    cache.put("o/r", 2, "b", artifacts(big))
+    stats = cache.get_stats()
+    assert stats["memory_entries"] == 1
+    assert stats["spills"] == 1
+
+    # Served from disk and promoted back into memory
+    assert cache.get("o/r", 1, "a").diff.size == len(big)
+    assert cache.get_stats()["memory_entries"] == 1
+
+    cache.put("o/r", 3, "c", artifacts(big))
+    cache.put("o/r", 4, "d", artifacts(big))
+    stats = cache.get_stats()
+    assert stats["disk_bytes"] <= config.disk_max_mb * 1024 * 1024
+    assert stats["evictions"] >= 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_get_pull_request_reuses_artifacts_for_the_same_head():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if "diff" in request.headers["accept"]:
+            return httpx.Response(200, text="diff --git a/a.py b/a.py\n")
+        return httpx.Response(200, json=[{"filename": "a.py", "additions": 4, "deletions": 1}])
+
+    config = GitHubConfig(token="t", webhook_secret="s")
+    client = GitHubClient(config, artifacts=PRArtifactCache(PRArtifactConfig()))
+    client._http = httpx.AsyncClient(base_url=config.api_url, transport=httpx.MockTransport(handler))
+
+    opened = PullRequest.from_dict({
+        "number": 1, "title": "T", "head": {"sha": "abc"},
+        "additions": 4, "deletions": 1, "changed_files": 1
+    })
+    first = await client.get_pull_request("o/r", 1, known=opened)
+    assert len(calls) == 2
+
+    # A review event on the same head: no fetches, stats from the cache
+    review = opened._replace(additions=None, deletions=None, changed_files=None)
+    second = await client.get_pull_request("o/r", 1, known=review)
+    assert len(calls) == 2
+    assert second["diff"] is first["diff"]
+    assert (second["additions"], second["changed_files"]) == (4, 1)
+
+    # A synchronize to a new head fetches again
+    await client.get_pull_request("o/r", 1, known=opened._replace(head_sha="def"))
+    assert len(calls) == 4
+    assert client.get_stats()["pr_artifacts"]["hits"] == 1
+    await client.close()
@@ -0,0 +1,75 @@
+"""Tests for the frontmatter prompt index."""
+
+import os
+
+from webhook_handler.config import PromptsConfig
+from webhook_handler.prompt_index import PromptIndex
+from webhook_handler.prompts import PromptLoader
+
+
+def write_prompt(path, frontmatter, body="Body"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\n{frontmatter}\n---\n{body}")
+
+
+def touch_later(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds))
+
+
+def test_index_looks_up_by_id_tag_model_and_event(tmp_path):
+    write_prompt(tmp_path / "security" / "audit.md", "id: audit\ntags: [security, review]\nmodel: claude-3-opus")
+    write_prompt(tmp_path / "review.md", "title: Review\ntags: review\nevents: [pull_request:opened]")
+    (tmp_path / "README.md").write_text("# Not a prompt")
+    index = PromptIndex([str(tmp_path)])
+
+    assert index.refresh() == 3
+    assert index.get("audit").path == "security/audit.md"
+    assert [e.id for e in index.find(tag="review")] == ["review", "audit"]
+    assert [e.id for e in index.find(tag="review", model="claude-3-opus")] == ["audit"]
+    assert index.for_event("pull_request", "opened").title == "Review"
+    assert index.for_event("pull_request", "closed") is None
+    assert index.select("tag:security").id == "audit"
+    assert index.get_stats()["prompts"] == 2
+
+
+def test_refresh_rereads_only_changed_files(tmp_path):
+    write_prompt(tmp_path / "a.md", "id: a\ntags: [one]")
+    write_prompt(tmp_path / "b.md", "id: b\ntags: [one]")
+    index = PromptIndex([str(tmp_path)])
+    index.refresh()
+
+    assert index.refresh() == 0
+
+    write_prompt(tmp_path / "a.md", "id: a\ntags: [two]")
+    touch_later(tmp_path / "a.md")
+    (tmp_path / "b.md").unlink()
+    assert index.refresh() == 1
+    assert [e.id for e in index.find(tag="two")] == ["a"]
+    assert index.find(tag="one") == []
+    assert index.get("b") is None
+
+
+def test_loader_routes_events_by_frontmatter_and_pins_the_model(tmp_path):
+    base, library = tmp_path / "prompts", tmp_path / "library"
+    (base / "issues").mkdir(parents=True)
+    (base / "issues" / "new_issue.md").write_text("Analyze: {{ issue_title }}")
+    write_prompt(
+        library / "releases" / "notes.md",
+        "id: release-notes\nevents: [release]\nmodel: claude-3-opus\nmax_tokens: 2000",
+        body="Summarize {{ tag }}"
+    )
+    loader = PromptLoader(PromptsConfig(
+        base_dir=str(base),
+        library_dirs=[str(library)],
+        templates={"issues": {"opened": "issues/new_issue.md", "edited": "id:release-notes"}}
+    ))
+
+    assert loader.warm_up() == 2
+    rendered = loader.render_prompt_parts("release", "published", {"tag": "v1.0"})
+    assert rendered.dynamic == "Summarize v1.0"
+    assert (rendered.model, rendered.max_tokens) == ("claude-3-opus", 2000)
+
+    assert loader.get_prompt_path("issues", "edited") == "releases/notes.md"
+    rendered = loader.render_prompt_parts("issues", "opened", {"issue_title": "Crash"})
+    assert (rendered.dynamic, rendered.model) == ("Analyze: Crash", None)
@@ -0,0 +1,142 @@
+"""Tests for prompt loading and rendering."""
+
+import os
+
+import pytest
+from jinja2 import TemplateSyntaxError
+
+from webhook_handler.config import PromptsConfig
+from webhook_handler.diff_view import DiffView
+from webhook_handler.payloads import WebhookEvent
+from webhook_handler.prompts import PromptContext, PromptLoader, create_prompt_context
+
+
+def make_loader(prompts_dir):
+    """Prompt loader over the sample prompts."""
+    return PromptLoader(PromptsConfig(
+        base_dir=str(prompts_dir),
+        templates={
+            "issues": {"opened": "issues/new_issue.md"},
+            "pull_request": {"opened": "pull_requests/split.md"},
+        }
+    ))
+
+
+def test_template_without_static_section_is_dynamic(sample_prompts):
+    """Templates without a static marker render entirely into the dynamic part."""
+    loader = make_loader(sample_prompts)
+    
+    rendered = loader.render_prompt_parts("issues", "opened", {"issue_title": "Crash"})
+    
+    assert rendered.static == ""
+    assert rendered.dynamic == "Analyze this issue: Crash"
+
+
+def test_static_section_is_split_from_dynamic(sample_prompts):
+    """Text above the marker becomes the cacheable static part."""
+    (sample_prompts / "pull_requests" / "split.md").write_text(
+        "You are a reviewer.\n{# end-static #}\nReview: {{pr_title}}"
+    )
+    loader = make_loader(sample_prompts)
+    
+    rendered = loader.render_prompt_parts("pull_request", "opened", {"pr_title": "Fix bug"})
+    
+    assert rendered.static == "You are a reviewer."
+    assert rendered.dynamic == "Review: Fix bug"
+    assert loader.render_prompt("pull_request", "opened", {"pr_title": "Fix bug"}) == (
+        "You are a reviewer.\n\nReview: Fix bug"
+    )
+
+
+def test_compiled_templates_are_reused_until_the_file_changes(sample_prompts):
+    """Renders reuse the compiled template; an edited file is recompiled."""
+    loader = make_loader(sample_prompts)
+    template_file = sample_prompts / "issues" / "new_issue.md"
+    
+    loader.render_prompt_parts("issues", "opened", {"issue_title": "Crash"})
+    compiled = loader.jinja_env.get_template("issues/new_issue.md#dynamic")
+    loader.render_prompt_parts("issues", "opened", {"issue_title": "Hang"})
+    assert loader.jinja_env.get_template("issues/new_issue.md#dynamic") is compiled
+    
+    template_file.write_text("Triage: {{issue_title}}")
+    stat = template_file.stat()
+    os.utime(template_file, (stat.st_atime, stat.st_mtime + 10))
+    
+    rendered = loader.render_prompt_parts("issues", "opened", {"issue_title": "Crash"})
+    assert rendered.dynamic == "Triage: Crash"
+
+
+def test_warm_up_fails_on_syntax_errors_and_skips_missing_files(sample_prompts, tmp_path):
+    """Warm-up compiles every configured template and raises on a broken one."""
+    (sample_prompts / "pull_requests" / "split.md").write_text("Static\n{# end-static #}\n{{ pr_title }")
+    config = PromptsConfig(
+        base_dir=str(sample_prompts),
+        templates={
+            "issues": {"opened": "issues/new_issue.md", "edited": "issues/missing.md"},
+            "pull_request": {"opened": "pull_requests/split.md"},
+        },
+        bytecode_cache_dir=str(tmp_path / "bytecode")
+    )
+    
+    with pytest.raises(TemplateSyntaxError):
+        PromptLoader(config).warm_up()
+    
+    (sample_prompts / "pull_requests" / "split.md").write_text("Static\n{# end-static #}\n{{ pr_title }}")
+    assert PromptLoader(config).warm_up() == 2
+    assert any((tmp_path / "bytecode").iterdir())
+
+
+def test_only_referenced_variables_are_resolved(sample_prompts):
+    """Lazy values a template does not reference are never computed."""
+    loader = make_loader(sample_prompts)
+    calls = []
+    context = PromptContext(issue_title="Crash")
+    context.lazy(diff=lambda: calls.append("diff") or "huge diff")
+    
+    loader.render_prompt_parts("issues", "opened", context)
+    assert calls == []
+    assert loader.template_variables("issues/new_issue.md#dynamic") == {"issue_title"}
+    
+    (sample_prompts / "pull_requests" / "split.md").write_text("Static\n{# end-static #}\n{{ diff }}")
+    loader.render_prompt_parts("pull_request", "opened", context)
+    rendered = loader.render_prompt_parts("pull_request", "opened", context)
+    assert rendered.dynamic == "huge diff"
+    assert calls == ["diff"]
+
+
+def test_pr_details_diff_is_rendered_as_text(sample_prompts):
+    """A diff view from get_pull_request renders as its decoded text."""
+    event = WebhookEvent.from_payload({
+        "repository": {"full_name": "o/r"},
+        "pull_request": {"number": 1, "title": "Fix"}
+    })
+    diff = "diff --git a/a.py b/a.py\n"
+    context = create_prompt_context("pull_request", event, {"diff": DiffView.from_text(diff), "files": ("a.py",)})
+    
+    assert context["pr_title"] == "Fix"
+    assert context["diff"] == diff
+    assert context.get("missing", "default") == "default"
+
+
+def test_partials_are_prerendered_until_an_include_changes(sample_prompts):
+    """Variable-free sections render once; editing a partial re-renders them."""
+    partial = sample_prompts / "partials" / "levels.md"
+    partial.parent.mkdir(exist_ok=True)
+    partial.write_text("- Must Fix\n- Consider\n")
+    (sample_prompts / "pull_requests" / "split.md").write_text(
+        'Classify findings:\n{% include "partials/levels.md" %}\nBe concise.\n{# end-static #}\nReview: {{pr_title}}'
+    )
+    loader = make_loader(sample_prompts)
+    assert loader.warm_up() == 2
+    
+    rendered = loader.render_prompt_parts("pull_request", "opened", {"pr_title": "Fix bug"})
+    assert rendered.static == "Classify findings:\n- Must Fix\n- Consider\nBe concise."
+    assert rendered.dynamic == "Review: Fix bug"
+    assert loader.get_stats()["prerendered_hits"] == 1
+    
+    partial.write_text("- Must Fix\n")
+    stat = partial.stat()
+    os.utime(partial, (stat.st_atime, stat.st_mtime + 10))
+    
+    rendered = loader.render_prompt_parts("pull_request", "opened", {"pr_title": "Fix bug"})
+    assert rendered.static == "Classify findings:\n- Must Fix\nBe concise."
@@ -0,0 +1,93 @@
+"""Tests for the Claude rate limiter."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from anthropic import RateLimitError
+
+from webhook_handler.clients import ClaudeClient
+from webhook_handler.config import ClaudeConfig
+from webhook_handler.rate_limit import ClaudeRateLimiter
+
+
+def make_limiter(output_tokens_per_minute=6000):
+    """Limiter where output tokens are the constrained budget."""
+    return ClaudeRateLimiter(
+        requests_per_minute=6000,
+        input_tokens_per_minute=600000,
+        output_tokens_per_minute=output_tokens_per_minute
+    )
+
+
+@pytest.mark.asyncio
+async def test_waits_for_refill_when_budget_exhausted():
+    """A caller is held back until the bucket refills enough."""
+    limiter = make_limiter()
+    await limiter.acquire(input_tokens=10, output_tokens=6000)
+    
+    start = time.monotonic()
+    await limiter.acquire(input_tokens=10, output_tokens=20)
+    
+    # 6000/min refills 100 tokens per second
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_settle_refunds_unused_reservation():
+    """Reserved output tokens that were not used go back into the budget."""
+    limiter = make_limiter()
+    reservation = await limiter.acquire(input_tokens=10, output_tokens=6000)
+    limiter.settle(reservation, input_tokens=10, output_tokens=100)
+    
+    assert limiter.buckets["output_tokens"].wait_time(5000) == 0
+    assert limiter.buckets["output_tokens"].outstanding == 0
+
+
+def test_headers_override_local_budget():
+    """Remaining budgets reported by the API are adopted."""
+    limiter = make_limiter()
+    limiter.update_from_headers({"anthropic-ratelimit-requests-remaining": "0"})
+    
+    assert limiter.buckets["requests"].wait_time(1) > 0
+    assert limiter.buckets["output_tokens"].wait_time(1) == 0
+
+
+@pytest.mark.asyncio
+async def test_callers_are_admitted_in_arrival_order():
+    """Queued callers are served first come, first served."""
+    limiter = make_limiter(output_tokens_per_minute=60000)
+    await limiter.acquire(input_tokens=1, output_tokens=60000)
+    admitted = []
+    
+    async def caller(index):
+        await limiter.acquire(input_tokens=1, output_tokens=100 if index % 2 else 50)
+        admitted.append(index)
+    
+    tasks = [asyncio.create_task(caller(i)) for i in range(5)]
+    await asyncio.gather(*tasks)
+    
+    assert admitted == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_request_is_not_retried_inside_the_sdk():
+    """A 429 reaches the limiter after one attempt instead of being retried by the SDK."""
+    calls = []
+    
+    def respond(request):
+        calls.append(request)
+        return httpx.Response(
+            429, json={"type": "error", "error": {"type": "rate_limit_error", "message": "slow down"}}
+        )
+    
+    client = ClaudeClient(ClaudeConfig(api_key="test", requests_per_minute=60))
+    client._http_client._transport = httpx.MockTransport(respond)
+    
+    with pytest.raises(RateLimitError):
+        await client.analyze("prompt", "context", use_cache=False)
+    await client.close()
+    
+    assert len(calls) == 1
+    assert client.rate_limiter.get_stats()["rate_limited_responses"] == 1
@@ -0,0 +1,75 @@
+"""Tests for settings hot reload."""
+
+from unittest.mock import MagicMock
+
+from webhook_handler.config import Settings
+from webhook_handler.reloader import ConfigReloader
+
+
+CONFIG = """
+repositories:
+  - name: "test/repo"
+    events: ["issues"]
+"""
+
+
+def test_reload_applies_new_settings(tmp_path):
+    """A valid settings file is parsed and swapped into the processor."""
+    config_file = tmp_path / "settings.yaml"
+    config_file.write_text(CONFIG)
+    processor = MagicMock()
+    processor.settings = Settings.from_yaml(str(config_file))
+    
+    config_file.write_text(CONFIG.replace('["issues"]', '["issues", "pull_request"]'))
+    result = ConfigReloader(str(config_file), processor).reload()
+    
+    assert result["status"] == "reloaded"
+    applied = processor.apply_settings.call_args[0][0]
+    assert applied.is_event_enabled("test/repo", "pull_request")
+
+
+def test_invalid_settings_are_rejected(tmp_path):
+    """A file that fails validation leaves the running config in place."""
+    config_file = tmp_path / "settings.yaml"
+    config_file.write_text("repositories:\n  - events: 5\n")
+    processor = MagicMock()
+    
+    reloader = ConfigReloader(str(config_file), processor)
+    result = reloader.reload()
+    
+    assert result["status"] == "error"
+    processor.apply_settings.assert_not_called()
+    assert reloader.get_stats()["failures"] == 1
+
+
+def test_startup_feature_flags_wait_for_a_restart(tmp_path):
+    """Flags read at startup are reported and kept; per-delivery flags apply at once."""
+    config_file = tmp_path / "settings.yaml"
+    config_file.write_text(CONFIG + "features:\n  async_processing: false\n")
+    processor = MagicMock()
+    processor.settings = Settings.from_yaml(str(config_file))
+    
+    config_file.write_text(
+        CONFIG + "features:\n  async_processing: true\n  streaming_responses: true\n"
+    )
+    result = ConfigReloader(str(config_file), processor).reload()
+    
+    assert result["restart_required"] == ["features.async_processing"]
+    applied = processor.apply_settings.call_args[0][0]
+    assert applied.features.async_processing is False
+    assert applied.features.streaming_responses is True
+
+
+def test_startup_sections_wait_for_a_restart(tmp_path):
+    """Handlers keep seeing the running values of sections the clients were built from."""
+    config_file = tmp_path / "settings.yaml"
+    config_file.write_text(CONFIG + "batch:\n  event_types: [\"issues\"]\n")
+    processor = MagicMock()
+    processor.settings = Settings.from_yaml(str(config_file))
+    
+    config_file.write_text(CONFIG + "batch:\n  event_types: [\"issues\", \"pull_request\"]\n")
+    result = ConfigReloader(str(config_file), processor).reload()
+    
+    assert result["restart_required"] == ["batch"]
+    applied = processor.apply_settings.call_args[0][0]
+    assert applied.batch.event_types == ["issues"]
@@ -0,0 +1,78 @@
+"""Tests for the Claude response cache."""
+
+import time
+
+import pytest
+
+from webhook_handler.config import ResponseCacheConfig
+from webhook_handler.response_cache import ResponseCache, cache_key
+
+
+@pytest.fixture
+def cache_config(tmp_path):
+    """Response cache config backed by a temporary database."""
+    return ResponseCacheConfig(path=str(tmp_path / "responses.db"), ttl_seconds=60, memory_entries=1)
+
+
+def test_key_depends_on_every_part():
+    """Keys differ when any request part differs, and parts can't run together."""
+    assert cache_key("model", 4000, "prompt") == cache_key("model", 4000, "prompt")
+    assert cache_key("model", 4000, "prompt") != cache_key("model", 2000, "prompt")
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+def test_hit_after_put_and_across_restart(cache_config):
+    """Stored responses are served from memory and from disk after reopening."""
+    cache = ResponseCache(cache_config)
+    assert cache.get("k") is None
+    cache.put("k", "analysis")
+    assert cache.get("k") == "analysis"
+    cache.close()
+    
+    reopened = ResponseCache(cache_config)
+    assert reopened.get("k") == "analysis"
+    assert reopened.get_stats()["hits"] == 1
+
+
+def test_expired_entries_are_misses(cache_config):
+    """Entries older than the TTL are not served."""
+    cache = ResponseCache(cache_config)
+    cache.put("k", "analysis")
+    cache._memory.clear()
+    cache._conn.execute("UPDATE responses SET created_at = ?", (time.time() - 120,))
+    
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_size_limit(cache_config):
+    """Writing past the size limit evicts the least recently accessed entries."""
+    cache = ResponseCache(cache_config)
+    cache.max_bytes = 10
+    
+    cache.put("old", "aaaa")
+    cache.put("new", "bbbb")
+    cache._conn.execute("UPDATE responses SET accessed_at = 0 WHERE key = 'old'")
+    cache.put("newest", "cccc")
+    
+    assert cache.get("old") is None
+    assert cache.get("newest") == "cccc"
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["size_bytes"] == 8
+
+
+
+def test_memory_hits_keep_entries_from_disk_eviction(cache_config):
+    """An entry served only from memory is treated as recently used when evicting."""
+    cache = ResponseCache(cache_config)
+    cache.config = ResponseCacheConfig(path=cache_config.path, ttl_seconds=60, memory_entries=2)
+    cache.max_bytes = 10
+    
+    cache.put("hot", "aaaa")
+    cache.put("cold", "bbbb")
+    cache._conn.execute("UPDATE responses SET accessed_at = 0")
+    assert cache.get("hot") == "aaaa"  # served from memory
+    cache.put("newest", "cccc")
+    
+    assert cache.get("cold") is None
+    assert cache.get("hot") == "aaaa"
+    assert cache.get_stats()["evictions"] == 1
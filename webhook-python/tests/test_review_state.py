@@ -0,0 +1,40 @@
+"""Tests for the per-PR review record."""
+
+from webhook_handler.config import ReviewStateConfig
+from webhook_handler.review_state import MAX_COMMENT_CHARS, ReviewStateStore, review_summary, updated_comment
+
+
+def test_record_replaces_and_survives_restart(tmp_path):
+    config = ReviewStateConfig(path=str(tmp_path / "reviews.db"))
+    store = ReviewStateStore(config)
+    store.record("o/r", 1, "sha1", "first", 10, "body 1")
+    store.record("o/r", 1, "sha2", "second", 10, "body 2")
+    store.close()
+
+    store = ReviewStateStore(config)
+    state = store.get("o/r", 1)
+    assert (state.head_sha, state.analysis, state.comment_id) == ("sha2", "second", 10)
+    assert store.get("o/r", 2) is None
+    assert store.get_stats()["tracked_prs"] == 1
+
+    store.config = ReviewStateConfig(path=config.path, ttl_seconds=0)
+    assert store.get("o/r", 1) is None
+    store.close()
+
+
+def test_summary_cuts_at_a_paragraph():
+    analysis = "Para one.\n\nPara two is longer.\n\nPara three."
+    assert review_summary(analysis, 1000) == analysis
+
+    summary = review_summary(analysis, 25)
+    assert summary.startswith("Para one.\n\n_(earlier review truncated)_")
+
+
+def test_updated_comment_replaces_the_previous_update():
+    body = updated_comment("Review", "bbbbbbb", "First update")
+    assert updated_comment(body, "ccccccc", "Second update") == updated_comment("Review", "ccccccc", "Second update")
+
+    huge = "Paragraph.\n\n" * 10000
+    body = updated_comment(huge, "ddddddd", huge)
+    assert len(body) <= MAX_COMMENT_CHARS
+    assert "_(review truncated)_" in body and "_(update truncated)_" in body
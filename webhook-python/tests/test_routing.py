@@ -0,0 +1,41 @@
+"""Tests for the compiled repository routing table."""
+
+from webhook_handler.config import RepositoryConfig
+from webhook_handler.routing import RoutingTable
+
+
+def make_table():
+    """Routing table with exact, org-wildcard and glob entries."""
+    return RoutingTable([
+        RepositoryConfig(name="myorg/special", events=["issues"]),
+        RepositoryConfig(name="myorg/*", events=["issues", "pull_request"]),
+        RepositoryConfig(name="other/service-*", events=["workflow_run"]),
+    ])
+
+
+def test_exact_match_takes_precedence_over_wildcard():
+    """An exact repository entry wins over its org wildcard."""
+    table = make_table()
+    
+    assert table.lookup("myorg/special").pattern == "myorg/special"
+    assert table.lookup("myorg/anything").pattern == "myorg/*"
+    assert table.lookup("other/service-api").pattern == "other/service-*"
+    assert table.lookup("other/website") is None
+
+
+def test_decide_checks_event_membership():
+    """Decisions report why a delivery is not routed."""
+    table = make_table()
+    
+    decision = table.decide("myorg/anything", "pull_request")
+    assert decision.enabled is True
+    assert decision.repo_config.name == "myorg/*"
+    
+    decision = table.decide("myorg/special", "pull_request")
+    assert decision.enabled is False
+    assert decision.reason == "event type not enabled"
+    
+    decision = table.decide("nobody/repo", "issues")
+    assert decision.enabled is False
+    assert decision.reason == "repository not configured"
+    assert decision.repo_config is None
@@ -0,0 +1,96 @@
+"""Tests for streamed analysis output."""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from webhook_handler.streaming import FAILED_TEXT, AnalysisStream, ProgressiveComment
+
+
+@pytest.fixture
+def github_client():
+    client = AsyncMock()
+    client.create_comment.return_value = 7
+    client.update_comment.return_value = True
+    return client
+
+
+@pytest.mark.asyncio
+async def test_stream_appends_to_file(tmp_path):
+    path = tmp_path / "analysis.md"
+    stream = AnalysisStream(path)
+    await stream.open()
+
+    await stream.write("Hello ")
+    assert path.read_text() == "Hello "
+    await stream.write("world")
+
+    assert await stream.close() is False
+    assert path.read_text() == "Hello world"
+
+
+@pytest.mark.asyncio
+async def test_comment_updates_are_throttled(tmp_path, github_client):
+    comment = ProgressiveComment(
+        github_client, "test/repo", 1, lambda text: f"> {text}", interval=3600
+    )
+    stream = AnalysisStream(tmp_path / "analysis.md", comment)
+    await stream.open()
+
+    for chunk in ("a", "b", "c"):
+        await stream.write(chunk)
+
+    assert await stream.close() is True
+    github_client.create_comment.assert_called_once()
+    # Only the final edit: intermediate ones fall inside the interval
+    github_client.update_comment.assert_called_once_with("test/repo", 1, 7, "> abc")
+
+
+@pytest.mark.asyncio
+async def test_throttled_updates_do_not_build_the_text(github_client):
+    comment = ProgressiveComment(github_client, "test/repo", 1, lambda text: text, interval=3600)
+    await comment.start()
+    text = MagicMock(return_value="abc")
+
+    comment.update(text)
+
+    text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_deletes_placeholder(tmp_path, github_client):
+    github_client.delete_comment.return_value = True
+    comment = ProgressiveComment(github_client, "test/repo", 1, lambda text: text)
+    stream = AnalysisStream(tmp_path / "analysis.md", comment)
+    await stream.open()
+    await stream.write("partial")
+
+    assert await stream.close(failed=True) is False
+    # A retry posts a new placeholder, so this one must not linger
+    github_client.delete_comment.assert_called_once_with("test/repo", 7)
+    github_client.update_comment.assert_not_called()
+    assert not comment.posted
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_marks_comment_it_cannot_delete(tmp_path, github_client):
+    github_client.delete_comment.return_value = False
+    comment = ProgressiveComment(github_client, "test/repo", 1, lambda text: text)
+    stream = AnalysisStream(tmp_path / "analysis.md", comment)
+    await stream.open()
+    await stream.write("partial")
+
+    assert await stream.close(failed=True) is False
+    body = github_client.update_comment.call_args.args[3]
+    assert body.startswith("partial") and FAILED_TEXT in body
+
+
+@pytest.mark.asyncio
+async def test_no_comment_when_placeholder_fails(tmp_path, github_client):
+    github_client.create_comment.return_value = None
+    comment = ProgressiveComment(github_client, "test/repo", 1, lambda text: text)
+    stream = AnalysisStream(tmp_path / "analysis.md", comment)
+    await stream.open()
+    await stream.write("text")
+
+    assert await stream.close() is False
+    github_client.update_comment.assert_not_called()
@@ -0,0 +1,118 @@
+"""Tests for structured triage and the fallback markers."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from webhook_handler.clients import AnalysisText, ClaudeClient
+from webhook_handler.config import ClaudeConfig
+from webhook_handler.triage import TRIAGE_TOOL, Triage
+
+
+def test_tool_result_takes_precedence_over_prose():
+    """A record_triage call decides the labels; words in the prose do not."""
+    analysis = AnalysisText(
+        "This is a complex area of the frontend, but the fix is small.",
+        {"category": "bug", "priority": "low", "difficulty": "easy", "components": ["backend"],
+         "change_type": "bug-fix", "close": False, "close_label": "invalid"}
+    )
+
+    triage = Triage.from_analysis(analysis)
+
+    assert triage.structured
+    assert triage.labels == ("bug", "priority-low", "difficulty-easy", "component-backend")
+    assert triage.change_type == "bug-fix"
+    assert not triage.close_issue
+
+
+def test_fallback_reads_only_explicit_markers():
+    """Analyses without a tool result are labeled from explicit markers, never from prose."""
+    triage = Triage.from_analysis(
+        "**RECOMMENDATION: CLOSE ISSUE**. A complex question about the database and frontend.\n"
+        "Labels: `question`, priority-high, **Priority**: medium, Complexity: Easy, component-database"
+    )
+
+    assert not triage.structured
+    assert triage.labels == ("question", "priority-high", "priority-medium", "difficulty-easy", "component-database")
+    assert triage.change_type is None
+    assert triage.close_issue
+    assert not Triage.from_text("recommendation: close issue").close_issue
+
+    prose = Triage.from_text("This fixes a bug in a complex backend feature and refactors the docs.")
+    assert prose.labels == () and prose.change_type is None
+    assert Triage.from_text("Suggested labels: size/small, type/bug-fix, type/docs").change_type == "bug-fix"
+
+
+def test_analysis_text_from_message_and_cache():
+    """Text blocks are joined, the tool input kept, and both survive the cache."""
+    message = SimpleNamespace(content=[
+        SimpleNamespace(type="text", text="## Analysis\n"),
+        SimpleNamespace(type="text", text="Looks good."),
+        SimpleNamespace(type="tool_use", input={"category": "enhancement", "close": False})
+    ])
+
+    analysis = AnalysisText.from_message(message)
+    restored = AnalysisText.from_cache(analysis.to_cache())
+
+    assert analysis == restored == "## Analysis\nLooks good."
+    assert restored.tool_input == {"category": "enhancement", "close": False}
+    assert AnalysisText.from_message(SimpleNamespace(content=[])).tool_input is None
+
+    # A forced tool call carries the analysis in its input
+    forced = AnalysisText.from_message(SimpleNamespace(content=[
+        SimpleNamespace(type="tool_use", input={"analysis": "## Analysis", "category": "bug"})
+    ]))
+    assert forced == "## Analysis"
+    assert forced.tool_input == {"category": "bug"}
+
+
+class FakeStream:
+    """Stands in for the SDK's message stream."""
+
+    def __init__(self, events, message):
+        self.events = events
+        self.message = message
+        self.response = SimpleNamespace(headers={})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+
+    async def get_final_message(self):
+        return self.message
+
+
+@pytest.mark.asyncio
+async def test_forced_tool_call_streams_its_analysis(monkeypatch):
+    """The triage tool is forced, and its analysis field is streamed as it is generated."""
+    chunks = ['{"analysis": "## Sum', 'mary\\nAll', ' good", "pri', 'ority": "low"}']
+    message = SimpleNamespace(
+        content=[SimpleNamespace(type="tool_use", input={"analysis": "## Summary\nAll good", "priority": "low"})],
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5)
+    )
+    requests = []
+
+    def stream(**params):
+        requests.append(params)
+        return FakeStream([SimpleNamespace(type="input_json", partial_json=chunk) for chunk in chunks], message)
+
+    client = ClaudeClient(ClaudeConfig(api_key="test"), rate_limiting=False)
+    monkeypatch.setattr(client.client, "messages", SimpleNamespace(stream=stream))
+    streamed = []
+
+    async def on_text(text):
+        streamed.append(text)
+
+    analysis = await client.analyze("prompt", "context", use_cache=False, on_text=on_text, tools=[TRIAGE_TOOL])
+    await client.close()
+
+    assert requests[0]["tool_choice"] == {"type": "tool", "name": "record_triage"}
+    assert streamed == ["## Sum", "mary\nAll", " good"]
+    assert analysis == "## Summary\nAll good"
+    assert analysis.tool_input == {"priority": "low"}